@@ -0,0 +1,112 @@
+"""Compare the binary book encoding of hitbtc_wss.bookcodec with JSON, in size and speed.
+
+Encodes a snapshot and a series of small updates of a synthetic BTCUSD book both ways, checks
+that the decoded binary stream rebuilds the same book, and prints bytes and microseconds per
+update.
+
+The binary encoding wins on size - about 27 instead of 295 bytes per update. It does not save
+CPU: encoding takes about as long as ``json.dumps()``, and decoding in pure Python is somewhat
+slower than ``json.loads()`` plus parsing the floats.
+
+Usage, from the repository root: python -m benchmarks.bookcodec [updates]
+"""
+
+# Import Built-Ins
+import io
+import json
+import random
+import sys
+import time
+
+# Import Homebrew
+from hitbtc_wss.book import OrderBook
+from hitbtc_wss.bookcodec import BookEncoder, BookDecoder, BookPublisher, read_frames
+from hitbtc_wss.metadata import MetadataCache
+
+SYMBOL = {'id': 'BTCUSD', 'baseCurrency': 'BTC', 'quoteCurrency': 'USD', 'tickSize': '0.01',
+          'quantityIncrement': '0.00001', 'feeCurrency': 'USD'}
+
+
+def levels(start, step, count):
+    """Return ``count`` levels moving away from ``start`` by 1-3 ticks each."""
+    return [{'price': '%.2f' % (start + step * i * 0.01 * random.randint(1, 3)),
+             'size': '%.5f' % (random.randint(0, 50000) * 0.00001)} for i in range(count)]
+
+
+def messages(updates):
+    random.seed(1)
+    snapshot = {'symbol': 'BTCUSD', 'sequence': 1, 'bid': levels(60000, -1, 100),
+                'ask': levels(60000.5, 1, 100)}
+    result = [('snapshotOrderbook', snapshot)]
+    for sequence in range(2, updates + 2):
+        result.append(('updateOrderbook', {
+            'symbol': 'BTCUSD', 'sequence': sequence, 'timestamp': '2018-09-02T12:00:00.123Z',
+            'bid': levels(59999 + random.random(), -1, random.randint(1, 4)),
+            'ask': levels(60000.5 + random.random(), 1, random.randint(0, 3))}))
+    return result
+
+
+def time_it(func, count):
+    best = None
+    for _ in range(7):
+        start = time.perf_counter()
+        func()
+        elapsed = (time.perf_counter() - start) / count
+        best = elapsed if best is None else min(best, elapsed)
+    return best * 1e6
+
+
+def main(updates=2000):
+    metadata = MetadataCache()
+    metadata.update_symbols([SYMBOL])
+    stream = messages(updates)
+
+    # Publish via the handler, as the connector would, and rebuild the book from the frames
+    book = OrderBook('BTCUSD')
+    sink = io.BytesIO()
+    publisher = BookPublisher({'BTCUSD': book}, metadata, sink)
+    for method, params in stream:
+        (book.apply_snapshot if method == 'snapshotOrderbook' else book.apply_update)(params)
+        publisher(method, 'BTCUSD', params)
+    sink.seek(0)
+    rebuilt = OrderBook('BTCUSD')
+    for diff in read_frames(sink):
+        (rebuilt.apply_snapshot if diff.snapshot else rebuilt.apply_update)(diff.as_params())
+    assert rebuilt.bids == book.bids and rebuilt.asks == book.asks, "Decoded book differs"
+
+    snapshot, updates = stream[0][1], [params for _, params in stream[1:]]
+    texts = [json.dumps(('updateOrderbook', 'BTCUSD', params)) for params in updates]
+    encoder = BookEncoder(metadata)
+    first = bytes(encoder.encode_message('snapshotOrderbook', snapshot))
+    frames = [bytes(encoder.encode_message('updateOrderbook', params)) for params in updates]
+    blob = b''.join(frames)
+
+    def json_decode():
+        for text in texts:
+            _, _, params = json.loads(text)
+            [(float(level['price']), float(level['size'])) for level in params['bid']]
+            [(float(level['price']), float(level['size'])) for level in params['ask']]
+
+    def binary_decode():
+        decoder = BookDecoder()
+        decoder.feed(first)
+        decoder.feed(blob)
+
+    count = len(updates)
+    json_size = sum(len(text.encode('UTF-8')) for text in texts) / count
+    binary_size = len(blob) / count
+    print("snapshot bytes:  json %6d  binary %6d" % (
+        len(json.dumps(('snapshotOrderbook', 'BTCUSD', snapshot))), len(first)))
+    print("update bytes:    json %6.1f  binary %6.1f  (%.1fx)" % (
+        json_size, binary_size, json_size / binary_size))
+    print("encode us:       json %6.2f  binary %6.2f" % (
+        time_it(lambda: [json.dumps(('updateOrderbook', 'BTCUSD', params))
+                         for params in updates], count),
+        time_it(lambda: [encoder.encode_message('updateOrderbook', params)
+                         for params in updates], count)))
+    print("decode us:       json %6.2f  binary %6.2f  (json incl. float parsing)" % (
+        time_it(json_decode, count), time_it(binary_decode, count)))
+
+
+if __name__ == '__main__':
+    main(*map(int, sys.argv[1:]))
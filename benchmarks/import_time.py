@@ -0,0 +1,72 @@
+"""Check that importing hitbtc_wss and constructing clients stays cheap and side-effect free.
+
+Each run imports the package in a fresh interpreter, so nothing is cached yet. The script fails
+if the best run exceeds the budget, if the import pulls in a lazily loaded module, or if
+constructing a client creates files in the working directory.
+
+Usage: python benchmarks/import_time.py [import budget in ms] [construct budget in us]
+"""
+
+# Import Built-Ins
+import json
+import os
+import subprocess
+import sys
+import tempfile
+
+
+# Imported on first use only; importing the package must not load them
+LAZY_MODULES = ('websocket', 'ssl', 'multiprocessing')
+
+PROBE = """
+import json, os, sys, time
+start = time.perf_counter()
+import hitbtc_wss
+imported = time.perf_counter() - start
+lazy = [name for name in %r if name in sys.modules]
+start = time.perf_counter()
+for _ in range(%d):
+    hitbtc_wss.HitBTC()
+constructed = (time.perf_counter() - start) / %d
+print(json.dumps({'import': imported, 'construct': constructed, 'lazy': lazy,
+                  'files': os.listdir('.')}))
+"""
+
+
+def probe(constructions):
+    """Run the probe in a new interpreter, in an empty working directory."""
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    path = os.pathsep.join(filter(None, (root, os.environ.get('PYTHONPATH'))))
+    env = dict(os.environ, PYTHONPATH=path)
+    with tempfile.TemporaryDirectory() as cwd:
+        output = subprocess.check_output(
+            [sys.executable, '-c', PROBE % (LAZY_MODULES, constructions, constructions)],
+            cwd=cwd, env=env)
+    return json.loads(output)
+
+
+def main(import_budget=50, construct_budget=200, runs=5, constructions=200):
+    results = [probe(constructions) for _ in range(runs)]
+    imported = min(result['import'] for result in results) * 1e3
+    constructed = min(result['construct'] for result in results) * 1e6
+    print("import hitbtc_wss: %.1fms (budget %sms)" % (imported, import_budget))
+    print("HitBTC():          %.1fus (budget %sus)" % (constructed, construct_budget))
+
+    failures = []
+    if imported > import_budget:
+        failures.append("import takes %.1fms" % imported)
+    if constructed > construct_budget:
+        failures.append("construction takes %.1fus" % constructed)
+    lazy = sorted({name for result in results for name in result['lazy']})
+    if lazy:
+        failures.append("import loads %s" % ', '.join(lazy))
+    files = sorted({name for result in results for name in result['files']})
+    if files:
+        failures.append("construction creates %s" % ', '.join(files))
+    for failure in failures:
+        print("FAIL: %s" % failure)
+    return 1 if failures else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main(*map(float, sys.argv[1:])))
@@ -0,0 +1,68 @@
+"""Time RiskEngine.check() and check_replace() against a tracker with open orders and a book.
+
+Usage, from the repository root: python -m benchmarks.risk_check [iterations]
+"""
+
+# Import Built-Ins
+import sys
+import time
+
+# Import Homebrew
+from hitbtc_wss.book import OrderBook
+from hitbtc_wss.orders import OrderTracker
+from hitbtc_wss.risk import RiskEngine, RiskLimits
+
+
+def report(i, side='buy', quantity='1.000', cum_quantity='0', status='new', price='0.0500'):
+    return {'clientOrderId': 'order-%d' % i, 'symbol': 'ETHBTC', 'side': side, 'status': status,
+            'type': 'limit', 'quantity': quantity, 'cumQuantity': cum_quantity, 'price': price}
+
+
+def setup(open_orders=50):
+    orders = OrderTracker()
+    for i in range(open_orders):
+        orders.apply(report(i, side='buy' if i % 2 else 'sell'))
+    book = OrderBook('ETHBTC')
+    book.apply_snapshot({'sequence': 1,
+                         'bid': [{'price': '%.6f' % (0.05 - i * 1e-6), 'size': '1'}
+                                 for i in range(100)],
+                         'ask': [{'price': '%.6f' % (0.050001 + i * 1e-6), 'size': '1'}
+                                 for i in range(100)]})
+    return RiskEngine(orders, {'ETHBTC': book},
+                      RiskLimits(max_notional=100, max_position=1000, max_open_orders=1000,
+                                 price_band=0.05))
+
+
+def time_it(func, iterations):
+    best = None
+    for _ in range(5):
+        start = time.perf_counter()
+        for i in range(iterations):
+            func(i)
+        elapsed = (time.perf_counter() - start) / iterations
+        best = elapsed if best is None else min(best, elapsed)
+    return best * 1e6
+
+
+def main(iterations=100000):
+    engine = setup()
+    orders = engine.orders
+
+    def check(i):
+        params = {'clientOrderId': 'new-%d' % i, 'symbol': 'ETHBTC', 'side': 'buy',
+                  'quantity': '0.500', 'price': '0.050010'}
+        engine.check(params)
+        orders.release(params['clientOrderId'])
+
+    def check_replace(i):
+        params = {'clientOrderId': 'order-1', 'requestClientId': 'replace-%d' % i,
+                  'quantity': '1.500', 'price': '0.050010'}
+        engine.check_replace(params)
+        orders.release(params['requestClientId'])
+
+    print("check():         %.2fus" % time_it(check, iterations))
+    print("check_replace(): %.2fus" % time_it(check_replace, iterations))
+
+
+if __name__ == '__main__':
+    main(*map(int, sys.argv[1:]))
@@ -0,0 +1,171 @@
+"""Incremental per-symbol market statistics, fed by the trades and order book streams."""
+
+# Import Built-Ins
+import logging
+import math
+from collections import deque
+
+# Import Homebrew
+from hitbtc_wss.book import OrderBook
+from hitbtc_wss.utils import parse_timestamp
+
+# Init Logging Facilities
+log = logging.getLogger(__name__)
+
+
+class SymbolAnalytics:
+    """Rolling statistics of a single symbol.
+
+    Trades are kept in a ring buffer covering the last ``window`` seconds of exchange time, with
+    running sums for VWAP and trade-flow imbalance; spreads are kept for the last ``spread_window``
+    book updates, with running sums for their mean and standard deviation. Every update is O(1),
+    amortized over evictions.
+
+    Trades must arrive in order: those older than the last trade added, or with an id not newer
+    than its id - such as those resent in the ``snapshotTrades`` following a reconnect - are
+    ignored.
+    """
+
+    def __init__(self, window=None, spread_window=None):
+        """Initialize a SymbolAnalytics instance.
+
+        :param window: trade window in seconds; defaults to 60
+        :param spread_window: number of spread samples to keep; defaults to 1000
+        """
+        self.window = (window or 60) * 1000
+        self._trades = deque()
+        self._notional = 0.0
+        self._volume = 0.0
+        self._signed_volume = 0.0
+        self._spreads = deque(maxlen=spread_window or 1000)
+        self._spread_sum = 0.0
+        self._spread_sumsq = 0.0
+        self.microprice = None
+        self.spread = None
+        self.last_id = None
+
+    def add_trade(self, timestamp, price, quantity, side, trade_id=None):
+        """Add a trade and evict those that dropped out of the window.
+
+        :param timestamp: trade time in milliseconds since epoch
+        :param side: 'buy' or 'sell'
+        :param trade_id: trade id, to ignore trades added before
+        :return: False if the trade was ignored as a duplicate or out of order
+        """
+        if trade_id is not None and self.last_id is not None and trade_id <= self.last_id:
+            return False
+        if self._trades and timestamp < self._trades[-1][0]:
+            return False
+        if trade_id is not None:
+            self.last_id = trade_id
+        signed = quantity if side == 'buy' else -quantity
+        self._trades.append((timestamp, price * quantity, quantity, signed))
+        self._notional += price * quantity
+        self._volume += quantity
+        self._signed_volume += signed
+
+        trades = self._trades
+        cutoff = timestamp - self.window
+        while trades[0][0] <= cutoff:
+            _, notional, volume, signed = trades.popleft()
+            self._notional -= notional
+            self._volume -= volume
+            self._signed_volume -= signed
+        return True
+
+    def update_quotes(self, bid, bid_size, ask, ask_size):
+        """Update microprice and spread statistics from the current top of book."""
+        self.spread = spread = ask - bid
+        self.microprice = (bid * ask_size + ask * bid_size) / (bid_size + ask_size)
+        spreads = self._spreads
+        if len(spreads) == spreads.maxlen:
+            old = spreads[0]
+            self._spread_sum -= old
+            self._spread_sumsq -= old * old
+        spreads.append(spread)
+        self._spread_sum += spread
+        self._spread_sumsq += spread * spread
+
+    @property
+    def vwap(self):
+        """Volume-weighted average price over the trade window, or None."""
+        return self._notional / self._volume if self._volume > 0 else None
+
+    @property
+    def volume(self):
+        """Traded volume over the trade window."""
+        return self._volume
+
+    @property
+    def imbalance(self):
+        """Buy minus sell volume, relative to total volume over the trade window (-1 to 1)."""
+        return self._signed_volume / self._volume if self._volume > 0 else 0.0
+
+    @property
+    def mean_spread(self):
+        """Mean spread over the spread window, or None."""
+        return self._spread_sum / len(self._spreads) if self._spreads else None
+
+    @property
+    def spread_std(self):
+        """Standard deviation of the spread over the spread window, or None."""
+        n = len(self._spreads)
+        if not n:
+            return None
+        mean = self._spread_sum / n
+        return math.sqrt(max(self._spread_sumsq / n - mean * mean, 0.0))
+
+
+class StreamAnalytics:
+    """Stream handler maintaining a :class:`SymbolAnalytics` per symbol.
+
+    Quote statistics are taken from ``books``, a mapping of symbols to
+    :class:`hitbtc_wss.book.OrderBook` objects - pass ``HitBTCConnector.books`` to share the books
+    maintained by the connector. If omitted, the handler maintains its own books.
+
+    Register instances via :meth:`hitbtc_wss.connector.HitBTCConnector.add_handler`.
+    """
+
+    def __init__(self, books=None, window=None, spread_window=None):
+        """Initialize a StreamAnalytics instance.
+
+        :param books: mapping of symbols to OrderBook objects, updated by the caller
+        :param window: trade window in seconds; defaults to 60
+        :param spread_window: number of spread samples to keep; defaults to 1000
+        """
+        self.own_books = books is None
+        self.books = {} if books is None else books
+        self.window = window
+        self.spread_window = spread_window
+        self.symbols = {}
+
+    def __getitem__(self, symbol):
+        return self.symbols[symbol]
+
+    def _get(self, symbol):
+        analytics = self.symbols.get(symbol)
+        if analytics is None:
+            analytics = self.symbols[symbol] = SymbolAnalytics(self.window, self.spread_window)
+        return analytics
+
+    def __call__(self, method, symbol, params):
+        """Update the statistics of ``symbol`` from a stream item."""
+        if method in ('snapshotTrades', 'updateTrades'):
+            analytics = self._get(symbol)
+            for trade in params['data']:
+                analytics.add_trade(parse_timestamp(trade['timestamp']), float(trade['price']),
+                                    float(trade['quantity']), trade['side'], trade['id'])
+        elif method in ('snapshotOrderbook', 'updateOrderbook'):
+            if self.own_books:
+                book = self.books.get(symbol)
+                if book is None:
+                    book = self.books[symbol] = OrderBook(symbol)
+                if method == 'snapshotOrderbook':
+                    book.apply_snapshot(params)
+                else:
+                    book.apply_update(params)
+            else:
+                book = self.books[symbol]
+            bid, ask = book.best_bid(), book.best_ask()
+            if bid and ask:
+                self._get(symbol).update_quotes(bid[0], bid[1], ask[0], ask[1])
@@ -0,0 +1,126 @@
+"""Tick archive: public trades appended to one CSV file per symbol."""
+
+# Import Built-Ins
+import logging
+import os
+from threading import Lock
+
+# Import Homebrew
+from hitbtc_wss.utils import parse_timestamp
+
+# Init Logging Facilities
+log = logging.getLogger(__name__)
+
+
+HEADER = 'id,timestamp,price,quantity,side\n'
+
+
+class TickArchive:
+    """Append trades to ``<directory>/<symbol>.csv``.
+
+    Each row holds a trade's id, its timestamp in milliseconds since epoch, and price, quantity and
+    side exactly as sent by the API. Files are opened on first use and kept open until ``close()``;
+    a partial last row, left behind by a crash while writing, is cut off when a file is opened.
+
+    Instances are thread-safe, and can be registered as a stream handler via
+    :meth:`hitbtc_wss.connector.HitBTCConnector.add_handler` to archive live trades, too.
+    """
+
+    def __init__(self, directory):
+        """Initialize a TickArchive instance.
+
+        :param directory: directory to write the files to; created if missing
+        """
+        self.directory = directory
+        os.makedirs(directory, exist_ok=True)
+        self._files = {}
+        self._lock = Lock()
+
+    def path(self, symbol):
+        """Return the path of ``symbol``'s file."""
+        return os.path.join(self.directory, symbol + '.csv')
+
+    @staticmethod
+    def _tail(path, size=4096):
+        """Return the end of the file at ``path`` up to its last newline, and that end's offset.
+
+        At least one complete row is returned, unless the file has none.
+        """
+        try:
+            f = open(path, 'rb')
+        except FileNotFoundError:
+            return b'', 0
+        with f:
+            end = f.seek(0, os.SEEK_END)
+            while True:
+                start = max(end - size, 0)
+                f.seek(start)
+                data = f.read(end - start)
+                cut = data.rfind(b'\n') + 1
+                if start == 0 or data.rfind(b'\n', 0, cut - 1) >= 0:
+                    return data[:cut], start + cut
+                size *= 2
+
+    def _file(self, symbol):
+        f = self._files.get(symbol)
+        if f is None:
+            path = self.path(symbol)
+            _, size = self._tail(path)
+            if os.path.exists(path) and os.path.getsize(path) != size:
+                log.warning("Cutting off partial last row of %s", path)
+                os.truncate(path, size)
+            f = self._files[symbol] = open(path, 'a')
+            if not f.tell():
+                f.write(HEADER)
+        return f
+
+    def write(self, symbol, trades):
+        """Append trades, as sent by ``getTrades`` or the trades stream, to ``symbol``'s file."""
+        if not trades:
+            return
+        # Trades of a batch mostly share their timestamp, so only parse it when it changes
+        last = timestamp = None
+        rows = []
+        for trade in trades:
+            if trade['timestamp'] != last:
+                last = trade['timestamp']
+                timestamp = parse_timestamp(last)
+            rows.append('%s,%s,%s,%s,%s\n' % (trade['id'], timestamp, trade['price'],
+                                              trade['quantity'], trade['side']))
+        with self._lock:
+            self._file(symbol).write(''.join(rows))
+
+    def __call__(self, method, symbol, params):
+        """Archive the trades of a trades stream item."""
+        if method in ('snapshotTrades', 'updateTrades'):
+            self.write(symbol, params['data'])
+
+    def last_id(self, symbol):
+        """Return the id of the last complete row in ``symbol``'s file, or None if it has none."""
+        with self._lock:
+            if symbol in self._files:
+                self._files[symbol].flush()
+            data, _ = self._tail(self.path(symbol))
+        row = data[data.rfind(b'\n', 0, -1) + 1:]
+        try:
+            return int(row.split(b',', 1)[0])
+        except ValueError:
+            # The header, or an empty file
+            return None
+
+    def flush(self, symbol=None):
+        """Flush ``symbol``'s file, or all files if no symbol is given."""
+        with self._lock:
+            if symbol is None:
+                files = list(self._files.values())
+            else:
+                files = [self._files[symbol]] if symbol in self._files else []
+            for f in files:
+                f.flush()
+
+    def close(self):
+        """Close all files."""
+        with self._lock:
+            for f in self._files.values():
+                f.close()
+            self._files = {}
@@ -0,0 +1,235 @@
+"""Resumable backfill of historical trades over a pool of connections."""
+
+# Import Built-Ins
+import logging
+import json
+import os
+import time
+from itertools import count
+from queue import Queue, Empty
+from threading import Thread, Lock
+
+# Import Homebrew
+from hitbtc_wss.connector import HitBTCConnector
+from hitbtc_wss.ratelimit import RateLimiter
+
+# Init Logging Facilities
+log = logging.getLogger(__name__)
+
+
+class BackfillError(Exception):
+    """Raised for failed or unanswered ``getTrades`` requests."""
+
+
+class BackfillJob:
+    """Paging state of a single symbol.
+
+    :ivar last_id: id of the last trade archived
+    :ivar start: trade id or ISO 8601 timestamp to start at, if nothing was archived yet
+    :ivar till_id: id of the last trade to fetch; fetches up to the most recent trade if None
+    """
+
+    __slots__ = ('symbol', 'last_id', 'start', 'till_id', 'failures')
+
+    def __init__(self, symbol, last_id=None, start=None, till_id=None):
+        """Initialize the instance."""
+        self.symbol = symbol
+        self.last_id = last_id
+        self.start = start
+        self.till_id = till_id
+        self.failures = 0
+
+    def params(self, limit):
+        """Return the ``getTrades`` params of the next page."""
+        params = {'symbol': self.symbol, 'sort': 'ASC', 'limit': limit}
+        if self.last_id is not None:
+            params.update({'by': 'id', 'from': self.last_id + 1})
+        elif isinstance(self.start, str):
+            params.update({'by': 'timestamp', 'from': self.start})
+        elif self.start is not None:
+            params.update({'by': 'id', 'from': self.start})
+        if self.till_id is not None and params.get('by') == 'id':
+            params['till'] = self.till_id
+        return params
+
+
+class Backfill:
+    """Page through the trade history of many symbols concurrently.
+
+    Symbols are queued via ``add()`` and fetched by ``run()``, one worker per connection. Workers
+    fetch a single page of ``limit`` trades at a time and queue the symbol again, so all symbols
+    progress in parallel. Requests of all connections share ``limiter``, a
+    :class:`hitbtc_wss.ratelimit.RateLimiter`.
+
+    Trades are written to ``archive``, a :class:`hitbtc_wss.archive.TickArchive`. After every page
+    the id of the last archived trade per symbol is saved to ``checkpoint_path``; symbols added
+    again later resume after it, or after the last trade in the archive if that is newer, since a
+    crash between writing a page and saving its checkpoint leaves the page archived but not
+    checkpointed. Archive files should thus not be shared with a live trades stream. Failed pages
+    are retried up to ``max_failures`` times, with backoff.
+    """
+
+    def __init__(self, archive, checkpoint_path=None, connections=None, rate=None, limit=None,
+                 timeout=None, max_failures=None, url=None, **conn_ops):
+        """Initialize a Backfill instance.
+
+        :param archive: TickArchive to write trades to
+        :param checkpoint_path: JSON file to keep the last archived trade id per symbol in
+        :param connections: number of connections; defaults to 4
+        :param rate: requests per second over all connections; defaults to 10
+        :param limit: trades per request; defaults to 1000, the API's maximum
+        :param timeout: seconds to wait for a response; defaults to 30
+        :param max_failures: consecutive failures after which a symbol is given up; defaults to 5
+        :param url: URL of the websocket API
+        :param conn_ops: kwargs for the HitBTCConnector objects
+        """
+        self.archive = archive
+        self.checkpoint_path = checkpoint_path
+        self.checkpoints = self._load_checkpoints()
+        self.limiter = RateLimiter(rate or 10)
+        self.limit = limit or 1000
+        self.timeout = timeout or 30
+        self.max_failures = max_failures or 5
+        conn_ops.setdefault('q_maxsize', 1000)
+        # Keeps the connectors from formatting and logging every trade received
+        conn_ops.setdefault('log_level', logging.WARNING)
+        self.connections = [HitBTCConnector(url, silent=True, balance_interval=None, **conn_ops)
+                            for _ in range(connections or 4)]
+        self.failed = {}
+        self.pages = 0
+        self._jobs = Queue()
+        self._ids = count()
+        self._lock = Lock()
+
+    def _load_checkpoints(self):
+        if not self.checkpoint_path:
+            return {}
+        try:
+            with open(self.checkpoint_path) as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return {}
+
+    def _checkpoint(self, symbol, last_id):
+        """Record ``symbol``'s last archived trade id and write all checkpoints to disk."""
+        with self._lock:
+            self.checkpoints[symbol] = last_id
+            if not self.checkpoint_path:
+                return
+            tmp_path = self.checkpoint_path + '.tmp'
+            with open(tmp_path, 'w') as f:
+                json.dump(self.checkpoints, f)
+            os.replace(tmp_path, self.checkpoint_path)
+
+    def add(self, symbol, start=None, till_id=None):
+        """Queue ``symbol`` for backfilling, resuming after the trades archived already.
+
+        :param start: trade id or ISO 8601 timestamp to start at without a checkpoint; the
+                      earliest trade available if None
+        :param till_id: id of the last trade to fetch; up to the most recent trade if None
+        """
+        last_id = self.checkpoints.get(symbol)
+        archived = self.archive.last_id(symbol)
+        if archived is not None and (last_id is None or archived > last_id):
+            log.info("Resuming %s after archived trade %s instead of checkpoint %s", symbol,
+                     archived, last_id)
+            last_id = archived
+        self._jobs.put(BackfillJob(symbol, last_id, start, till_id))
+
+    def run(self):
+        """Connect, fetch all queued symbols and disconnect again.
+
+        :return: dict of the last archived trade id per symbol
+        """
+        for conn in self.connections:
+            conn.start()
+        deadline = time.monotonic() + self.timeout
+        while not all(conn.connected for conn in self.connections):
+            if time.monotonic() > deadline:
+                break
+            time.sleep(0.1)
+
+        workers = [Thread(target=self._work, args=(conn,), daemon=True)
+                   for conn in self.connections if conn.connected]
+        if not workers:
+            raise BackfillError("None of %s connections could be established" %
+                                len(self.connections))
+        for worker in workers:
+            worker.start()
+        self._jobs.join()
+        for _ in workers:
+            self._jobs.put(None)
+        for worker in workers:
+            worker.join()
+        for conn in self.connections:
+            conn.disconnect()
+        self.archive.flush()
+        return dict(self.checkpoints)
+
+    def _work(self, conn):
+        """Fetch pages of queued symbols via ``conn`` until a None job is received."""
+        while True:
+            job = self._jobs.get()
+            if job is None:
+                self._jobs.task_done()
+                return
+            try:
+                done = self._fetch_page(conn, job)
+                job.failures = 0
+            except Exception as e:
+                if not isinstance(e, BackfillError):
+                    log.exception("Unexpected error backfilling %s", job.symbol)
+                job.failures += 1
+                if job.failures >= self.max_failures:
+                    log.error("Giving up backfilling %s after %s failures: %s", job.symbol,
+                              job.failures, e)
+                    self.failed[job.symbol] = str(e)
+                    done = True
+                else:
+                    log.warning("Backfilling %s failed, retrying: %s", job.symbol, e)
+                    time.sleep(min(2 ** job.failures, 30))
+                    done = False
+            if not done:
+                self._jobs.put(job)
+            self._jobs.task_done()
+
+    def _request(self, conn, params):
+        """Send a ``getTrades`` request via ``conn`` and return its result."""
+        if not conn.connected:
+            raise BackfillError("Connection not established")
+        self.limiter.acquire()
+        request_id = 'backfill-%d' % next(self._ids)
+        conn.send('getTrades', custom_id=request_id, **params)
+        deadline = time.monotonic() + self.timeout
+        while True:
+            try:
+                item = conn.recv(timeout=max(deadline - time.monotonic(), 0))
+            except Empty:
+                raise BackfillError("No response to %s within %ss" % (params, self.timeout))
+            if item[0] != 'Response':
+                continue
+            request, response = item[2]
+            if request['id'] != request_id:
+                continue
+            if 'error' in response:
+                raise BackfillError("{code} - {message} - {description}".format(
+                    **response['error']))
+            return response['result']
+
+    def _fetch_page(self, conn, job):
+        """Fetch, archive and checkpoint the next page of ``job``.
+
+        :return: True if the job is complete
+        """
+        result = self._request(conn, job.params(self.limit))
+        after = job.last_id if job.last_id is not None else -1
+        trades = [trade for trade in result if trade['id'] > after and
+                  (job.till_id is None or trade['id'] <= job.till_id)]
+        if trades:
+            self.archive.write(job.symbol, trades)
+            self.archive.flush(job.symbol)
+            job.last_id = trades[-1]['id']
+            self._checkpoint(job.symbol, job.last_id)
+        self.pages += 1
+        return (len(result) < self.limit or not trades or
+                (job.till_id is not None and job.last_id >= job.till_id))
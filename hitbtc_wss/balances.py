@@ -0,0 +1,91 @@
+"""Local trading balance cache, maintained from execution reports."""
+
+# Import Built-Ins
+import logging
+from threading import Lock
+
+# Init Logging Facilities
+log = logging.getLogger(__name__)
+
+
+class BalanceCache:
+    """Trading balances per currency, kept as local dictionary lookups.
+
+    The cache is seeded from a ``getTradingBalance`` result via ``seed()`` and updated
+    incrementally from ``trade`` reports via ``apply()``. Fills are settled against the reserved
+    funds of the spent currency first, and against its available funds for any remainder; as
+    reservations themselves are not tracked, the cache should be re-seeded periodically.
+
+    Applying a fill requires the base, quote and fee currency of the traded symbol, which are
+    looked up in ``symbols`` - a mapping of symbol ids to ``getSymbols`` result items, such as a
+    :class:`hitbtc_wss.metadata.MetadataCache`.
+    """
+
+    def __init__(self, symbols=None):
+        """Initialize a BalanceCache instance.
+
+        :param symbols: mapping of symbol ids to symbol dicts, as returned by ``getSymbols``
+        """
+        self.balances = {}
+        self.symbols = symbols if symbols is not None else {}
+        self.seeded = False
+        self._lock = Lock()
+
+    def available(self, currency):
+        """Return the available balance of ``currency``."""
+        return self.balances.get(currency, (0.0, 0.0))[0]
+
+    def reserved(self, currency):
+        """Return the reserved balance of ``currency``."""
+        return self.balances.get(currency, (0.0, 0.0))[1]
+
+    def get(self, currency):
+        """Return a tuple of available and reserved balance of ``currency``."""
+        return self.balances.get(currency, (0.0, 0.0))
+
+    def seed(self, balances):
+        """Replace the cached balances with the given ones.
+
+        :param balances: list of balance dicts, as returned by ``getTradingBalance``
+        """
+        with self._lock:
+            self.balances = {item['currency']: (float(item['available']), float(item['reserved']))
+                             for item in balances}
+            self.seeded = True
+
+    def apply(self, report):
+        """Apply the fill contained in a ``trade`` report; other reports are ignored.
+
+        :param report: order report dict as sent by the API
+        """
+        if report.get('reportType') != 'trade':
+            return
+        symbol = self.symbols.get(report['symbol'])
+        if symbol is None:
+            log.warning("Cannot apply fill for unknown symbol %s; request symbols first!",
+                        report['symbol'])
+            return
+
+        quantity = float(report['tradeQuantity'])
+        value = quantity * float(report['tradePrice'])
+        base, quote = symbol['baseCurrency'], symbol['quoteCurrency']
+        with self._lock:
+            if report['side'] == 'buy':
+                self._spend(quote, value)
+                self._receive(base, quantity)
+            else:
+                self._spend(base, quantity)
+                self._receive(quote, value)
+            fee = float(report.get('tradeFee') or 0)
+            if fee:
+                available, reserved = self.balances.get(symbol['feeCurrency'], (0.0, 0.0))
+                self.balances[symbol['feeCurrency']] = (available - fee, reserved)
+
+    def _spend(self, currency, amount):
+        available, reserved = self.balances.get(currency, (0.0, 0.0))
+        from_reserved = min(reserved, amount)
+        self.balances[currency] = (available - (amount - from_reserved), reserved - from_reserved)
+
+    def _receive(self, currency, amount):
+        available, reserved = self.balances.get(currency, (0.0, 0.0))
+        self.balances[currency] = (available + amount, reserved)
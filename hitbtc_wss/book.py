@@ -0,0 +1,99 @@
+"""Order book maintained from order book snapshots and updates."""
+
+# Import Built-Ins
+import logging
+from bisect import bisect_left, insort
+from threading import Lock
+
+# Init Logging Facilities
+log = logging.getLogger(__name__)
+
+
+class OrderBook:
+    """Price levels of a single symbol, kept as dicts plus sorted price lists.
+
+    Best bid and ask are O(1); adding or removing a level is a binary search plus a list insert or
+    delete. Updates carrying a ``sequence`` not newer than the book's are ignored.
+
+    Snapshots and updates are applied under ``lock``; take it to read a consistent copy from
+    another thread, or use ``copy()``.
+    """
+
+    def __init__(self, symbol=None):
+        """Initialize an empty OrderBook instance."""
+        self.symbol = symbol
+        self.sequence = None
+        self.bids = {}
+        self.asks = {}
+        self._bid_prices = []
+        self._ask_prices = []
+        self.lock = Lock()
+
+    def apply_snapshot(self, params):
+        """Replace the book's contents with a ``snapshotOrderbook`` message's params."""
+        with self.lock:
+            self.bids.clear()
+            self.asks.clear()
+            self._bid_prices = []
+            self._ask_prices = []
+            self.sequence = None
+            return self._apply_update(params)
+
+    def apply_update(self, params):
+        """Apply an ``updateOrderbook`` message's params.
+
+        :return: False if the update was stale and therefore ignored, True otherwise
+        """
+        with self.lock:
+            return self._apply_update(params)
+
+    def _apply_update(self, params):
+        sequence = params.get('sequence')
+        if sequence is not None:
+            if self.sequence is not None and sequence <= self.sequence:
+                return False
+            self.sequence = sequence
+        for level in params['bid']:
+            self._set(self.bids, self._bid_prices, float(level['price']), float(level['size']))
+        for level in params['ask']:
+            self._set(self.asks, self._ask_prices, float(level['price']), float(level['size']))
+        return True
+
+    @staticmethod
+    def _set(levels, prices, price, size):
+        if size:
+            if price not in levels:
+                insort(prices, price)
+            levels[price] = size
+        elif levels.pop(price, None) is not None:
+            del prices[bisect_left(prices, price)]
+
+    def copy(self):
+        """Return the book's sequence and copies of its bid and ask dicts, consistently."""
+        with self.lock:
+            return self.sequence, dict(self.bids), dict(self.asks)
+
+    def best_bid(self):
+        """Return the best bid as a ``(price, size)`` tuple, or None."""
+        if self._bid_prices:
+            price = self._bid_prices[-1]
+            return price, self.bids[price]
+        return None
+
+    def best_ask(self):
+        """Return the best ask as a ``(price, size)`` tuple, or None."""
+        if self._ask_prices:
+            price = self._ask_prices[0]
+            return price, self.asks[price]
+        return None
+
+    def top(self, depth):
+        """Return the best ``depth`` bids and asks as lists of ``(price, size)`` tuples."""
+        bids = self.bids
+        asks = self.asks
+        return ([(price, bids[price]) for price in self._bid_prices[:-depth - 1:-1]],
+                [(price, asks[price]) for price in self._ask_prices[:depth]])
+
+    def __repr__(self):
+        return 'OrderBook(symbol=%r, sequence=%r, best_bid=%r, best_ask=%r)' % (
+            self.symbol, self.sequence, self.best_bid(), self.best_ask())
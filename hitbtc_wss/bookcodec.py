@@ -0,0 +1,359 @@
+"""Compact binary encoding of order book changes, for publishing books to local consumers.
+
+A stream is a sequence of frames, each prefixed with its length as a varint. The first byte of a
+frame is its type:
+
+    - ``DEFINE``: symbol index, then symbol, tick size and quantity increment as length-prefixed
+      strings. Sent once per symbol, before its first book frame.
+    - ``SNAPSHOT`` / ``UPDATE``: symbol index, the symbol's frame sequence number, then the bids
+      and the asks, each as a level count followed by the levels.
+
+A level is its price in ticks and its size in quantity increments; a size of 0 removes the level.
+The first price of a side is sent as is, the others as the zigzag-encoded difference to the
+previous one, so that neighbouring levels take a byte or two. All integers are varints.
+
+Frame sequence numbers count the book frames of a symbol, starting at 1 with every snapshot;
+a decoder seeing a gap knows it missed frames and must wait for the next snapshot.
+"""
+
+# Import Built-Ins
+import logging
+
+# Init Logging Facilities
+log = logging.getLogger(__name__)
+
+
+DEFINE = 0
+SNAPSHOT = 1
+UPDATE = 2
+
+
+class BookCodecError(ValueError):
+    """Raised for symbols that can't be encoded and for malformed frames."""
+
+
+def _varint(out, n):
+    while n > 0x7f:
+        out.append(n & 0x7f | 0x80)
+        n >>= 7
+    out.append(n)
+
+
+def _string(out, s):
+    data = s.encode('UTF-8')
+    _varint(out, len(data))
+    out += data
+
+
+def _read_varint(data, pos):
+    n = shift = 0
+    while True:
+        byte = data[pos]
+        pos += 1
+        n |= (byte & 0x7f) << shift
+        if byte < 0x80:
+            return n, pos
+        shift += 7
+
+
+def _read_string(data, pos):
+    length, pos = _read_varint(data, pos)
+    return data[pos:pos + length].decode('UTF-8'), pos + length
+
+
+def _units(step):
+    """Return a tick size or quantity increment string as an integer and a power of 10.
+
+    Multiplying with the integer and dividing by the power converts ticks into the same float
+    that parsing the price string would give, since only the division rounds.
+    """
+    whole, _, decimals = step.rstrip('0').partition('.') if '.' in step else (step, '', '')
+    return int(whole + decimals), 10 ** len(decimals)
+
+
+class BookEncoder:
+    """Encode order book snapshots and updates into frames.
+
+    Tick sizes and quantity increments are looked up in ``metadata`` (a
+    :class:`hitbtc_wss.metadata.MetadataCache`) the first time a symbol is encoded; that frame is
+    preceded by the symbol's ``DEFINE`` frame.
+    """
+
+    def __init__(self, metadata):
+        """Initialize a BookEncoder instance.
+
+        :param metadata: MetadataCache to look up tick sizes and quantity increments in
+        """
+        self.metadata = metadata
+        self._symbols = {}
+        self._sequences = {}
+
+    def reset(self):
+        """Forget all symbols, e.g. to start a new stream; they're defined again when next used."""
+        self._symbols = {}
+        self._sequences = {}
+
+    def _define(self, out, symbol):
+        info = self.metadata.get(symbol)
+        if info is None:
+            raise BookCodecError("No tick size known for %s" % symbol)
+        index = len(self._symbols)
+        tick, lot = info['tickSize'], info['quantityIncrement']
+        self._symbols[symbol] = index, float(tick), float(lot)
+        frame = bytearray((DEFINE,))
+        _varint(frame, index)
+        _string(frame, symbol)
+        _string(frame, tick)
+        _string(frame, lot)
+        _varint(out, len(frame))
+        out += frame
+        return self._symbols[symbol]
+
+    def encode(self, symbol, bids, asks, snapshot=False):
+        """Return the frames for a change to ``symbol``'s book.
+
+        :param bids: iterable of ``(price, size)`` pairs, as strings or floats
+        :param asks: iterable of ``(price, size)`` pairs, as strings or floats
+        :param snapshot: whether the levels replace the whole book
+        :return: bytearray of one book frame, preceded by a ``DEFINE`` frame for new symbols
+        """
+        out = bytearray()
+        entry = self._symbols.get(symbol)
+        if entry is None:
+            entry = self._define(out, symbol)
+        index, tick, lot = entry
+        if snapshot:
+            sequence = 1
+        else:
+            sequence = self._sequences.get(symbol, 0) + 1
+        self._sequences[symbol] = sequence
+
+        frame = bytearray((SNAPSHOT if snapshot else UPDATE,))
+        _varint(frame, index)
+        _varint(frame, sequence)
+        for levels in (bids, asks):
+            if not isinstance(levels, (list, tuple)):
+                levels = list(levels)
+            _varint(frame, len(levels))
+            last = 0
+            for price, size in levels:
+                ticks = round(float(price) / tick)
+                delta = ticks - last
+                last = ticks
+                _varint(frame, delta << 1 if delta >= 0 else (-delta << 1) - 1)
+                _varint(frame, round(float(size) / lot))
+        _varint(out, len(frame))
+        out += frame
+        return out
+
+    def encode_message(self, method, params):
+        """Return the frames for a ``snapshotOrderbook`` or ``updateOrderbook`` message's params."""
+        return self.encode(params['symbol'],
+                           [(level['price'], level['size']) for level in params['bid']],
+                           [(level['price'], level['size']) for level in params['ask']],
+                           method == 'snapshotOrderbook')
+
+
+class BookDiff:
+    """A decoded book frame; ``bids`` and ``asks`` are lists of ``(price, size)`` float tuples.
+
+    :ivar gap: True if frames of this symbol were missed since its last snapshot
+    """
+
+    __slots__ = ('symbol', 'sequence', 'snapshot', 'bids', 'asks', 'gap')
+
+    def __init__(self, symbol, sequence, snapshot, bids, asks, gap=False):
+        """Initialize the instance."""
+        self.symbol = symbol
+        self.sequence = sequence
+        self.snapshot = snapshot
+        self.bids = bids
+        self.asks = asks
+        self.gap = gap
+
+    def as_params(self):
+        """Return the diff as ``snapshotOrderbook``/``updateOrderbook`` params, for OrderBook."""
+        return {'symbol': self.symbol, 'sequence': self.sequence,
+                'bid': [{'price': price, 'size': size} for price, size in self.bids],
+                'ask': [{'price': price, 'size': size} for price, size in self.asks]}
+
+    def __repr__(self):
+        return 'BookDiff(%s, sequence=%r, snapshot=%r, %s bids, %s asks)' % (
+            self.symbol, self.sequence, self.snapshot, len(self.bids), len(self.asks))
+
+
+class BookDecoder:
+    """Decode a stream of frames written by :class:`BookEncoder`.
+
+    Bytes may be fed in chunks of any size, e.g. as read from a socket; incomplete frames are kept
+    until the rest arrives. A malformed frame raises :class:`BookCodecError` once and is skipped;
+    the frames decoded before it are returned by the next call.
+    """
+
+    def __init__(self):
+        """Initialize a BookDecoder instance."""
+        self.gaps = 0
+        self._buffer = bytearray()
+        self._decoded = []
+        self._symbols = {}
+        self._sequences = {}
+
+    def feed(self, data):
+        """Decode all complete frames in ``data`` and previously fed, incomplete ones.
+
+        :return: list of BookDiff objects
+        """
+        buffer = self._buffer
+        buffer += data
+        diffs, self._decoded = self._decoded, []
+        pos = 0
+        end = len(buffer)
+        while pos < end:
+            # A varint length is incomplete as long as its last byte has the high bit set
+            try:
+                length, start = _read_varint(buffer, pos)
+            except IndexError:
+                break
+            if start + length > end:
+                break
+            try:
+                diff = self._frame(buffer, start, start + length)
+            except (BookCodecError, IndexError, UnicodeDecodeError) as e:
+                # Skip the frame, so later calls don't trip over it again
+                del buffer[:start + length]
+                self._decoded = diffs
+                if isinstance(e, BookCodecError):
+                    raise
+                raise BookCodecError("Malformed frame: %s" % e)
+            if diff is not None:
+                diffs.append(diff)
+            pos = start + length
+        del buffer[:pos]
+        return diffs
+
+    def _frame(self, data, pos, end):
+        kind = data[pos]
+        index, pos = _read_varint(data, pos + 1)
+        if kind == DEFINE:
+            symbol, pos = _read_string(data, pos)
+            tick, pos = _read_string(data, pos)
+            lot, pos = _read_string(data, pos)
+            if pos > end:
+                raise BookCodecError("Truncated frame")
+            self._symbols[index] = (symbol,) + _units(tick) + _units(lot)
+            return None
+        if kind not in (SNAPSHOT, UPDATE):
+            raise BookCodecError("Unknown frame type %r" % kind)
+        try:
+            symbol, tick, tick_scale, lot, lot_scale = self._symbols[index]
+        except KeyError:
+            raise BookCodecError("Book frame for undefined symbol index %s" % index)
+
+        sequence, pos = _read_varint(data, pos)
+        read_varint = _read_varint
+        sides = []
+        for _ in range(2):
+            count, pos = _read_varint(data, pos)
+            levels = []
+            append = levels.append
+            ticks = 0
+            for _ in range(count):
+                # Most deltas fit into a single byte, so skip the call for those
+                delta = data[pos]
+                if delta < 0x80:
+                    pos += 1
+                else:
+                    delta, pos = read_varint(data, pos)
+                ticks += -(delta >> 1) - 1 if delta & 1 else delta >> 1
+                size, pos = read_varint(data, pos)
+                append((ticks * tick / tick_scale, size * lot / lot_scale))
+            sides.append(levels)
+        if pos > end:
+            raise BookCodecError("Truncated frame")
+
+        gap = kind == UPDATE and sequence != self._sequences.get(symbol, 0) + 1
+        if gap:
+            self.gaps += 1
+            log.warning("Missed %s frames of %s", sequence - self._sequences.get(symbol, 0) - 1,
+                        symbol)
+        self._sequences[symbol] = sequence
+        return BookDiff(symbol, sequence, kind == SNAPSHOT, sides[0], sides[1], gap)
+
+
+def read_frames(f, chunk_size=65536):
+    """Yield the BookDiff objects of a binary file object written by :class:`BookPublisher`."""
+    decoder = BookDecoder()
+    while True:
+        data = f.read(chunk_size)
+        if not data:
+            return
+        yield from decoder.feed(data)
+
+
+class BookPublisher:
+    """Stream handler writing the changes of the connector's order books to a binary sink.
+
+    The sink is any object with a ``write()`` method taking bytes - a file opened in ``'wb'`` mode,
+    or a socket's ``makefile('wb')``. It is written to from the connector's websocket thread, so it
+    should not block for long.
+
+    A symbol's first frame is a snapshot of the book as the connector maintains it, so a publisher
+    can be added while the stream is running already; after that, each message's levels are sent
+    as they are. Messages of symbols without a known tick size are skipped.
+
+    Register it via :meth:`hitbtc_wss.connector.HitBTCConnector.add_handler`.
+    """
+
+    def __init__(self, books, metadata, sink, symbols=None):
+        """Initialize a BookPublisher instance.
+
+        :param books: mapping of symbols to OrderBook objects, updated before handlers are called
+        :param metadata: MetadataCache to look up tick sizes and quantity increments in
+        :param sink: binary file-like object to write frames to
+        :param symbols: symbols to publish; all if None
+        """
+        self.books = books
+        self.sink = sink
+        self.symbols = set(symbols) if symbols is not None else None
+        self.encoder = BookEncoder(metadata)
+        self.frames = 0
+        self.bytes = 0
+        self._published = {}
+        self._skipped = set()
+
+    def __call__(self, method, symbol, params):
+        """Encode and write an order book message."""
+        if method not in ('snapshotOrderbook', 'updateOrderbook'):
+            return
+        if self.symbols is not None and symbol not in self.symbols:
+            return
+        sequence = params.get('sequence')
+        try:
+            if method == 'snapshotOrderbook':
+                frames = self.encoder.encode_message(method, params)
+            elif symbol in self._published:
+                # Skip updates the connector's book rejected as stale, just like consumers would
+                last = self._published[symbol]
+                if sequence is not None and last is not None and sequence <= last:
+                    return
+                frames = self.encoder.encode_message(method, params)
+            else:
+                book = self.books[symbol]
+                bids, asks = book.top(max(len(book.bids), len(book.asks)))
+                frames = self.encoder.encode(symbol, bids, asks, True)
+                sequence = book.sequence
+        except BookCodecError as e:
+            if symbol not in self._skipped:
+                log.warning("Not publishing %s: %s", symbol, e)
+                self._skipped.add(symbol)
+            return
+        self._published[symbol] = sequence
+        self.sink.write(frames)
+        self.frames += 1
+        self.bytes += len(frames)
+
+    def reset(self):
+        """Start over, e.g. after replacing the sink: symbols are defined and snapshotted again."""
+        self.encoder.reset()
+        self._published = {}
+        self._skipped = set()
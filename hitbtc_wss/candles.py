@@ -0,0 +1,143 @@
+"""Candle aggregation from streamed trades."""
+
+# Import Built-Ins
+import logging
+from collections import defaultdict, deque
+
+# Import Homebrew
+from hitbtc_wss.utils import parse_timestamp
+
+# Init Logging Facilities
+log = logging.getLogger(__name__)
+
+
+class Bar:
+    """OHLCV bar; ``start`` is its opening and ``end`` its last trade's time, in ms since epoch."""
+
+    __slots__ = ('start', 'end', 'open', 'high', 'low', 'close', 'volume', 'trades')
+
+    def __init__(self, start, price, quantity):
+        """Initialize a Bar from its first trade."""
+        self.start = self.end = start
+        self.open = self.high = self.low = self.close = price
+        self.volume = quantity
+        self.trades = 1
+
+    def add(self, timestamp, price, quantity):
+        """Add a trade to the bar."""
+        self.end = timestamp
+        self.close = price
+        if price > self.high:
+            self.high = price
+        elif price < self.low:
+            self.low = price
+        self.volume += quantity
+        self.trades += 1
+
+    def __repr__(self):
+        return 'Bar(start=%r, open=%r, high=%r, low=%r, close=%r, volume=%r, trades=%r)' % (
+            self.start, self.open, self.high, self.low, self.close, self.volume, self.trades)
+
+
+class CandleAggregator:
+    """Maintain candles of arbitrary kind and size per symbol, from the trades stream.
+
+    Bars are specified as ``(kind, size)`` tuples:
+
+        ('time', seconds)   - bars spanning a fixed time interval, aligned to the epoch
+        ('volume', amount)  - bars closing once their volume reaches ``amount``
+        ('tick', count)     - bars closing after ``count`` trades
+
+    Time bars are only created for intervals that saw trades, and trades are never split across
+    volume bars. Each trade costs O(1) per bar spec; completed bars are kept in ring buffers of
+    ``history`` bars per symbol and spec, and passed to ``on_bar(symbol, spec, bar)`` if given.
+
+    Trades with an id not newer than the last one aggregated for their symbol - such as those
+    resent in the ``snapshotTrades`` following a reconnect - are skipped.
+
+    Instances are callable with ``(method, symbol, params)`` and can thus be registered via
+    :meth:`hitbtc_wss.connector.HitBTCConnector.add_handler`.
+    """
+
+    def __init__(self, specs, history=None, on_bar=None):
+        """Initialize a CandleAggregator instance.
+
+        :param specs: iterable of ``(kind, size)`` tuples
+        :param history: number of completed bars to keep per symbol and spec; defaults to 1000
+        :param on_bar: callable, invoked with ``(symbol, spec, bar)`` for every completed bar
+        """
+        self.specs = []
+        for kind, size in specs:
+            if kind not in ('time', 'volume', 'tick'):
+                raise ValueError("Unknown bar kind %r!" % kind)
+            self.specs.append((kind, size))
+        self.bars = {}
+        self.history = defaultdict(lambda: deque(maxlen=history or 1000))
+        self.on_bar = on_bar
+        self.last_ids = {}
+
+    def __call__(self, method, symbol, params):
+        """Feed ``snapshotTrades`` and ``updateTrades`` stream items to the aggregator."""
+        if method in ('snapshotTrades', 'updateTrades'):
+            for trade in params['data']:
+                self.add_trade(symbol, parse_timestamp(trade['timestamp']),
+                               float(trade['price']), float(trade['quantity']), trade['id'])
+
+    def add_trade(self, symbol, timestamp, price, quantity, trade_id=None):
+        """Add a single trade to all bars of ``symbol``.
+
+        :param symbol: symbol id
+        :param timestamp: trade time in milliseconds since epoch
+        :param price: float
+        :param quantity: float
+        :param trade_id: trade id; the trade is skipped if it's not newer than the last one
+        :return: False if the trade was skipped
+        """
+        if trade_id is not None:
+            if trade_id <= self.last_ids.get(symbol, -1):
+                return False
+            self.last_ids[symbol] = trade_id
+        for spec in self.specs:
+            kind, size = spec
+            key = (symbol, spec)
+            bar = self.bars.get(key)
+            if bar is None:
+                self._open(key, kind, size, timestamp, price, quantity)
+                continue
+            if kind == 'time':
+                if timestamp - bar.start >= size * 1000:
+                    self._close(key)
+                    self._open(key, kind, size, timestamp, price, quantity)
+                    continue
+                elif timestamp < bar.start:
+                    # Trade predates the current bar; its bar was closed already
+                    continue
+            bar.add(timestamp, price, quantity)
+            if kind == 'volume' and bar.volume >= size or kind == 'tick' and bar.trades >= size:
+                self._close(key)
+        return True
+
+    def _open(self, key, kind, size, timestamp, price, quantity):
+        if kind == 'time':
+            interval = size * 1000
+            bar = Bar(timestamp - timestamp % interval, price, quantity)
+            bar.end = timestamp
+        else:
+            bar = Bar(timestamp, price, quantity)
+        self.bars[key] = bar
+        if kind == 'volume' and quantity >= size or kind == 'tick' and size <= 1:
+            self._close(key)
+
+    def _close(self, key):
+        bar = self.bars.pop(key)
+        self.history[key].append(bar)
+        if self.on_bar:
+            self.on_bar(key[0], key[1], bar)
+
+    def current(self, symbol, spec):
+        """Return the bar currently being built for ``symbol`` and ``spec``, or None."""
+        return self.bars.get((symbol, spec))
+
+    def candles(self, symbol, spec):
+        """Return the completed bars for ``symbol`` and ``spec``, oldest first."""
+        return list(self.history[(symbol, spec)])
@@ -1,11 +1,18 @@
 """Client Object to connect to API and relevant Exceptions."""
 # Import Built-Ins
 import logging
+import uuid
+from collections import Counter
+from queue import Empty
 
 # Import Third-Party
 
 # Import Homebrew
 from hitbtc_wss.connector import HitBTCConnector
+from hitbtc_wss.risk import RiskEngine
+from hitbtc_wss.views import BookView
+from hitbtc_wss.bookcodec import BookPublisher
+from hitbtc_wss import state
 
 # Init Logging Facilities
 log = logging.getLogger(__name__)
@@ -36,16 +43,78 @@ class HitBTC:
         :param stdout_only: Bool, passing True will turn off placing data on self.conn.q
         :param silent: Bool, passing True turns off print() arguments
         :param url: URL of the websocket API. Defaults to wss://api.hitbtc.com/api/2/ws
-        :param conn_ops: Optional Kwargs to pass to the HitBTCConnector object
+        :param conn_ops: Optional Kwargs to pass to the HitBTCConnector object, e.g.
+                         ``metadata_path`` to persist symbol and currency metadata
         """
         self.conn = HitBTCConnector(url, raw, stdout_only, silent, **conn_ops)
+        self.risk = RiskEngine(self.conn.orders, self.conn.books)
         self.key = key
         self.secret = secret
+        self._book_views = Counter()
 
     def recv(self, block=True, timeout=None):
         """Retrieve data from the connector queue."""
         return self.conn.recv(block, timeout)
 
+    def recv_many(self, max_items=None, timeout=None):
+        """Retrieve up to ``max_items`` items from the connector queue at once.
+
+        See :meth:`hitbtc_wss.wss.WebSocketConnector.recv_many`.
+        """
+        return self.conn.recv_many(max_items, timeout)
+
+    def stream(self, batch_size=None, timeout=None):
+        """Yield items from the connector queue, draining it in batches of up to ``batch_size``.
+
+        :param batch_size: maximum number of items to take from the queue at once
+        :param timeout: stop after waiting this many seconds without data; never stop if None
+        """
+        while True:
+            try:
+                items = self.conn.recv_many(batch_size, timeout)
+            except Empty:
+                return
+            yield from items
+
+    @property
+    def orders(self):
+        """Return the local :class:`hitbtc_wss.orders.OrderTracker`.
+
+        It is kept up to date from ``report`` messages (see ``subscribe_reports()``) and order
+        responses. Call ``request_active_orders()`` after reconnecting to reconcile it.
+        """
+        return self.conn.orders
+
+    @property
+    def balances(self):
+        """Return the local :class:`hitbtc_wss.balances.BalanceCache`.
+
+        It is seeded on login, updated from ``trade`` reports and re-seeded periodically in the
+        background. Fills can only be applied for symbols requested via ``request_symbols()``.
+        """
+        return self.conn.balances
+
+    @property
+    def metadata(self):
+        """Return the local :class:`hitbtc_wss.metadata.MetadataCache`."""
+        return self.conn.metadata
+
+    def add_handler(self, handler):
+        """Register a stream handler, such as a :class:`hitbtc_wss.candles.CandleAggregator`.
+
+        See :meth:`hitbtc_wss.connector.HitBTCConnector.add_handler`.
+        """
+        self.conn.add_handler(handler)
+
+    def remove_handler(self, handler):
+        """Unregister a previously added stream handler."""
+        self.conn.remove_handler(handler)
+
+    @property
+    def subscriptions(self):
+        """Return the :class:`hitbtc_wss.subscriptions.SubscriptionRegistry` of the connection."""
+        return self.conn.subscriptions
+
     @property
     def credentials_given(self):
         """Assert if credentials are complete."""
@@ -59,6 +128,22 @@ class HitBTC:
         """Stop the websocket connection."""
         self.conn.stop()
 
+    def save_state(self, path):
+        """Save subscriptions, metadata and open orders to ``path``.
+
+        See :func:`hitbtc_wss.state.save`.
+        """
+        state.save(self.conn, path)
+
+    def restore_state(self, path):
+        """Restore the state saved via ``save_state()``; call this before ``start()``.
+
+        See :func:`hitbtc_wss.state.restore`.
+
+        :return: True if the state was restored, False if ``path`` does not exist
+        """
+        return state.load(self.conn, path)
+
     def is_connected(self):
         return self.conn._is_connected
         
@@ -92,6 +177,14 @@ class HitBTC:
         """
         self.conn.send('getSymbols', custom_id, **params)
 
+    def refresh_metadata(self, force=False):
+        """
+        Fetch symbols and currencies into the metadata cache, unless it is still fresh.
+
+        The responses update ``metadata`` only and are neither printed nor put on the queue.
+        """
+        self.conn.refresh_metadata(force)
+
     def request_trades(self, custom_id=None, **params):
         """
         Request trades executed at HitBTC.
@@ -140,55 +233,140 @@ class HitBTC:
     def subscribe_ticker(self, cancel=False, custom_id=None, **params):
         """Request a stream for ticker data.
 
+        Subscriptions are reference-counted, and requests are queued to be sent at a paced rate
+        by :attr:`subscriptions`. Returns True if a request was queued, and False if the call only
+        changed the reference count of an existing subscription; no request, and no response for
+        ``custom_id``, is sent then.
+
         Offical Endpoint Documentation:
             https://api.hitbtc.com/?python#subscribe-to-ticker
         """
-        method = 'subscribeTicker'
         if cancel:
-            method = 'un' + method
-        self.conn.send(method, custom_id=custom_id, **params)
+            return self.conn.subscriptions.unsubscribe('subscribeTicker', custom_id, **params)
+        return self.conn.subscriptions.subscribe('subscribeTicker', custom_id, **params)
 
     def subscribe_book(self, cancel=False, custom_id=None, **params):
         """Request a stream for order book data.
 
+        Subscriptions are reference-counted, and requests are queued to be sent at a paced rate
+        by :attr:`subscriptions`. Returns True if a request was queued, and False if the call only
+        changed the reference count of an existing subscription; no request, and no response for
+        ``custom_id``, is sent then.
+
         Offical Endpoint Documentation:
             https://api.hitbtc.com/?python#subscribe-to-orderbook
         """
-        method = 'subscribeOrderbook'
         if cancel:
-            method = 'un' + method
-        self.conn.send(method, custom_id=custom_id, **params)
+            sent = self.conn.subscriptions.unsubscribe('subscribeOrderbook', custom_id, **params)
+        else:
+            sent = self.conn.subscriptions.subscribe('subscribeOrderbook', custom_id, **params)
+        self._update_handler_only(params.get('symbol'))
+        return sent
+
+    def book_view(self, symbol, depth=None, max_rate=None, threshold=None, maxsize=None):
+        """Return a :class:`hitbtc_wss.views.BookView` of ``symbol``'s order book.
+
+        The view shares the order book subscription with ``subscribe_book()`` and all other views
+        of the symbol. As long as the symbol's book is only subscribed to via views, its updates are
+        not put on the client's queue. Pass the view to ``close_view()`` once it's no longer needed.
+
+        :param depth: number of levels per side; defaults to 1
+        :param max_rate: maximum items per second; unlimited if None
+        :param threshold: minimum change of best bid or ask price; any change if None
+        :param maxsize: size of the view's queue; defaults to 100
+        """
+        view = BookView(self.conn.books, symbol, depth, max_rate, threshold, maxsize)
+        self.conn.add_handler(view)
+        self._book_views[symbol] += 1
+        self.conn.subscriptions.subscribe('subscribeOrderbook', symbol=symbol)
+        self._update_handler_only(symbol)
+        return view
+
+    def close_view(self, view):
+        """Stop updating a view returned by ``book_view()`` and release its subscription."""
+        self.conn.remove_handler(view)
+        self._book_views[view.symbol] -= 1
+        if not self._book_views[view.symbol]:
+            del self._book_views[view.symbol]
+        self.conn.subscriptions.unsubscribe('subscribeOrderbook', symbol=view.symbol)
+        self._update_handler_only(view.symbol)
+
+    def publish_books(self, sink, symbols=None):
+        """Write changes of the maintained order books to ``sink`` in a compact binary encoding.
+
+        See :class:`hitbtc_wss.bookcodec.BookPublisher`; remove the returned publisher via
+        ``conn.remove_handler()`` to stop. Subscribe to the books as usual.
+
+        :param sink: binary file-like object, e.g. a file or a socket's ``makefile('wb')``
+        :param symbols: symbols to publish; all subscribed books if None
+        """
+        publisher = BookPublisher(self.conn.books, self.conn.metadata, sink, symbols)
+        self.conn.add_handler(publisher)
+        return publisher
+
+    def _update_handler_only(self, symbol):
+        """Keep ``symbol``'s book off the queue while it's only subscribed to via views."""
+        key = ('Orderbook', symbol, None)
+        views = self._book_views[symbol]
+        if views and self.conn.subscriptions.active().get(key, 0) == views:
+            self.conn.handler_only.add(symbol)
+        else:
+            self.conn.handler_only.discard(symbol)
 
     def subscribe_trades(self, cancel=False, custom_id=None, **params):
         """Request a stream for trade data.
 
+        Subscriptions are reference-counted, and requests are queued to be sent at a paced rate
+        by :attr:`subscriptions`. Returns True if a request was queued, and False if the call only
+        changed the reference count of an existing subscription; no request, and no response for
+        ``custom_id``, is sent then.
+
         Offical Endpoint Documentation:
             https://api.hitbtc.com/?python#subscribe-to-trades
         """
-        method = 'subscribeTrades'
         if cancel:
-            method = 'un' + method
-        self.conn.send(method, custom_id=custom_id, **params)
+            return self.conn.subscriptions.unsubscribe('subscribeTrades', custom_id, **params)
+        return self.conn.subscriptions.subscribe('subscribeTrades', custom_id, **params)
 
     def subscribe_candles(self, cancel=False, custom_id=None, **params):
         """Request a stream for candle data.
 
+        Subscriptions are reference-counted, and requests are queued to be sent at a paced rate
+        by :attr:`subscriptions`. Returns True if a request was queued, and False if the call only
+        changed the reference count of an existing subscription; no request, and no response for
+        ``custom_id``, is sent then.
+
         Offical Endpoint Documentation:
             https://api.hitbtc.com/?python#subscribe-to-candles
         """
-        method = 'subscribeCandles'
         if cancel:
-            method = 'un' + method
-        self.conn.send(method, custom_id=custom_id, **params)
+            return self.conn.subscriptions.unsubscribe('subscribeCandles', custom_id, **params)
+        return self.conn.subscriptions.subscribe('subscribeCandles', custom_id, **params)
+
+    def set_risk_limits(self, symbol=None, **limits):
+        """
+        Set pre-trade risk limits for ``symbol``, or the default limits if no symbol is given.
+
+        See :class:`hitbtc_wss.risk.RiskLimits` for the available limits.
+        """
+        self.risk.set_limits(symbol, **limits)
 
     def place_order(self, custom_id=None, **params):
         """
         Place a new order via Websocket.
 
+        The order is checked against the limits set via ``set_risk_limits()`` first, and never
+        sent if it breaches one of them. Orders without a ``clientOrderId`` are given one, so they
+        count against the limits until acknowledged.
+
+        :raises hitbtc_wss.risk.RiskError: if the order breaches a risk limit
+
         Offical Endpoint Documentation:
             https://api.hitbtc.com/?python#place-new-order
         """
-        self.conn.send('newOrder', custom_id=custom_id, **params)
+        params.setdefault('clientOrderId', uuid.uuid4().hex)
+        self.risk.check(params)
+        self._send_reserved('newOrder', custom_id, params['clientOrderId'], params)
 
     def cancel_order(self, custom_id=None, **params):
         """
@@ -203,7 +381,22 @@ class HitBTC:
         """
         Replace an existing order via Websocket.
 
+        The replacing order is checked against the risk limits of the original order's symbol.
+
+        :raises hitbtc_wss.risk.RiskError: if the replacing order breaches a risk limit
+
         Offical Endpoint Documentation:
             https://api.hitbtc.com/?python#cancel-replace-orders
         """
-        self.conn.send('cancelReplaceOrder', custom_id=custom_id, **params)
+        self.risk.check_replace(params)
+        self._send_reserved('cancelReplaceOrder', custom_id, params.get('requestClientId'), params)
+
+    def _send_reserved(self, method, custom_id, client_order_id, params):
+        """Send an order request, releasing its risk reservation if it could not be sent."""
+        try:
+            sent = self.conn.send(method, custom_id=custom_id, **params)
+        except Exception:
+            self.conn.orders.release(client_order_id)
+            raise
+        if not sent:
+            self.conn.orders.release(client_order_id)
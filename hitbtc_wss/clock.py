@@ -0,0 +1,136 @@
+"""Receive timestamps and exchange clock offset estimation."""
+
+# Import Built-Ins
+import logging
+import time
+from collections import deque, OrderedDict
+
+# Import Homebrew
+from hitbtc_wss.utils import parse_timestamp
+
+# Init Logging Facilities
+log = logging.getLogger(__name__)
+
+
+class Stamp:
+    """Timing information attached to a delivered message.
+
+    :ivar received_ns: ``time.perf_counter_ns()`` when the frame was received, for intervals
+    :ivar received_at: ``time.time()`` when the frame was received, comparable to ``exchange_ts``
+    :ivar exchange_ts: exchange timestamp of the message in ms since epoch, if it carries one
+    :ivar offset: estimated exchange clock minus local clock, in seconds, at time of reception;
+                  None until there is an estimate
+    """
+
+    __slots__ = ('received_ns', 'received_at', 'exchange_ts', 'offset')
+
+    def __init__(self, received_ns, received_at, exchange_ts, offset):
+        """Initialize the instance."""
+        self.received_ns = received_ns
+        self.received_at = received_at
+        self.exchange_ts = exchange_ts
+        self.offset = offset
+
+    @property
+    def latency(self):
+        """Seconds between the exchange stamping the message and its reception, or None.
+
+        The exchange timestamp is corrected by the clock offset, if there is an estimate.
+        """
+        if self.exchange_ts is None:
+            return None
+        return self.received_at - (self.exchange_ts / 1000 - (self.offset or 0.0))
+
+    def __repr__(self):
+        return 'Stamp(received_at=%r, exchange_ts=%r, offset=%r)' % (
+            self.received_at, self.exchange_ts, self.offset)
+
+
+def exchange_time(method, params):
+    """Return the exchange timestamp of a stream message in ms since epoch, or None.
+
+    Candle messages return None: their timestamps are the candles' open times, not the time of
+    the event.
+    """
+    if method == 'ticker':
+        return parse_timestamp(params['timestamp'])
+    elif method == 'report':
+        return parse_timestamp(params['updatedAt'])
+    elif method in ('snapshotTrades', 'updateTrades'):
+        data = params['data']
+        return parse_timestamp(data[-1]['timestamp']) if data else None
+    return None
+
+
+class ClockSync:
+    """Estimate the exchange's clock offset from request round trips.
+
+    Every request is registered via ``sent()`` and its response via ``received()``. Responses that
+    carry an exchange timestamp (e.g. the ``updatedAt`` of order responses) yield an offset sample,
+    assuming the exchange stamped it halfway through the round trip. The estimate is taken from
+    the sample with the lowest round trip time among the last ``window`` samples, as it has the
+    smallest error bound. ``offset`` is None until the first sample.
+
+    Requests left unanswered for ``max_age`` seconds are forgotten.
+    """
+
+    def __init__(self, window=None, max_age=None):
+        """Initialize a ClockSync instance.
+
+        :param window: number of offset samples to consider; defaults to 32
+        :param max_age: seconds after which unanswered requests are forgotten; defaults to 60
+        """
+        self._sent = OrderedDict()
+        self._samples = deque(maxlen=window or 32)
+        self.max_age = max_age or 60
+        self.offset = None
+        self.rtt = None
+        self.min_rtt = None
+
+    def sent(self, request_id):
+        """Register the sending of a request."""
+        now_ns = time.perf_counter_ns()
+        sent = self._sent
+        sent[request_id] = (now_ns, time.time())
+        sent.move_to_end(request_id)
+        # Entries are in order of sending, so expired ones are at the front
+        expired = now_ns - int(self.max_age * 1e9)
+        while sent:
+            request_id, (sent_ns, _) = next(iter(sent.items()))
+            if sent_ns >= expired:
+                break
+            del sent[request_id]
+
+    def discard(self, request_id):
+        """Forget a request that failed to send or will not be answered."""
+        self._sent.pop(request_id, None)
+
+    def received(self, request_id, received_ns=None, received_at=None, exchange_ts=None):
+        """Register the response to a request.
+
+        :param request_id: ID of the request
+        :param received_ns: ``time.perf_counter_ns()`` at reception; defaults to now
+        :param received_at: ``time.time()`` at reception; defaults to now
+        :param exchange_ts: exchange timestamp in the response, in ms since epoch
+        :return: round trip time in ns, or None if the request is unknown
+        """
+        try:
+            sent_ns, sent_at = self._sent.pop(request_id)
+        except KeyError:
+            return None
+        received_ns = received_ns or time.perf_counter_ns()
+        received_at = received_at or time.time()
+        self.rtt = rtt = received_ns - sent_ns
+        if self.min_rtt is None or rtt < self.min_rtt:
+            self.min_rtt = rtt
+        if exchange_ts is not None:
+            self._samples.append((rtt, exchange_ts / 1000 - (sent_at + received_at) / 2))
+            self.offset = min(self._samples)[1]
+        return rtt
+
+    def to_local(self, exchange_ts):
+        """Convert an exchange timestamp in ms since epoch to local ``time.time()`` seconds.
+
+        Without an offset estimate, the clocks are assumed to agree.
+        """
+        return exchange_ts / 1000 - (self.offset or 0.0)
@@ -1,18 +1,33 @@
-"""HitBTC Connector which pre-formats incoming data to the CTS standard."""
+"""HitBTC Connector, which keeps local state from incoming data before passing it on."""
 
 import logging
 import time
 import json
 import hmac
 import hashlib
+import uuid
 from threading import Timer
-from collections import defaultdict
+from itertools import count
 
 from hitbtc_wss.wss import WebSocketConnectorThread
-from hitbtc_wss.utils import response_types
+from hitbtc_wss.utils import response_types, parse_timestamp
+from hitbtc_wss.orders import OrderTracker
+from hitbtc_wss.balances import BalanceCache
+from hitbtc_wss.metadata import MetadataCache
+from hitbtc_wss.records import to_record
+from hitbtc_wss.book import OrderBook
+from hitbtc_wss.subscriptions import SubscriptionRegistry
+from hitbtc_wss.clock import ClockSync, Stamp, exchange_time
+from hitbtc_wss.journal import Journal, JOURNALED_METHODS
+from hitbtc_wss.profiling import StageTimer, SamplingProfiler
+from hitbtc_wss.dedup import Deduplicator
+from hitbtc_wss.schema import HitBTCAdapter
 
 log = logging.getLogger(__name__)
 
+# Methods timed by HitBTCConnector.enable_profiling()
+PROFILED_STAGES = ('_on_message', '_handle_response', '_handle_stream', '_update_state', 'put')
+
 
 class HitBTCConnector(WebSocketConnectorThread):
     """Class to pre-process HitBTC data, before putting it on the internal queue.
@@ -29,24 +44,108 @@ class HitBTCConnector(WebSocketConnectorThread):
     Stream items on the queue are formatted as:
         (method, symbol, params)
 
+    Execution reports and order responses are additionally applied to ``orders``, an
+    :class:`hitbtc_wss.orders.OrderTracker` holding the state of our own orders, and to
+    ``balances``, a :class:`hitbtc_wss.balances.BalanceCache`. Once logged in, the balance cache is
+    re-seeded from ``getTradingBalance`` every ``balance_interval`` seconds in the background.
+    Symbol and currency results are kept in ``metadata``, a
+    :class:`hitbtc_wss.metadata.MetadataCache` persisted to ``metadata_path``, if given.
+
+    Market data subscriptions are tracked by ``subscriptions``, a
+    :class:`hitbtc_wss.subscriptions.SubscriptionRegistry` sending at most ``subscribe_rate``
+    requests per second, and are restored whenever the connection (re-)opens.
+
+    Order book streams are applied to ``books``, a dict of :class:`hitbtc_wss.book.OrderBook`
+    objects by symbol. Order book items of symbols in ``handler_only`` are only passed to handlers
+    and not put on the queue, e.g. if they're only consumed via :mod:`hitbtc_wss.views`.
+
+    Callables registered via ``add_handler()`` are invoked with ``(method, symbol, params)`` for
+    every stream item, on the websocket thread, before the item is put on the queue.
+
+    Passing ``records=True`` replaces the ``params`` of stream items on the queue with the compact
+    record types of :mod:`hitbtc_wss.records`; handlers and local state still see the dicts.
+    Passing ``normalize=True`` instead replaces them with a list of the exchange-independent
+    events of :mod:`hitbtc_wss.schema`, for the methods that have one; items of symbols missing
+    from the metadata are dropped. Since normalizing needs the metadata, it is requested whenever
+    a connection opens and the cache isn't fresh. The two options are mutually exclusive.
+
+    Passing ``dedup=True`` drops trades and execution reports seen before - as resent in the
+    ``snapshotTrades`` following a reconnect - ahead of handlers and the queue, remembering the
+    last ``dedup_capacity`` per symbol; see :class:`hitbtc_wss.dedup.Deduplicator`.
+
+    Passing ``timestamps=True`` appends a :class:`hitbtc_wss.clock.Stamp` to every item on the
+    queue, carrying the monotonic and wall clock receive times, the message's exchange timestamp
+    and the exchange clock offset estimated by ``clock``, a :class:`hitbtc_wss.clock.ClockSync` fed
+    from request round trips.
+
+    Passing a ``journal_path`` journals all order requests and their responses to a
+    :class:`hitbtc_wss.journal.Journal`. ``newOrder`` requests without a ``clientOrderId`` are
+    given one, so they can be identified after a crash. They're only sent once their journal
+    record is on disk. Requests left in flight by a previous run are resolved against the active
+    orders once they're known (after logging in, the connector requests them itself), and the
+    outcome is put on the queue as:
+        ('recovered', None, [(request, active order report or None), ...])
+
+    ``enable_profiling()`` times the processing stages of every message, and optionally samples
+    the stack of the websocket thread; see :mod:`hitbtc_wss.profiling`.
+
+    Unless ``raw=True`` is passed, frames are handed to the JSON decoder as bytes, skipping the
+    UTF-8 validation websocket-client would otherwise do per frame (see ``binary_frames`` of
+    :class:`hitbtc_wss.wss.WebSocketConnector`).
+
     You can disable extraction and handling by passing 'raw=True' on instantiation. Note that this
     will also turn off recording of sent requests, as well all logging activity.
     """
 
-    def __init__(self, url=None, raw=None, stdout_only=False, silent=False, **conn_ops):
+    def __init__(self, url=None, raw=None, stdout_only=False, silent=False, balance_interval=60,
+                 metadata_path=None, metadata_ttl=None, records=False, subscribe_rate=None,
+                 timestamps=False, journal_path=None, dedup=False, dedup_capacity=None,
+                 normalize=False, **conn_ops):
         """Initialize a HitBTCConnector instance."""
+        if records and normalize:
+            raise ValueError("records and normalize are mutually exclusive")
         url = url or 'wss://api.hitbtc.com/api/2/ws'
+        conn_ops.setdefault('binary_frames', not raw)
         super(HitBTCConnector, self).__init__(url, **conn_ops)
-        self.books = defaultdict(dict)
+        self.books = {}
         self.requests = {}
+        self.metadata = MetadataCache(metadata_path, metadata_ttl)
+        self.orders = OrderTracker()
+        self.balances = BalanceCache(self.metadata)
+        self.balance_interval = balance_interval
+        self.balance_timer = None
+        self.handlers = []
+        self.handler_only = set()
+        self.subscriptions = SubscriptionRegistry(self, rate=subscribe_rate)
+        self.clock = ClockSync()
+        self.timestamps = timestamps
+        self.journal = Journal(journal_path) if journal_path else None
+        self.dedup = Deduplicator(dedup_capacity) if dedup else None
+        self.stage_timer = None
+        self.profiler = None
+        self.probe_rtt = None
+        self.probe_sent_at = None
+        self._probe_id = None
+        self._received_ns = None
+        self._received_at = None
+        self._exchange_ts = None
+        self._internal_ids = count()
+        self._internal_requests = set()
         self.raw = raw
+        self.records = records
+        self.adapter = HitBTCAdapter(self.metadata) if normalize else None
         self.logged_in = False
+        self.reconcile_on_login = False
         self.silent = silent
         self.stdout_only = stdout_only
 
     def put(self, item, block=False, timeout=None):
         """Place the given item on the internal q."""
         if not self.stdout_only:
+            if self.timestamps:
+                stamp = Stamp(self._received_ns, self._received_at, self._exchange_ts,
+                              self.clock.offset)
+                item = item + (stamp,) if isinstance(item, tuple) else (item, stamp)
             self.q.put(item, block, timeout)
 
     def echo(self, msg):
@@ -54,6 +153,84 @@ class HitBTCConnector(WebSocketConnectorThread):
         if not self.silent:
             print(msg)
 
+    def _on_open(self, ws):
+        """Reset the login state, as sessions do not survive reconnects, and resubscribe."""
+        self.logged_in = False
+        self._probe_id = None
+        self.probe_sent_at = None
+        self._stop_balance_timer()
+        # Responses to orders sent over the previous connection are lost; those that went through
+        # show up as active orders again once logged in
+        self.orders.release_all()
+        super(HitBTCConnector, self)._on_open(ws)
+        if self.adapter is not None:
+            # Requested ahead of the subscriptions, whose items can't be normalized without it
+            self.refresh_metadata()
+        self.subscriptions.resubscribe()
+
+    def refresh_metadata(self, force=False):
+        """Fetch symbols and currencies into ``metadata``, unless it is still fresh."""
+        if force or not self.metadata.fresh:
+            self.send_internal('getSymbols')
+            self.send_internal('getCurrencies')
+
+    def disconnect(self):
+        """Stop background timers and disconnect."""
+        self._stop_balance_timer()
+        super(HitBTCConnector, self).disconnect()
+        if self.journal is not None:
+            self.journal.close()
+        if self.profiler is not None:
+            self.profiler.stop()
+
+    def enable_profiling(self, sample_interval=None):
+        """Time the processing stages in ``PROFILED_STAGES`` for every message.
+
+        Timings are accumulated in ``stage_timer``, a :class:`hitbtc_wss.profiling.StageTimer`.
+
+        :param sample_interval: if given, additionally sample the websocket thread's stack every
+                                ``sample_interval`` seconds via ``profiler``, a
+                                :class:`hitbtc_wss.profiling.SamplingProfiler`
+        :return: the StageTimer
+        """
+        if self.stage_timer is None:
+            self.stage_timer = StageTimer()
+            self.stage_timer.instrument(self, *PROFILED_STAGES)
+            if self.conn is not None:
+                self.conn.on_message = self._on_message
+        if sample_interval and self.profiler is None:
+            self.profiler = SamplingProfiler(self, sample_interval)
+            self.profiler.start()
+        return self.stage_timer
+
+    def disable_profiling(self):
+        """Remove the timing wrappers and stop the sampling profiler; results are kept."""
+        if self.stage_timer is not None:
+            StageTimer.uninstrument(self, *PROFILED_STAGES)
+            if self.conn is not None:
+                self.conn.on_message = self._on_message
+        if self.profiler is not None:
+            self.profiler.stop()
+
+    def _start_balance_timer(self):
+        """Schedule the next background reconciliation of the balance cache."""
+        self._stop_balance_timer()
+        if self.balance_interval:
+            self.balance_timer = Timer(self.balance_interval, self._sync_balances)
+            self.balance_timer.daemon = True
+            self.balance_timer.start()
+
+    def _stop_balance_timer(self):
+        """Stop the balance reconciliation timer."""
+        if self.balance_timer:
+            self.balance_timer.cancel()
+
+    def _sync_balances(self):
+        """Request trading balances without passing the response to the client."""
+        if self.logged_in:
+            self.send_internal('getTradingBalance')
+            self._start_balance_timer()
+
     def _start_timers(self):
         """Reset and start timers for API connection."""
         self._stop_timers()
@@ -70,6 +247,9 @@ class HitBTCConnector(WebSocketConnectorThread):
 
     def _on_message(self, ws, message):
         """Handle and pass received data to the appropriate handlers."""
+        self._received_ns = time.perf_counter_ns()
+        self._received_at = time.time()
+        self._exchange_ts = None
 
         self._stop_timer()
 
@@ -78,6 +258,8 @@ class HitBTCConnector(WebSocketConnectorThread):
             if 'jsonrpc' in decoded_message:
                 if 'result' in decoded_message or 'error' in decoded_message:
                     self._handle_response(decoded_message)
+                elif decoded_message.get('method') == 'activeOrders':
+                    self._handle_active_orders(decoded_message['params'])
                 else:
                     try:
                         method = decoded_message['method']
@@ -112,11 +294,67 @@ class HitBTCConnector(WebSocketConnectorThread):
             log.error("Could not find Request relating to Response object %s", response)
             raise
 
-        if 'result' in response:
+        if self.journal is not None:
+            self.journal.record_response(response)
+        if 'error' in response and request['method'] in ('newOrder', 'cancelReplaceOrder'):
+            params = request['params']
+            self.orders.release(params.get('requestClientId') or params.get('clientOrderId'))
+
+        result = response.get('result')
+        if isinstance(result, dict) and 'updatedAt' in result:
+            self._exchange_ts = parse_timestamp(result['updatedAt'])
+        rtt = self.clock.received(i_d, self._received_ns, self._received_at, self._exchange_ts)
+        if i_d == self._probe_id:
+            self.probe_rtt = rtt
+            self.probe_sent_at = None
+            self._probe_id = None
+
+        if i_d in self._internal_requests:
+            self._internal_requests.discard(i_d)
+            if 'result' in response:
+                self._update_state(request['method'], response['result'])
+            else:
+                self.log.error("Internal %s request failed: %r", request['method'],
+                               response['error'])
+        elif 'result' in response:
             self._handle_request_response(request, response)
         elif 'error' in response:
             self._handle_error(request, response)
 
+    def _update_state(self, method, result):
+        """Update the locally held state from the result of a request."""
+        if method in ('newOrder', 'cancelOrder', 'cancelReplaceOrder'):
+            self.orders.apply(result)
+        elif method == 'getOrders':
+            self.orders.reconcile(result)
+            self._resolve_journal(result)
+        elif method == 'getTradingBalance':
+            self.balances.seed(result)
+        elif method == 'getSymbols':
+            self.metadata.update_symbols(result)
+        elif method == 'getSymbol':
+            self.metadata.update_symbol(result)
+        elif method == 'getCurrencies':
+            self.metadata.update_currencies(result)
+        elif method == 'getCurrency':
+            self.metadata.update_currency(result)
+        elif method == 'login':
+            self.logged_in = True
+            self._sync_balances()
+            if self.reconcile_on_login or (self.journal is not None and self.journal.recovered):
+                self.reconcile_on_login = False
+                self.send_internal('getOrders')
+
+    def _resolve_journal(self, active_orders):
+        """Resolve requests recovered from the journal and put the outcome on the queue."""
+        if self.journal is None or not self.journal.recovered:
+            return
+        resolved = self.journal.resolve(active_orders)
+        for request, report in resolved:
+            self.log.warning("Recovered %s request %r: order %s", request['method'], request['id'],
+                             'active' if report is not None else 'not active')
+        self.put(('recovered', None, resolved))
+
     def _handle_request_response(self, request, response):
         """
         Handle responses to succesful requests.
@@ -134,7 +372,15 @@ class HitBTCConnector(WebSocketConnectorThread):
             log.exception(e)
             log.error("Response's method %s is unknown to the client! %s", method, response)
             return
-        print(request)
+        # Nobody would see the text if silent; formatting e.g. 1000 trades per getTrades is costly
+        if not self.silent or self.log.isEnabledFor(logging.INFO):
+            self._echo_response(method, msg, request, response)
+        self._update_state(method, response['result'])
+        self.log.debug("Request: %r, Response: %r", request, response)
+        self.put(('Response', 'Success', (request, response)))
+
+    def _echo_response(self, method, msg, request, response):
+        """Log and print the formatted message of a successful request's response."""
         if method.startswith('subscribe'):
             if 'symbol' in request['params']:
                 formatted_msg = msg.format(symbol=request['params']['symbol'])
@@ -165,8 +411,6 @@ class HitBTCConnector(WebSocketConnectorThread):
                     text += msg.format(response['result'])
                 self.log.info(text)
                 self.echo(text)
-        self.log.debug("Request: %r, Response: %r", request, response)
-        self.put(('Response', 'Success', (request, response)))
 
     def _handle_error(self, request, response):
         """
@@ -184,10 +428,54 @@ class HitBTCConnector(WebSocketConnectorThread):
         self.echo(err_message)
         self.put(('Response', 'Failure', (request, response)))
 
+    def _handle_active_orders(self, orders):
+        """Handle the list of active orders sent after subscribing to reports."""
+        self.orders.reconcile(orders)
+        self._resolve_journal(orders)
+        self.put(('activeOrders', None, orders))
+
     def _handle_stream(self, method, symbol, params):
         """Handle streamed data."""
+        if self.dedup is not None and not self.dedup.filter(method, symbol, params):
+            return
+        if self.timestamps:
+            self._exchange_ts = exchange_time(method, params)
+        if method == 'report':
+            self.orders.apply(params)
+            self.balances.apply(params)
+        elif method in ('snapshotOrderbook', 'updateOrderbook'):
+            book = self.books.get(symbol)
+            if book is None:
+                book = self.books[symbol] = OrderBook(symbol)
+            if method == 'snapshotOrderbook':
+                book.apply_snapshot(params)
+            else:
+                book.apply_update(params)
+        for handler in self.handlers:
+            try:
+                handler(method, symbol, params)
+            except Exception as e:
+                self.log.exception("Handler %r failed on %s for %s: %s", handler, method, symbol, e)
+        if symbol in self.handler_only and method in ('snapshotOrderbook', 'updateOrderbook'):
+            return
+        if self.adapter is not None:
+            events = self.adapter.convert(method, params)
+            if events is not None:
+                if not events:
+                    return
+                params = events
+        elif self.records:
+            params = to_record(method, params)
         self.put((method, symbol, params))
 
+    def add_handler(self, handler):
+        """Register a callable to be invoked with ``(method, symbol, params)`` per stream item."""
+        self.handlers.append(handler)
+
+    def remove_handler(self, handler):
+        """Unregister a previously added handler."""
+        self.handlers.remove(handler)
+
     def send(self, method, custom_id=None, **params):
         """
         Send the given Payload to the API via the websocket connection.
@@ -195,15 +483,60 @@ class HitBTCConnector(WebSocketConnectorThread):
         :param method: JSONRPC method to call
         :param custom_id: custom ID to identify response messages relating to this request
         :param kwargs: payload parameters as key=value pairs
+        :return: True if the payload was sent
         """
         if not self._is_connected:
             self.echo("Cannot Send payload - Connection not established!")
-            return
+            return False
         payload = {'method': method, 'params': params, 'id': custom_id or int(10000 * time.time())}
         if not self.raw:
             self.requests[payload['id']] = payload
+            if self.journal is not None and method in JOURNALED_METHODS:
+                if method == 'newOrder' and 'clientOrderId' not in params:
+                    params['clientOrderId'] = uuid.uuid4().hex
+                # Write-ahead: the request must be on disk before it can reach the exchange
+                sequence = self.journal.record_request(payload)
+                if not self.journal.sync(sequence=sequence):
+                    self.log.error("Not sending %s: journaling it failed", payload)
+                    self.journal.in_flight.pop(payload['id'], None)
+                    self.requests.pop(payload['id'], None)
+                    return False
+            # Registered only now, so round trips don't include journaling
+            self.clock.sent(payload['id'])
         self.log.debug("Sending: %s", payload)
-        self.conn.send(json.dumps(payload))
+        try:
+            self.conn.send(json.dumps(payload))
+        except Exception:
+            self.requests.pop(payload['id'], None)
+            self.clock.discard(payload['id'])
+            raise
+        return True
+
+    def send_internal(self, method, **params):
+        """Send a request whose response only updates local state and never reaches the queue."""
+        self._send_internal('internal-%d' % next(self._internal_ids), method, **params)
+
+    def _send_internal(self, i_d, method, **params):
+        # Registered before sending, as the response may arrive before send() returns
+        self._internal_requests.add(i_d)
+        sent = False
+        try:
+            sent = self.send(method, custom_id=i_d, **params)
+        finally:
+            if not sent:
+                self._internal_requests.discard(i_d)
+        return sent
+
+    def probe(self):
+        """Send a lightweight internal request to measure the round trip time.
+
+        Once answered, the round trip time in ns is stored in ``probe_rtt``. Until then,
+        ``probe_sent_at`` holds the ``time.monotonic()`` the probe was sent at.
+        """
+        i_d = self._probe_id = 'internal-%d' % next(self._internal_ids)
+        self.probe_sent_at = time.monotonic()
+        if not self._send_internal(i_d, 'getCurrency', currency='BTC'):
+            self._probe_id = None
 
     def authenticate(self, key, secret, basic=False, custom_nonce=None):
         """Login to the HitBTC Websocket API using the given public and secret API keys."""
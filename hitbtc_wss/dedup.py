@@ -0,0 +1,102 @@
+"""Bounded indexes of recently seen trades and reports, to drop duplicates after reconnects."""
+
+# Import Built-Ins
+import logging
+
+# Init Logging Facilities
+log = logging.getLogger(__name__)
+
+
+class DedupIndex:
+    """Set of the last ``capacity`` keys added.
+
+    Keys are kept in a hash set for lookups and in a ring buffer recording their insertion order;
+    once the buffer is full, every new key evicts the oldest one. Memory is therefore bounded by
+    ``capacity``, and every operation is O(1).
+    """
+
+    __slots__ = ('capacity', '_ring', '_pos', '_seen')
+
+    def __init__(self, capacity=None):
+        """Initialize a DedupIndex instance.
+
+        :param capacity: number of keys to remember; defaults to 10000
+        """
+        self.capacity = capacity or 10000
+        self._ring = [None] * self.capacity
+        self._pos = 0
+        self._seen = set()
+
+    def add(self, key):
+        """Add a key, unless it's already known.
+
+        :return: True if the key is new, False if it's a duplicate
+        """
+        seen = self._seen
+        if key in seen:
+            return False
+        pos = self._pos
+        old = self._ring[pos]
+        if old is not None:
+            seen.discard(old)
+        self._ring[pos] = key
+        self._pos = (pos + 1) % self.capacity
+        seen.add(key)
+        return True
+
+    def __contains__(self, key):
+        return key in self._seen
+
+    def __len__(self):
+        return len(self._seen)
+
+
+def report_key(report):
+    """Return the key identifying an execution report."""
+    return report['id'], report['reportType'], report.get('tradeId'), report['updatedAt']
+
+
+class Deduplicator:
+    """Drop trades and execution reports that were already seen, per symbol.
+
+    Trades are keyed by their id and reports by order id, report type, trade id and update time.
+    Duplicate trades are removed from the ``data`` of trade messages; ``updateTrades`` messages left
+    without trades are dropped entirely, while ``snapshotTrades`` messages are kept, so consumers
+    still see the resubscription. Other messages are never dropped.
+    """
+
+    def __init__(self, capacity=None):
+        """Initialize a Deduplicator instance.
+
+        :param capacity: number of trade ids and report keys to remember per symbol; defaults to
+                         10000
+        """
+        self.capacity = capacity
+        self.trades = {}
+        self.reports = {}
+        self.duplicates = 0
+
+    def _index(self, indexes, symbol):
+        index = indexes.get(symbol)
+        if index is None:
+            index = indexes[symbol] = DedupIndex(self.capacity)
+        return index
+
+    def filter(self, method, symbol, params):
+        """Remove duplicates from a stream message's params, in place.
+
+        :return: False if the whole message is a duplicate and should be dropped, True otherwise
+        """
+        if method in ('snapshotTrades', 'updateTrades'):
+            add = self._index(self.trades, symbol).add
+            data = params['data']
+            new = [trade for trade in data if add(trade['id'])]
+            if len(new) != len(data):
+                self.duplicates += len(data) - len(new)
+                params['data'] = new
+                return bool(new) or method == 'snapshotTrades'
+        elif method == 'report':
+            if not self._index(self.reports, symbol).add(report_key(params)):
+                self.duplicates += 1
+                return False
+        return True
@@ -0,0 +1,436 @@
+"""Local gateway multiplexing a single upstream HitBTC connection to many local clients.
+
+Local clients connect via a Unix domain socket and speak the regular websocket API, so the
+:class:`hitbtc_wss.client.HitBTC` client works unchanged::
+
+    # In the gateway process (or: python -m hitbtc_wss.gateway /tmp/hitbtc.sock)
+    gateway = Gateway('/tmp/hitbtc.sock')
+    gateway.serve_forever()
+
+    # In any number of client processes
+    c = HitBTC(url='ws+unix:///tmp/hitbtc.sock')
+
+Subscriptions are reference-counted per channel, symbol and period: only the first subscribe and
+the last unsubscribe (or disconnect) are sent upstream, all others are answered locally. Late
+subscribers to an order book receive a snapshot synthesized from the gateway's own book. Stream
+messages are decoded once for routing and fanned out as the original text.
+
+All local clients share the upstream session - a ``login`` by one client applies to all of them.
+"""
+
+# Import Built-Ins
+import logging
+import os
+import json
+import base64
+import hashlib
+import socket
+from queue import Queue, Full
+from threading import Thread, RLock
+from itertools import count
+
+# Import Homebrew
+from hitbtc_wss.connector import HitBTCConnector
+from hitbtc_wss.book import OrderBook
+from hitbtc_wss.subscriptions import subscription_key
+
+# Init Logging Facilities
+log = logging.getLogger(__name__)
+
+_GUID = '258EAFA5-E914-47DA-95CA-C5AB0DC85B11'
+
+_OP_CONT, _OP_TEXT, _OP_BINARY, _OP_CLOSE, _OP_PING, _OP_PONG = 0x0, 0x1, 0x2, 0x8, 0x9, 0xA
+
+_STREAM_CHANNELS = {'ticker': 'Ticker',
+                    'snapshotOrderbook': 'Orderbook', 'updateOrderbook': 'Orderbook',
+                    'snapshotTrades': 'Trades', 'updateTrades': 'Trades',
+                    'snapshotCandles': 'Candles', 'updateCandles': 'Candles',
+                    'activeOrders': 'Reports', 'report': 'Reports'}
+
+
+def encode_frame(payload, opcode=_OP_TEXT):
+    """Encode ``payload`` bytes as a single, unmasked websocket frame."""
+    length = len(payload)
+    if length < 126:
+        header = bytes((0x80 | opcode, length))
+    elif length < 65536:
+        header = bytes((0x80 | opcode, 126)) + length.to_bytes(2, 'big')
+    else:
+        header = bytes((0x80 | opcode, 127)) + length.to_bytes(8, 'big')
+    return header + payload
+
+
+class GatewayClient:
+    """A local websocket client of the gateway.
+
+    Frames are read on the client's own thread; outgoing frames are put on a bounded queue and
+    written by a separate thread, so a slow client never blocks the upstream connection. Clients
+    whose queue overflows are disconnected.
+    """
+
+    def __init__(self, gateway, sock, q_maxsize=None):
+        """Initialize a GatewayClient instance."""
+        self.gateway = gateway
+        self.sock = sock
+        self.rfile = sock.makefile('rb')
+        self.out = Queue(maxsize=q_maxsize or 10000)
+        self.closed = False
+        self.reader = Thread(target=self._read, daemon=True)
+        self.writer = Thread(target=self._write, daemon=True)
+
+    def start(self):
+        """Start the reader and writer threads."""
+        self.reader.start()
+
+    def send_frame(self, frame):
+        """Queue an encoded frame for sending."""
+        if self.closed:
+            return
+        try:
+            self.out.put_nowait(frame)
+        except Full:
+            log.warning("Client %r is too slow; disconnecting it.", self)
+            self.close()
+
+    def send_json(self, data):
+        """Encode and queue the given JSON-serializable object."""
+        self.send_frame(encode_frame(json.dumps(data).encode('UTF-8')))
+
+    def close(self):
+        """Close the connection and unregister from the gateway."""
+        if self.closed:
+            return
+        self.closed = True
+        try:
+            self.out.put_nowait(None)
+        except Full:
+            pass
+        try:
+            self.sock.shutdown(socket.SHUT_RDWR)
+        except OSError:
+            pass
+        if not self.writer.is_alive():
+            self.sock.close()
+        self.gateway.remove_client(self)
+
+    def _handshake(self):
+        headers = {}
+        request_line = self.rfile.readline()
+        if not request_line.startswith(b'GET'):
+            return False
+        while True:
+            line = self.rfile.readline()
+            if line in (b'\r\n', b'\n', b''):
+                break
+            name, _, value = line.decode('latin-1').partition(':')
+            headers[name.strip().lower()] = value.strip()
+        key = headers.get('sec-websocket-key')
+        if not key:
+            return False
+        accept = base64.b64encode(hashlib.sha1((key + _GUID).encode('ascii')).digest())
+        self.sock.sendall(b'HTTP/1.1 101 Switching Protocols\r\n'
+                          b'Upgrade: websocket\r\n'
+                          b'Connection: Upgrade\r\n'
+                          b'Sec-WebSocket-Accept: ' + accept + b'\r\n\r\n')
+        return True
+
+    def _read_exact(self, n):
+        data = self.rfile.read(n)
+        if len(data) < n:
+            raise EOFError
+        return data
+
+    def _read_frame(self):
+        first, second = self._read_exact(2)
+        length = second & 0x7F
+        if length == 126:
+            length = int.from_bytes(self._read_exact(2), 'big')
+        elif length == 127:
+            length = int.from_bytes(self._read_exact(8), 'big')
+        mask = self._read_exact(4) if second & 0x80 else None
+        payload = self._read_exact(length)
+        if mask and length:
+            key = int.from_bytes((mask * (length // 4 + 1))[:length], 'big')
+            payload = (int.from_bytes(payload, 'big') ^ key).to_bytes(length, 'big')
+        return first & 0x80, first & 0x0F, payload
+
+    def _read(self):
+        try:
+            if not self._handshake():
+                return
+            self.writer.start()
+            message = b''
+            while not self.closed:
+                fin, opcode, payload = self._read_frame()
+                if opcode == _OP_CLOSE:
+                    self.send_frame(encode_frame(payload[:2], _OP_CLOSE))
+                    break
+                elif opcode == _OP_PING:
+                    self.send_frame(encode_frame(payload, _OP_PONG))
+                    continue
+                elif opcode == _OP_PONG:
+                    continue
+                if opcode != _OP_CONT:
+                    message = payload
+                else:
+                    message += payload
+                if fin:
+                    self.gateway.handle_request(self, message)
+                    message = b''
+        except (EOFError, OSError, ValueError) as e:
+            log.debug("Client %r disconnected: %s", self, e)
+        finally:
+            self.close()
+
+    def _write(self):
+        while True:
+            frame = self.out.get()
+            if frame is None:
+                break
+            try:
+                self.sock.sendall(frame)
+            except OSError:
+                break
+        self.sock.close()
+
+
+class _UpstreamConnector(HitBTCConnector):
+    """HitBTCConnector passing every message to the gateway instead of the queue."""
+
+    def __init__(self, gateway, url=None, **conn_ops):
+        super(_UpstreamConnector, self).__init__(url, silent=True, balance_interval=None,
+                                                 **conn_ops)
+        self.gateway = gateway
+
+    def _on_open(self, ws):
+        super(_UpstreamConnector, self)._on_open(ws)
+        # Also on the first open, to send subscriptions made while connecting
+        self.gateway.resubscribe()
+
+    def _on_message(self, ws, message):
+        self._stop_timer()
+        self.gateway.handle_upstream(message)
+
+
+class Gateway:
+    """Local gateway daemon, serving the HitBTC websocket API on a Unix domain socket."""
+
+    def __init__(self, path, url=None, **conn_ops):
+        """Initialize a Gateway instance.
+
+        :param path: path of the Unix domain socket to listen on
+        :param url: URL of the upstream websocket API
+        :param conn_ops: Optional Kwargs to pass to the upstream HitBTCConnector
+        """
+        self.path = path
+        self.upstream = _UpstreamConnector(self, url, **conn_ops)
+        self.clients = set()
+        self.subscriptions = {}
+        self.subscribe_params = {}
+        self.pending = {}
+        self.deferred = {}
+        self.books = {}
+        self.server = None
+        self._ids = count(1)
+        self._lock = RLock()
+
+    def start(self):
+        """Connect upstream and start accepting local clients."""
+        self.upstream.start()
+        if os.path.exists(self.path):
+            os.unlink(self.path)
+        self.server = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self.server.bind(self.path)
+        self.server.listen()
+        self.acceptor = Thread(target=self._accept, daemon=True)
+        self.acceptor.start()
+        log.info("Gateway listening on %s", self.path)
+
+    def serve_forever(self):
+        """Start the gateway and block until it is stopped."""
+        self.start()
+        self.acceptor.join()
+
+    def stop(self):
+        """Disconnect all clients, stop listening and disconnect upstream."""
+        if self.server:
+            self.server.close()
+            self.server = None
+            try:
+                os.unlink(self.path)
+            except FileNotFoundError:
+                pass
+        for client in list(self.clients):
+            client.close()
+        self.upstream.stop()
+
+    def _accept(self):
+        while self.server:
+            try:
+                sock, _ = self.server.accept()
+            except OSError:
+                break
+            client = GatewayClient(self, sock)
+            with self._lock:
+                self.clients.add(client)
+            client.start()
+
+    def remove_client(self, client):
+        """Drop a disconnected client and release its subscriptions."""
+        with self._lock:
+            self.clients.discard(client)
+            for key, clients in list(self.subscriptions.items()):
+                if client in clients:
+                    self._release(client, key)
+
+    def _send_upstream(self, client, client_id, method, params):
+        """Forward a request upstream, answering ``client`` itself if that's impossible.
+
+        Subscriptions made while the upstream is not connected are sent (and answered) once it
+        is, via ``resubscribe()``; other requests are answered with an error.
+        """
+        upstream_id = next(self._ids)
+        self.pending[upstream_id] = (client, client_id, method, params)
+        if self.upstream.send(method, custom_id=upstream_id, **params):
+            return
+        del self.pending[upstream_id]
+        if method.startswith('subscribe'):
+            self.deferred[subscription_key(method[len('subscribe'):], params)] = (client,
+                                                                                  client_id)
+        elif client is not None:
+            client.send_json({'jsonrpc': '2.0', 'id': client_id,
+                              'error': {'code': 503, 'message': 'Service Unavailable',
+                                        'description': 'Gateway is not connected upstream'}})
+
+    def handle_request(self, client, message):
+        """Handle a JSONRPC request sent by a local client."""
+        try:
+            request = json.loads(message)
+            method, params = request['method'], request.get('params') or {}
+            client_id = request.get('id')
+        except (ValueError, KeyError, TypeError) as e:
+            log.error("Discarding malformed request %r: %s", message, e)
+            return
+
+        with self._lock:
+            if method.startswith('subscribe'):
+                key = subscription_key(method[len('subscribe'):], params)
+                clients = self.subscriptions.setdefault(key, set())
+                first = not clients
+                clients.add(client)
+                if first:
+                    self.subscribe_params[key] = (method, params)
+                    self._send_upstream(client, client_id, method, params)
+                    return
+                book = self.books.get(key[1]) if key[0] == 'Orderbook' else None
+            elif method.startswith('unsubscribe'):
+                key = subscription_key(method[len('unsubscribe'):], params)
+                self._release(client, key)
+                book = None
+            else:
+                self._send_upstream(client, client_id, method, params)
+                return
+        client.send_json({'jsonrpc': '2.0', 'result': True, 'id': client_id})
+        if book is not None:
+            client.send_json(self._book_snapshot(book))
+
+    def _release(self, client, key):
+        """Remove ``client`` from a subscription, unsubscribing upstream if it was the last."""
+        clients = self.subscriptions.get(key)
+        if not clients or client not in clients:
+            return
+        clients.discard(client)
+        if not clients:
+            del self.subscriptions[key]
+            self.deferred.pop(key, None)
+            method, params = self.subscribe_params.pop(key)
+            if key[0] == 'Orderbook':
+                self.books.pop(key[1], None)
+            self._send_upstream(None, None, 'un' + method, params)
+
+    def resubscribe(self):
+        """Re-send all active subscriptions upstream, e.g. after a reconnect.
+
+        Clients whose subscription could not be forwarded yet are answered now.
+        """
+        with self._lock:
+            deferred, self.deferred = self.deferred, {}
+            for key, (method, params) in list(self.subscribe_params.items()):
+                client, client_id = deferred.get(key, (None, None))
+                self._send_upstream(client, client_id, method, params)
+
+    @staticmethod
+    def _book_snapshot(book):
+        # Called from a client's thread, while the upstream thread keeps updating the book
+        sequence, bids, asks = book.copy()
+        return {'jsonrpc': '2.0', 'method': 'snapshotOrderbook',
+                'params': {'symbol': book.symbol, 'sequence': sequence,
+                           'bid': [{'price': repr(p), 'size': repr(bids[p])}
+                                   for p in sorted(bids, reverse=True)],
+                           'ask': [{'price': repr(p), 'size': repr(asks[p])}
+                                   for p in sorted(asks)]}}
+
+    def handle_upstream(self, message):
+        """Route a message received from upstream to the local clients it concerns."""
+        try:
+            data = json.loads(message)
+        except ValueError as e:
+            log.error("Discarding undecodable message %r: %s", message, e)
+            return
+
+        if 'id' in data:
+            self.upstream.requests.pop(data['id'], None)
+            self.upstream.clock.received(data['id'])
+            with self._lock:
+                client, client_id, method, params = self.pending.pop(data['id'],
+                                                                     (None, None, '', None))
+                if 'error' in data and method.startswith('subscribe'):
+                    key = subscription_key(method[len('subscribe'):], params)
+                    self.subscriptions.pop(key, None)
+                    self.subscribe_params.pop(key, None)
+            if client is not None:
+                data['id'] = client_id
+                client.send_json(data)
+            elif 'error' in data:
+                log.error("Gateway request failed: %r", data['error'])
+            return
+
+        method = data.get('method')
+        channel = _STREAM_CHANNELS.get(method)
+        if channel is None:
+            return
+        params = data['params'] if channel != 'Reports' else {}
+        key = subscription_key(channel, params)
+        if channel == 'Orderbook':
+            book = self.books.get(key[1])
+            if book is None:
+                book = self.books[key[1]] = OrderBook(key[1])
+            if method == 'snapshotOrderbook':
+                book.apply_snapshot(params)
+            else:
+                book.apply_update(params)
+
+        frame = encode_frame(message.encode('UTF-8') if isinstance(message, str) else message)
+        with self._lock:
+            clients = list(self.subscriptions.get(key, ()))
+        for client in clients:
+            client.send_frame(frame)
+
+
+def main():
+    """Run a gateway on the Unix socket path given on the command line."""
+    import argparse
+    parser = argparse.ArgumentParser(description=main.__doc__)
+    parser.add_argument('path', help="path of the Unix domain socket to listen on")
+    parser.add_argument('--url', help="upstream websocket URL")
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO)
+    gateway = Gateway(args.path, url=args.url)
+    try:
+        gateway.serve_forever()
+    except KeyboardInterrupt:
+        gateway.stop()
+
+
+if __name__ == '__main__':
+    main()
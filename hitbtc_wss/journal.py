@@ -0,0 +1,208 @@
+"""Write-ahead journal of order requests and their responses."""
+
+# Import Built-Ins
+import logging
+import json
+import os
+import time
+from collections import OrderedDict
+from threading import Thread, Condition
+
+# Init Logging Facilities
+log = logging.getLogger(__name__)
+
+
+JOURNALED_METHODS = frozenset(('newOrder', 'cancelOrder', 'cancelReplaceOrder'))
+
+
+def read_journal(path):
+    """Yield the records of the journal at ``path``, in the order they were written.
+
+    Lines that cannot be decoded - such as a final line torn by a crash - are skipped.
+    """
+    try:
+        f = open(path, 'rb')
+    except FileNotFoundError:
+        return
+    with f:
+        for lineno, line in enumerate(f, 1):
+            try:
+                yield json.loads(line)
+            except ValueError:
+                log.warning("Skipping corrupt record on line %s of %s", lineno, path)
+
+
+class Journal:
+    """Append-only journal of order requests, their responses and their resolution.
+
+    Each record is a line of JSON. Requests are journaled via ``record_request()`` before they're
+    sent, responses via ``record_response()``; the requests without a response are kept in
+    ``in_flight``, by request id.
+
+    Appending only encodes the record and hands it to a writer thread, which writes and fsyncs
+    everything appended in the meantime in a single batch (group commit). Call ``sync()`` to wait
+    until a record is durable; requests journaled while a batch is being written share the next
+    fsync, so concurrent senders wait for the disk once rather than once each.
+
+    On instantiation, the requests left in flight by a previous run are recovered from ``path``,
+    and the file is compacted down to them. Recovered requests stay in ``recovered`` until passed
+    to ``resolve()`` together with the exchange's active orders.
+    """
+
+    def __init__(self, path):
+        """Initialize a Journal instance.
+
+        :param path: file to append records to
+        """
+        self.path = path
+        self.in_flight = self.recover(path)
+        self.recovered = OrderedDict(self.in_flight)
+        if self.recovered:
+            log.warning("Recovered %s in-flight requests from %s", len(self.recovered), path)
+        self._compact()
+
+        self._file = open(path, 'ab')
+        self._pending = []
+        self._appended = 0
+        self._committed = 0
+        self._failed = (0, 0)
+        self._closed = False
+        self._cond = Condition()
+        self._writer = Thread(target=self._write_loop, name='journal-writer', daemon=True)
+        self._writer.start()
+
+    @staticmethod
+    def recover(path):
+        """Return the requests journaled at ``path`` that were neither answered nor resolved.
+
+        :return: OrderedDict of request payloads by request id
+        """
+        in_flight = OrderedDict()
+        for record in read_journal(path):
+            kind = record.get('type')
+            if kind == 'request':
+                request = record['request']
+                in_flight[request['id']] = request
+            elif kind in ('response', 'resolved'):
+                in_flight.pop(record['id'], None)
+        return in_flight
+
+    def _compact(self):
+        """Rewrite the journal, keeping only the records of requests still in flight."""
+        tmp_path = self.path + '.tmp'
+        with open(tmp_path, 'wb') as f:
+            for request in self.in_flight.values():
+                f.write(self._encode({'type': 'request', 'request': request}))
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, self.path)
+
+    @staticmethod
+    def _encode(record):
+        return (json.dumps(record, separators=(',', ':')) + '\n').encode('UTF-8')
+
+    def append(self, record):
+        """Queue a record for the writer thread.
+
+        :return: sequence number of the record, for use with ``sync()``
+        """
+        line = self._encode(record)
+        with self._cond:
+            if self._closed:
+                raise ValueError("Journal %s is closed" % self.path)
+            self._pending.append(line)
+            self._appended += 1
+            self._cond.notify_all()
+            return self._appended
+
+    def record_request(self, request):
+        """Journal a request payload and add it to ``in_flight``."""
+        self.in_flight[request['id']] = request
+        return self.append({'type': 'request', 'time': time.time(), 'request': request})
+
+    def record_response(self, response):
+        """Journal the response to an in-flight request; responses to other requests are ignored.
+
+        :return: True if the response was journaled
+        """
+        if self.in_flight.pop(response['id'], None) is None:
+            return False
+        self.append({'type': 'response', 'time': time.time(), 'id': response['id'],
+                     'result': response.get('result'), 'error': response.get('error')})
+        return True
+
+    def resolve(self, active_orders):
+        """Resolve the recovered requests against the exchange's active orders.
+
+        A ``newOrder`` has reached the exchange if its order is active; a ``cancelOrder`` has not
+        taken effect if its order is still active; a ``cancelReplaceOrder`` has taken effect if the
+        replacing order is active and has not if the original one is. Orders that are no longer
+        active are left for the caller to look up.
+
+        :param active_orders: list of order reports, as returned by ``getOrders``
+        :return: list of ``(request, report)`` tuples, with the active order the request refers to,
+                 or None if it's not active
+        """
+        if not self.recovered:
+            return []
+        active = {report['clientOrderId']: report for report in active_orders}
+        resolved = []
+        for request_id, request in self.recovered.items():
+            params = request['params']
+            report = active.get(params.get('requestClientId')) or \
+                active.get(params.get('clientOrderId'))
+            resolved.append((request, report))
+            self.in_flight.pop(request_id, None)
+            self.append({'type': 'resolved', 'time': time.time(), 'id': request_id,
+                         'active': report is not None})
+        self.recovered.clear()
+        return resolved
+
+    def sync(self, timeout=None, sequence=None):
+        """Wait until all records appended so far, or up to ``sequence``, are on disk.
+
+        :param sequence: sequence number returned by ``append()``
+        :return: True if they are, False if ``timeout`` passed first or writing them failed
+        """
+        with self._cond:
+            target = self._appended if sequence is None else sequence
+            if not self._cond.wait_for(lambda: self._committed >= target, timeout):
+                return False
+            # Only the most recent failed batch is remembered; callers sync right after appending
+            low, high = self._failed
+            return not low < target <= high
+
+    def close(self):
+        """Write all pending records and close the file."""
+        with self._cond:
+            if self._closed:
+                return
+            self._closed = True
+            self._cond.notify_all()
+        self._writer.join()
+        self._file.close()
+
+    def _write_loop(self):
+        """Write and fsync pending records in batches, until closed."""
+        while True:
+            with self._cond:
+                while not self._pending and not self._closed:
+                    self._cond.wait()
+                lines, self._pending = self._pending, []
+                appended = self._appended
+            if not lines:
+                return
+            try:
+                self._file.write(b''.join(lines))
+                self._file.flush()
+                os.fsync(self._file.fileno())
+            except OSError as e:
+                log.error("Could not write %s records to %s: %s", len(lines), self.path, e)
+                failed = True
+            else:
+                failed = False
+            with self._cond:
+                if failed:
+                    self._failed = (self._committed, appended)
+                self._committed = appended
+                self._cond.notify_all()
@@ -0,0 +1,151 @@
+"""Indexed symbol and currency metadata, persisted to disk."""
+
+# Import Built-Ins
+import logging
+import json
+import os
+import time
+from decimal import Decimal, ROUND_HALF_EVEN, ROUND_DOWN, InvalidOperation
+
+# Init Logging Facilities
+log = logging.getLogger(__name__)
+
+
+class MetadataCache:
+    """Cache of ``getSymbols`` and ``getCurrencies`` results.
+
+    Symbols are indexed by id, base and quote currency; currencies by id. If a ``path`` is given,
+    the cache is loaded from it on instantiation - provided it is younger than ``ttl`` seconds - and
+    saved to it whenever a full list of symbols or currencies was received.
+
+    Tick sizes and quantity increments are kept as :class:`decimal.Decimal` objects, for use with
+    ``normalize_price()`` and ``normalize_quantity()``.
+
+    Full updates build new indices and swap them in, so other threads reading the cache meanwhile
+    see either the old or the new symbols.
+    """
+
+    def __init__(self, path=None, ttl=None):
+        """Initialize a MetadataCache instance.
+
+        :param path: file to persist the cache to; the cache is kept in memory only if None
+        :param ttl: age in seconds after which the cache is considered stale; defaults to 1 day
+        """
+        self.path = path
+        self.ttl = ttl if ttl is not None else 86400
+        self.updated_at = 0
+        self.symbols = {}
+        self.currencies = {}
+        self.by_base = {}
+        self.by_quote = {}
+        self.tick_sizes = {}
+        self.quantity_increments = {}
+        if path:
+            self.load()
+
+    @property
+    def fresh(self):
+        """Whether both symbols and currencies are known and younger than ``ttl``."""
+        return bool(self.symbols and self.currencies and time.time() - self.updated_at < self.ttl)
+
+    def get(self, symbol, default=None):
+        """Return the symbol dict for the given symbol id."""
+        return self.symbols.get(symbol, default)
+
+    def symbols_for(self, base=None, quote=None):
+        """Return the ids of symbols with the given base and/or quote currency."""
+        empty = frozenset()
+        if base and quote:
+            return self.by_base.get(base, empty) & self.by_quote.get(quote, empty)
+        return set(self.by_base.get(base, empty) if base else self.by_quote.get(quote, empty))
+
+    def update_symbols(self, symbols):
+        """Replace all symbols with the given ``getSymbols`` result and persist the cache."""
+        self._swap(self._index(symbols))
+        self.updated_at = time.time()
+        self.save()
+
+    @staticmethod
+    def _index(symbols):
+        """Return new symbol, base, quote, tick size and quantity increment indices."""
+        indices = ({}, {}, {}, {}, {})
+        for symbol in symbols:
+            MetadataCache._add(indices, symbol)
+        return indices
+
+    @staticmethod
+    def _add(indices, symbol):
+        by_id, by_base, by_quote, tick_sizes, quantity_increments = indices
+        i_d = symbol['id']
+        tick_sizes[i_d] = Decimal(symbol['tickSize'])
+        quantity_increments[i_d] = Decimal(symbol['quantityIncrement'])
+        by_base.setdefault(symbol['baseCurrency'], set()).add(i_d)
+        by_quote.setdefault(symbol['quoteCurrency'], set()).add(i_d)
+        by_id[i_d] = symbol
+
+    def _swap(self, indices):
+        (self.symbols, self.by_base, self.by_quote, self.tick_sizes,
+         self.quantity_increments) = indices
+
+    def update_symbol(self, symbol):
+        """Add or replace a single ``getSymbol`` result."""
+        self._add((self.symbols, self.by_base, self.by_quote, self.tick_sizes,
+                   self.quantity_increments), symbol)
+
+    def update_currencies(self, currencies):
+        """Replace all currencies with the given ``getCurrencies`` result and persist the cache."""
+        self.currencies = {currency['id']: currency for currency in currencies}
+        self.updated_at = time.time()
+        self.save()
+
+    def update_currency(self, currency):
+        """Add or replace a single ``getCurrency`` result."""
+        self.currencies[currency['id']] = currency
+
+    def normalize_price(self, symbol, price, rounding=ROUND_HALF_EVEN):
+        """Round ``price`` to the tick size of ``symbol`` and return it as a string."""
+        tick = self.tick_sizes[symbol]
+        return format((Decimal(str(price)) / tick).to_integral_value(rounding) * tick, 'f')
+
+    def normalize_quantity(self, symbol, quantity, rounding=ROUND_DOWN):
+        """Round ``quantity`` to the quantity increment of ``symbol`` and return it as a string."""
+        increment = self.quantity_increments[symbol]
+        return format((Decimal(str(quantity)) / increment).to_integral_value(rounding) * increment,
+                      'f')
+
+    def save(self):
+        """Write the cache to ``path``, if one was given."""
+        if not self.path:
+            return
+        data = {'updated_at': self.updated_at, 'symbols': list(self.symbols.values()),
+                'currencies': list(self.currencies.values())}
+        tmp_path = self.path + '.tmp'
+        try:
+            with open(tmp_path, 'w') as f:
+                json.dump(data, f)
+            os.replace(tmp_path, self.path)
+        except OSError as e:
+            log.error("Could not save metadata to %s: %s", self.path, e)
+
+    def load(self):
+        """Load the cache from ``path``, unless it's missing or older than ``ttl``.
+
+        :return: True if the cache was loaded
+        """
+        try:
+            with open(self.path) as f:
+                data = json.load(f)
+            if time.time() - data['updated_at'] >= self.ttl:
+                log.info("Metadata in %s is stale; ignoring it.", self.path)
+                return False
+            indices = self._index(data['symbols'])
+            currencies = {currency['id']: currency for currency in data['currencies']}
+        except FileNotFoundError:
+            return False
+        except (OSError, ValueError, KeyError, TypeError, InvalidOperation) as e:
+            log.error("Could not load metadata from %s: %s", self.path, e)
+            return False
+        self._swap(indices)
+        self.currencies = currencies
+        self.updated_at = data['updated_at']
+        return True
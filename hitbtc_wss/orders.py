@@ -0,0 +1,232 @@
+"""Local order state, maintained from execution reports."""
+
+# Import Built-Ins
+import logging
+from collections import defaultdict, OrderedDict
+from threading import Lock
+
+# Init Logging Facilities
+log = logging.getLogger(__name__)
+
+
+OPEN_STATUSES = frozenset(('new', 'suspended', 'partiallyFilled'))
+
+
+def _remaining(report):
+    """Return the unfilled quantity of an order report."""
+    return float(report['quantity']) - float(report['cumQuantity'])
+
+
+class OrderTracker:
+    """In-memory order book of our own orders, indexed by clientOrderId and by symbol.
+
+    Execution reports (as streamed after ``subscribeReports`` or returned by ``newOrder``,
+    ``cancelOrder`` and ``cancelReplaceOrder``) are applied incrementally via ``apply()``. Positions
+    and fill statistics are derived from changes in ``cumQuantity``, so applying the same report
+    twice is harmless.
+
+    After a reconnect, pass the result of ``getOrders`` (or the ``activeOrders`` notification) to
+    ``reconcile()`` to bring the tracker back in line with the exchange.
+
+    Orders sent but not yet acknowledged can be accounted for via ``reserve()``; a reservation is
+    released by the first report of its order, or explicitly via ``release()`` if the request
+    failed.
+    """
+
+    def __init__(self, max_closed=None):
+        """Initialize an OrderTracker instance.
+
+        :param max_closed: number of closed orders to keep for lookups; defaults to 10000.
+        """
+        self.open_orders = defaultdict(dict)
+        self.positions = defaultdict(float)
+        self._open = {}
+        self._closed = OrderedDict()
+        self._max_closed = max_closed or 10000
+        self._ordered = defaultdict(float)
+        self._filled = defaultdict(float)
+        self._open_quantity = defaultdict(float)
+        self._reserved = {}
+        self._reserved_count = defaultdict(int)
+        self._reserved_quantity = defaultdict(float)
+        self._lock = Lock()
+
+    def get(self, client_order_id):
+        """Return the latest report for the given clientOrderId, or None."""
+        return self._open.get(client_order_id) or self._closed.get(client_order_id)
+
+    def open_orders_for(self, symbol):
+        """Return a list of the currently open orders for ``symbol``."""
+        return list(self.open_orders[symbol].values())
+
+    def all_open_orders(self):
+        """Return a list of all currently open orders."""
+        with self._lock:
+            return list(self._open.values())
+
+    def open_order_count(self, symbol):
+        """Return the number of currently open orders for ``symbol``."""
+        return len(self.open_orders[symbol])
+
+    def position(self, symbol):
+        """Return our net filled quantity in ``symbol``; positive means long."""
+        return self.positions[symbol]
+
+    def open_quantity(self, symbol, side):
+        """Return the unfilled quantity of our open ``side`` orders in ``symbol``."""
+        return self._open_quantity[(symbol, side)]
+
+    def reserved_count(self, symbol):
+        """Return the number of reserved, i.e. sent but unacknowledged, orders for ``symbol``."""
+        return self._reserved_count[symbol]
+
+    def reserved_quantity(self, symbol, side):
+        """Return the quantity reserved by unacknowledged ``side`` orders in ``symbol``."""
+        return self._reserved_quantity[(symbol, side)]
+
+    def reserve(self, client_order_id, symbol, side, quantity, count=1):
+        """Account for an order that was sent but not yet acknowledged.
+
+        :param count: number of orders the request adds; 0 for replacements
+        """
+        with self._lock:
+            self._release(client_order_id)
+            self._reserved[client_order_id] = (symbol, side, quantity, count)
+            self._reserved_count[symbol] += count
+            self._reserved_quantity[(symbol, side)] += quantity
+
+    def release(self, client_order_id):
+        """Drop the reservation of an order whose request failed.
+
+        :return: True if there was a reservation
+        """
+        with self._lock:
+            return self._release(client_order_id)
+
+    def release_all(self):
+        """Drop all reservations, e.g. after a reconnect, when their responses are lost."""
+        with self._lock:
+            self._reserved.clear()
+            self._reserved_count.clear()
+            self._reserved_quantity.clear()
+
+    def _release(self, client_order_id):
+        reservation = self._reserved.pop(client_order_id, None)
+        if reservation is None:
+            return False
+        symbol, side, quantity, count = reservation
+        self._reserved_count[symbol] -= count
+        self._reserved_quantity[(symbol, side)] -= quantity
+        return True
+
+    def fill_rate(self, symbol):
+        """Return the ratio of filled to ordered quantity for ``symbol``."""
+        ordered = self._ordered[symbol]
+        return self._filled[symbol] / ordered if ordered else 0.0
+
+    def export(self):
+        """Return the open orders, positions and fill statistics as a JSON-able dict."""
+        with self._lock:
+            return {'open': list(self._open.values()), 'positions': dict(self.positions),
+                    'ordered': dict(self._ordered), 'filled': dict(self._filled)}
+
+    def restore(self, state):
+        """Replace the tracker's state with one returned by ``export()``.
+
+        Unlike applying the open orders as reports, this leaves the fill statistics as they were.
+        """
+        with self._lock:
+            self.open_orders.clear()
+            self._open.clear()
+            self._open_quantity.clear()
+            for report in state['open']:
+                client_order_id = report['clientOrderId']
+                self._open[client_order_id] = report
+                self.open_orders[report['symbol']][client_order_id] = report
+                self._open_quantity[(report['symbol'], report['side'])] += _remaining(report)
+            self.positions.clear()
+            self.positions.update(state['positions'])
+            self._ordered.clear()
+            self._ordered.update(state['ordered'])
+            self._filled.clear()
+            self._filled.update(state['filled'])
+
+    def apply(self, report):
+        """Apply an execution report to the local state.
+
+        :param report: order report dict as sent by the API
+        """
+        with self._lock:
+            self._apply(report)
+
+    def _apply(self, report):
+        client_order_id = report['clientOrderId']
+        symbol = report['symbol']
+        if self._reserved:
+            self._release(client_order_id)
+
+        prev = self.get(client_order_id)
+        if prev is not None:
+            prev_cum = float(prev['cumQuantity'])
+            if client_order_id in self._open:
+                self._open_quantity[(symbol, prev['side'])] -= _remaining(prev)
+        else:
+            prev_cum = 0.0
+            replaced = report.get('originalRequestClientOrderId')
+            old = self._close(replaced) if replaced else None
+            if old is not None:
+                # The replacing order carries over the fills of the original one
+                prev_cum = float(old['cumQuantity'])
+                self._ordered[symbol] -= float(old['quantity']) - prev_cum
+            self._ordered[symbol] += float(report['quantity']) - prev_cum
+
+        filled = float(report['cumQuantity']) - prev_cum
+        if filled > 0:
+            self._filled[symbol] += filled
+            self.positions[symbol] += filled if report['side'] == 'buy' else -filled
+
+        if report['status'] in OPEN_STATUSES:
+            self._open_quantity[(symbol, report['side'])] += _remaining(report)
+            self._closed.pop(client_order_id, None)
+            self._open[client_order_id] = report
+            self.open_orders[symbol][client_order_id] = report
+        else:
+            self._open.pop(client_order_id, None)
+            self.open_orders[symbol].pop(client_order_id, None)
+            self._remember(client_order_id, report)
+
+    def _close(self, client_order_id):
+        """Remove an order from the open indices and return its last report."""
+        report = self._open.pop(client_order_id, None)
+        if report is not None:
+            self.open_orders[report['symbol']].pop(client_order_id, None)
+            self._open_quantity[(report['symbol'], report['side'])] -= _remaining(report)
+            self._remember(client_order_id, report)
+        return report
+
+    def _remember(self, client_order_id, report):
+        self._closed[client_order_id] = report
+        self._closed.move_to_end(client_order_id)
+        while len(self._closed) > self._max_closed:
+            self._closed.popitem(last=False)
+
+    def reconcile(self, active_orders):
+        """Bring the open orders in line with the given list of active orders.
+
+        Orders the exchange no longer reports as active are closed locally; their final state was
+        missed (e.g. while disconnected) and is left for the caller to investigate.
+
+        :param active_orders: list of order reports, as returned by ``getOrders``
+        :return: list of clientOrderIds that were closed during reconciliation
+        """
+        with self._lock:
+            active = set()
+            for report in active_orders:
+                active.add(report['clientOrderId'])
+                self._apply(report)
+            vanished = [cid for cid in self._open if cid not in active]
+            for client_order_id in vanished:
+                self._close(client_order_id)
+        if vanished:
+            log.warning("Orders closed while out of sync: %s", vanished)
+        return vanished
@@ -0,0 +1,194 @@
+"""Opt-in profiling hooks: per-stage timings and a sampling profiler for a single thread."""
+
+# Import Built-Ins
+import logging
+import os
+import signal
+import sys
+import time
+from collections import Counter
+from functools import wraps
+from threading import Thread, Event
+
+# Init Logging Facilities
+log = logging.getLogger(__name__)
+
+
+class StageStats:
+    """Call count, total and maximum duration of a stage, in ns."""
+
+    __slots__ = ('count', 'total_ns', 'max_ns')
+
+    def __init__(self):
+        """Initialize the instance."""
+        self.count = 0
+        self.total_ns = 0
+        self.max_ns = 0
+
+    @property
+    def mean_ns(self):
+        """Mean duration in ns."""
+        return self.total_ns / self.count if self.count else 0.0
+
+
+class StageTimer:
+    """Accumulate the durations of named processing stages.
+
+    Stages are timed by wrapping methods via ``instrument()``, or explicitly via ``record()``.
+    Durations are inclusive - a stage called from within another counts towards both.
+    """
+
+    def __init__(self):
+        """Initialize a StageTimer instance."""
+        self.stages = {}
+
+    def record(self, stage, elapsed_ns):
+        """Add a duration in ns to the given stage."""
+        stats = self.stages.get(stage)
+        if stats is None:
+            stats = self.stages[stage] = StageStats()
+        stats.count += 1
+        stats.total_ns += elapsed_ns
+        if elapsed_ns > stats.max_ns:
+            stats.max_ns = elapsed_ns
+
+    def wrap(self, stage, func):
+        """Return ``func``, recording the duration of every call under ``stage``."""
+        record = self.record
+        clock = time.perf_counter_ns
+
+        @wraps(func)
+        def timed(*args, **kwargs):
+            start = clock()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                record(stage, clock() - start)
+        timed.__wrapped_stage__ = stage
+        return timed
+
+    def instrument(self, obj, *names):
+        """Time the given methods of ``obj``, by shadowing them with timed wrappers.
+
+        Only ``obj`` itself is affected; the wrappers are removed again by ``uninstrument()``.
+        """
+        for name in names:
+            setattr(obj, name, self.wrap(name, getattr(obj, name)))
+
+    @staticmethod
+    def uninstrument(obj, *names):
+        """Remove the wrappers added by ``instrument()``."""
+        for name in names:
+            if hasattr(obj.__dict__.get(name), '__wrapped_stage__'):
+                delattr(obj, name)
+
+    def summary(self):
+        """Return ``{stage: (count, mean us, max us)}``."""
+        return {stage: (stats.count, stats.mean_ns / 1000, stats.max_ns / 1000)
+                for stage, stats in self.stages.items()}
+
+    def reset(self):
+        """Discard all recorded durations."""
+        self.stages = {}
+
+
+def _frame_label(code):
+    return '%s (%s:%d)' % (code.co_name, os.path.basename(code.co_filename), code.co_firstlineno)
+
+
+class SamplingProfiler:
+    """Sample the call stack of a single thread at a fixed interval.
+
+    A daemon thread reads the thread's current frame via ``sys._current_frames()`` every
+    ``interval`` seconds and counts the stacks it sees. Nothing is traced, so the profiled thread
+    only pays for the GIL the sampler holds while walking the stack. Stacks are exported in the
+    folded format read by flamegraph.pl, speedscope and similar tools.
+
+    While the profiled thread is busy, the sampler has to wait for the GIL, so the effective
+    sampling interval is bounded by ``sys.getswitchinterval()`` (5ms by default).
+    """
+
+    def __init__(self, thread, interval=None, max_depth=None):
+        """Initialize a SamplingProfiler instance.
+
+        :param thread: threading.Thread to sample
+        :param interval: seconds between samples; defaults to 0.005
+        :param max_depth: maximum number of frames per stack; defaults to 64
+        """
+        self.thread = thread
+        self.interval = interval or 0.005
+        self.max_depth = max_depth or 64
+        self.stacks = Counter()
+        self.samples = 0
+        self._stopped = Event()
+        self._sampler = None
+
+    def start(self):
+        """Start sampling in a background thread."""
+        if self._sampler is not None and self._sampler.is_alive():
+            return
+        self._stopped.clear()
+        self._sampler = Thread(target=self._sample_loop, name='sampling-profiler', daemon=True)
+        self._sampler.start()
+
+    def stop(self):
+        """Stop sampling; collected stacks are kept."""
+        self._stopped.set()
+        if self._sampler is not None:
+            self._sampler.join()
+            self._sampler = None
+
+    def _sample_loop(self):
+        labels = {}
+        while not self._stopped.wait(self.interval):
+            frame = sys._current_frames().get(self.thread.ident)
+            if frame is None:
+                continue
+            stack = []
+            while frame is not None and len(stack) < self.max_depth:
+                code = frame.f_code
+                label = labels.get(code)
+                if label is None:
+                    label = labels[code] = _frame_label(code)
+                stack.append(label)
+                frame = frame.f_back
+            stack.reverse()
+            self.stacks[';'.join(stack)] += 1
+            self.samples += 1
+
+    def folded(self):
+        """Return the collected stacks in folded format, one ``frame;frame;... count`` per line."""
+        return ''.join('%s %d\n' % item for item in self.stacks.most_common())
+
+    def dump(self, path):
+        """Write the collected stacks in folded format to ``path``."""
+        with open(path, 'w') as f:
+            f.write(self.folded())
+
+    def reset(self):
+        """Discard all collected stacks."""
+        self.stacks = Counter()
+        self.samples = 0
+
+
+def dump_on_signal(path, profiler=None, timer=None, signum=None):
+    """Dump profiling output whenever the process receives ``signum``.
+
+    The profiler's stacks are written to ``path`` in folded format and the timer's stage summary is
+    logged. Must be called from the main thread.
+
+    :param path: file to write folded stacks to
+    :param profiler: SamplingProfiler to dump
+    :param timer: StageTimer to log
+    :param signum: signal to dump on; defaults to SIGUSR2
+    :return: the previous handler of ``signum``
+    """
+    def handler(received, frame):
+        if profiler is not None:
+            profiler.dump(path)
+            log.info("Wrote %s stack samples to %s", profiler.samples, path)
+        if timer is not None:
+            for stage, (count, mean_us, max_us) in sorted(timer.summary().items()):
+                log.info("%s: %s calls, mean %.1fus, max %.1fus", stage, count, mean_us, max_us)
+
+    return signal.signal(signum or signal.SIGUSR2, handler)
@@ -0,0 +1,140 @@
+"""Queue implementations and helpers for passing data from the websocket thread to consumers."""
+
+# Import Built-Ins
+import time
+from queue import Empty, Full
+from threading import Event
+
+
+def get_many(q, max_items=None, timeout=None):
+    """Remove up to ``max_items`` items from a :class:`queue.Queue` under a single lock acquisition.
+
+    Blocks until at least one item is available, like ``Queue.get()``.
+
+    :param q: queue.Queue instance
+    :param max_items: maximum number of items to return; all queued items if None
+    :param timeout: seconds to wait for an item; waits indefinitely if None
+    :return: non-empty list of items
+    :raises queue.Empty: if no item became available within ``timeout``
+    """
+    with q.not_empty:
+        if timeout is None:
+            while not q._qsize():
+                q.not_empty.wait()
+        else:
+            deadline = time.monotonic() + timeout
+            while not q._qsize():
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    raise Empty
+                q.not_empty.wait(remaining)
+        size = q._qsize()
+        count = size if max_items is None else min(max_items, size)
+        items = [q._get() for _ in range(count)]
+        q.not_full.notify(count)
+        return items
+
+
+class SPSCQueue:
+    """Bounded single-producer/single-consumer ring buffer.
+
+    A drop-in replacement for :class:`queue.Queue` when exactly one thread puts and exactly one
+    thread gets. The producer only ever advances the tail and the consumer only the head, so
+    neither side takes a lock; the consumer parks on an Event only when it finds the buffer empty,
+    and the producer only signals it in that case. A full buffer makes blocking puts poll.
+    """
+
+    def __init__(self, maxsize=None):
+        """Initialize an SPSCQueue instance.
+
+        :param maxsize: capacity of the buffer; defaults to 1024
+        """
+        self.maxsize = maxsize or 1024
+        self._buffer = [None] * self.maxsize
+        self._head = 0
+        self._tail = 0
+        self._waiting = False
+        self._event = Event()
+
+    def qsize(self):
+        """Return the number of queued items."""
+        return self._tail - self._head
+
+    def empty(self):
+        """Return True if no items are queued."""
+        return self._tail == self._head
+
+    def full(self):
+        """Return True if the buffer is at capacity."""
+        return self._tail - self._head >= self.maxsize
+
+    def put(self, item, block=True, timeout=None):
+        """Append an item; only ever call this from the producer thread."""
+        if self.full():
+            if not block:
+                raise Full
+            deadline = None if timeout is None else time.monotonic() + timeout
+            while self.full():
+                if deadline is not None and time.monotonic() >= deadline:
+                    raise Full
+                time.sleep(0.0001)
+        self._buffer[self._tail % self.maxsize] = item
+        self._tail += 1
+        if self._waiting:
+            self._event.set()
+
+    def put_nowait(self, item):
+        """Append an item without blocking."""
+        self.put(item, block=False)
+
+    def _wait(self, block, timeout):
+        if self._tail != self._head:
+            return
+        if not block:
+            raise Empty
+        deadline = None if timeout is None else time.monotonic() + timeout
+        try:
+            while self._tail == self._head:
+                self._event.clear()
+                self._waiting = True
+                if self._tail != self._head:
+                    break
+                remaining = None if deadline is None else deadline - time.monotonic()
+                if remaining is not None and remaining <= 0:
+                    raise Empty
+                self._event.wait(remaining)
+        finally:
+            self._waiting = False
+
+    def get(self, block=True, timeout=None):
+        """Remove and return the oldest item; only ever call this from the consumer thread."""
+        self._wait(block, timeout)
+        i = self._head % self.maxsize
+        item, self._buffer[i] = self._buffer[i], None
+        self._head += 1
+        return item
+
+    def get_nowait(self):
+        """Remove and return the oldest item without blocking."""
+        return self.get(block=False)
+
+    def get_many(self, max_items=None, timeout=None):
+        """Remove up to ``max_items`` items at once; see :func:`get_many`."""
+        self._wait(timeout is None or timeout > 0, timeout)
+        head = self._head
+        count = self._tail - head
+        if max_items is not None:
+            count = min(count, max_items)
+        start = head % self.maxsize
+        end = start + count
+        buffer = self._buffer
+        if end <= self.maxsize:
+            items = buffer[start:end]
+            buffer[start:end] = [None] * count
+        else:
+            end -= self.maxsize
+            items = buffer[start:] + buffer[:end]
+            buffer[start:] = [None] * (self.maxsize - start)
+            buffer[:end] = [None] * end
+        self._head = head + count
+        return items
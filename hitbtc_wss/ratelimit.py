@@ -0,0 +1,50 @@
+"""Token bucket rate limiting for outgoing requests."""
+
+# Import Built-Ins
+import time
+from threading import Lock
+
+
+class RateLimiter:
+    """Token bucket allowing ``rate`` requests per second, with bursts of up to ``burst``.
+
+    Instances are thread-safe and may be shared between connections.
+    """
+
+    def __init__(self, rate, burst=None):
+        """Initialize a RateLimiter instance.
+
+        :param rate: number of requests per second
+        :param burst: bucket size; defaults to ``rate``
+        """
+        self.rate = float(rate)
+        self.burst = float(burst or rate)
+        self._tokens = self.burst
+        self._last = time.monotonic()
+        self._lock = Lock()
+
+    def _wait_time(self):
+        now = time.monotonic()
+        self._tokens = min(self.burst, self._tokens + (now - self._last) * self.rate)
+        self._last = now
+        if self._tokens >= 1:
+            self._tokens -= 1
+            return 0.0
+        return (1 - self._tokens) / self.rate
+
+    def try_acquire(self):
+        """Take a token if one is available, without blocking.
+
+        :return: True if a token was taken
+        """
+        with self._lock:
+            return self._wait_time() == 0.0
+
+    def acquire(self):
+        """Take a token, sleeping until one is available."""
+        while True:
+            with self._lock:
+                wait = self._wait_time()
+            if not wait:
+                return
+            time.sleep(wait)
@@ -0,0 +1,277 @@
+"""Compact record types for stream payloads.
+
+Single items are ``__slots__`` objects with numeric fields already converted. Arrays of items
+(trades, candles and book levels) are stored column-wise in :class:`array.array` objects, which
+support the buffer protocol - ``numpy.frombuffer(batch.prices)`` and ``memoryview(batch.prices)``
+expose them without copying.
+"""
+
+# Import Built-Ins
+from array import array
+
+# Import Homebrew
+from hitbtc_wss.utils import parse_timestamp
+
+
+def _float(value):
+    """Convert an API number to float, passing on None."""
+    return None if value is None else float(value)
+
+
+class Trade:
+    """A single public trade; ``timestamp`` is in milliseconds since epoch."""
+
+    __slots__ = ('id', 'price', 'quantity', 'side', 'timestamp')
+
+    def __init__(self, i_d, price, quantity, side, timestamp):
+        """Initialize the instance."""
+        self.id = i_d
+        self.price = price
+        self.quantity = quantity
+        self.side = side
+        self.timestamp = timestamp
+
+    def __repr__(self):
+        return 'Trade(id=%r, price=%r, quantity=%r, side=%r, timestamp=%r)' % (
+            self.id, self.price, self.quantity, self.side, self.timestamp)
+
+
+class TradeBatch:
+    """Column-wise array of trades, as sent with ``snapshotTrades`` and ``updateTrades``.
+
+    ``sides`` holds 1 for buys and -1 for sells.
+    """
+
+    __slots__ = ('ids', 'prices', 'quantities', 'sides', 'timestamps')
+
+    def __init__(self):
+        """Initialize an empty batch."""
+        self.ids = array('q')
+        self.prices = array('d')
+        self.quantities = array('d')
+        self.sides = array('b')
+        self.timestamps = array('q')
+
+    @classmethod
+    def from_params(cls, params):
+        """Build a batch from the ``params`` of a trades stream message."""
+        batch = cls()
+        data = params['data']
+        batch.ids.extend([trade['id'] for trade in data])
+        batch.prices.extend([float(trade['price']) for trade in data])
+        batch.quantities.extend([float(trade['quantity']) for trade in data])
+        batch.sides.extend([1 if trade['side'] == 'buy' else -1 for trade in data])
+        batch.timestamps.extend([parse_timestamp(trade['timestamp']) for trade in data])
+        return batch
+
+    def __len__(self):
+        return len(self.ids)
+
+    def __getitem__(self, i):
+        return Trade(self.ids[i], self.prices[i], self.quantities[i],
+                     'buy' if self.sides[i] > 0 else 'sell', self.timestamps[i])
+
+    def __iter__(self):
+        for i in range(len(self.ids)):
+            yield self[i]
+
+
+class Candle:
+    """A single candle; ``timestamp`` is in milliseconds since epoch."""
+
+    __slots__ = ('timestamp', 'open', 'close', 'min', 'max', 'volume', 'volume_quote')
+
+    def __init__(self, timestamp, open_, close, min_, max_, volume, volume_quote):
+        """Initialize the instance."""
+        self.timestamp = timestamp
+        self.open = open_
+        self.close = close
+        self.min = min_
+        self.max = max_
+        self.volume = volume
+        self.volume_quote = volume_quote
+
+    def __repr__(self):
+        return 'Candle(timestamp=%r, open=%r, close=%r, min=%r, max=%r, volume=%r)' % (
+            self.timestamp, self.open, self.close, self.min, self.max, self.volume)
+
+
+class CandleBatch:
+    """Column-wise array of candles, as sent with ``snapshotCandles`` and ``updateCandles``."""
+
+    __slots__ = ('period', 'timestamps', 'opens', 'closes', 'mins', 'maxs', 'volumes',
+                 'volumes_quote')
+
+    def __init__(self, period=None):
+        """Initialize an empty batch."""
+        self.period = period
+        self.timestamps = array('q')
+        self.opens = array('d')
+        self.closes = array('d')
+        self.mins = array('d')
+        self.maxs = array('d')
+        self.volumes = array('d')
+        self.volumes_quote = array('d')
+
+    @classmethod
+    def from_params(cls, params):
+        """Build a batch from the ``params`` of a candles stream message."""
+        batch = cls(params.get('period'))
+        data = params['data']
+        batch.timestamps.extend([parse_timestamp(candle['timestamp']) for candle in data])
+        batch.opens.extend([float(candle['open']) for candle in data])
+        batch.closes.extend([float(candle['close']) for candle in data])
+        batch.mins.extend([float(candle['min']) for candle in data])
+        batch.maxs.extend([float(candle['max']) for candle in data])
+        batch.volumes.extend([float(candle['volume']) for candle in data])
+        batch.volumes_quote.extend([float(candle['volumeQuote']) for candle in data])
+        return batch
+
+    def __len__(self):
+        return len(self.timestamps)
+
+    def __getitem__(self, i):
+        return Candle(self.timestamps[i], self.opens[i], self.closes[i], self.mins[i],
+                      self.maxs[i], self.volumes[i], self.volumes_quote[i])
+
+    def __iter__(self):
+        for i in range(len(self.timestamps)):
+            yield self[i]
+
+
+class BookLevel:
+    """A single order book price level."""
+
+    __slots__ = ('price', 'size')
+
+    def __init__(self, price, size):
+        """Initialize the instance."""
+        self.price = price
+        self.size = size
+
+    def __repr__(self):
+        return 'BookLevel(price=%r, size=%r)' % (self.price, self.size)
+
+
+class BookUpdate:
+    """Column-wise order book snapshot or update.
+
+    As sent with ``snapshotOrderbook`` and ``updateOrderbook``; a size of 0 removes the level.
+    """
+
+    __slots__ = ('sequence', 'ask_prices', 'ask_sizes', 'bid_prices', 'bid_sizes')
+
+    def __init__(self, sequence=None):
+        """Initialize an empty update."""
+        self.sequence = sequence
+        self.ask_prices = array('d')
+        self.ask_sizes = array('d')
+        self.bid_prices = array('d')
+        self.bid_sizes = array('d')
+
+    @classmethod
+    def from_params(cls, params):
+        """Build an update from the ``params`` of an order book stream message."""
+        update = cls(params.get('sequence'))
+        asks, bids = params['ask'], params['bid']
+        update.ask_prices.extend([float(level['price']) for level in asks])
+        update.ask_sizes.extend([float(level['size']) for level in asks])
+        update.bid_prices.extend([float(level['price']) for level in bids])
+        update.bid_sizes.extend([float(level['size']) for level in bids])
+        return update
+
+    @property
+    def asks(self):
+        """Return the ask levels as a list of :class:`BookLevel`."""
+        return [BookLevel(p, s) for p, s in zip(self.ask_prices, self.ask_sizes)]
+
+    @property
+    def bids(self):
+        """Return the bid levels as a list of :class:`BookLevel`."""
+        return [BookLevel(p, s) for p, s in zip(self.bid_prices, self.bid_sizes)]
+
+
+class Ticker:
+    """Ticker data; prices are None where the API sends null."""
+
+    __slots__ = ('ask', 'bid', 'last', 'open', 'low', 'high', 'volume', 'volume_quote',
+                 'timestamp')
+
+    def __init__(self, ask, bid, last, open_, low, high, volume, volume_quote, timestamp):
+        """Initialize the instance."""
+        self.ask = ask
+        self.bid = bid
+        self.last = last
+        self.open = open_
+        self.low = low
+        self.high = high
+        self.volume = volume
+        self.volume_quote = volume_quote
+        self.timestamp = timestamp
+
+    @classmethod
+    def from_params(cls, params):
+        """Build a ticker from the ``params`` of a ticker stream message."""
+        return cls(_float(params['ask']), _float(params['bid']), _float(params['last']),
+                   _float(params['open']), _float(params['low']), _float(params['high']),
+                   _float(params['volume']), _float(params['volumeQuote']),
+                   parse_timestamp(params['timestamp']))
+
+    def __repr__(self):
+        return 'Ticker(bid=%r, ask=%r, last=%r, timestamp=%r)' % (
+            self.bid, self.ask, self.last, self.timestamp)
+
+
+class Report:
+    """An execution report; timestamps are in milliseconds since epoch.
+
+    The ``trade_*`` fields are only set for reports of type ``trade``.
+    """
+
+    __slots__ = ('id', 'client_order_id', 'symbol', 'side', 'status', 'type', 'time_in_force',
+                 'quantity', 'price', 'cum_quantity', 'created_at', 'updated_at', 'report_type',
+                 'original_request_client_order_id', 'trade_id', 'trade_quantity', 'trade_price',
+                 'trade_fee')
+
+    def __init__(self, **fields):
+        """Initialize the instance from keyword arguments named like its slots."""
+        for name in Report.__slots__:
+            setattr(self, name, fields.get(name))
+
+    @classmethod
+    def from_params(cls, params):
+        """Build a report from the ``params`` of a ``report`` stream message."""
+        get = params.get
+        return cls(id=get('id'), client_order_id=get('clientOrderId'), symbol=get('symbol'),
+                   side=get('side'), status=get('status'), type=get('type'),
+                   time_in_force=get('timeInForce'), quantity=_float(get('quantity')),
+                   price=_float(get('price')), cum_quantity=_float(get('cumQuantity')),
+                   created_at=parse_timestamp(params['createdAt']),
+                   updated_at=parse_timestamp(params['updatedAt']),
+                   report_type=get('reportType'),
+                   original_request_client_order_id=get('originalRequestClientOrderId'),
+                   trade_id=get('tradeId'), trade_quantity=_float(get('tradeQuantity')),
+                   trade_price=_float(get('tradePrice')), trade_fee=_float(get('tradeFee')))
+
+    def __repr__(self):
+        return 'Report(client_order_id=%r, symbol=%r, status=%r, report_type=%r)' % (
+            self.client_order_id, self.symbol, self.status, self.report_type)
+
+
+record_types = {'ticker': Ticker.from_params,
+                'snapshotTrades': TradeBatch.from_params,
+                'updateTrades': TradeBatch.from_params,
+                'snapshotCandles': CandleBatch.from_params,
+                'updateCandles': CandleBatch.from_params,
+                'snapshotOrderbook': BookUpdate.from_params,
+                'updateOrderbook': BookUpdate.from_params,
+                'report': Report.from_params}
+
+
+def to_record(method, params):
+    """Convert the ``params`` of a stream message to its record type, if there is one."""
+    try:
+        build = record_types[method]
+    except KeyError:
+        return params
+    return build(params)
@@ -0,0 +1,155 @@
+"""Pre-trade risk checks, run before orders are sent."""
+
+# Import Built-Ins
+import logging
+from threading import Lock
+
+# Init Logging Facilities
+log = logging.getLogger(__name__)
+
+
+class RiskError(ValueError):
+    """Raised for orders rejected by the pre-trade risk checks."""
+
+
+class RiskLimits:
+    """Limits of a single symbol; limits set to None are not checked.
+
+    :ivar max_notional: maximum price * quantity of a single order
+    :ivar max_position: maximum absolute position after the order is completely filled
+    :ivar max_open_orders: maximum number of open orders, excluding the one being checked
+    :ivar price_band: maximum relative distance of a limit price beyond the opposite best quote,
+                      e.g. 0.05 rejects buys priced more than 5% above the best ask
+    """
+
+    __slots__ = ('max_notional', 'max_position', 'max_open_orders', 'price_band')
+
+    def __init__(self, max_notional=None, max_position=None, max_open_orders=None,
+                 price_band=None):
+        """Initialize the instance."""
+        self.max_notional = max_notional
+        self.max_position = max_position
+        self.max_open_orders = max_open_orders
+        self.price_band = price_band
+
+
+class RiskEngine:
+    """Check orders against per-symbol :class:`RiskLimits`, using local state only.
+
+    Positions, open orders and their unfilled quantities are taken from an
+    :class:`hitbtc_wss.orders.OrderTracker`, best quotes from a mapping of
+    :class:`hitbtc_wss.book.OrderBook` objects; every check is a handful of dict lookups. The
+    position limit applies to the position if all open orders on the order's side were filled.
+
+    Orders that pass are reserved in the tracker under their ``clientOrderId`` (see
+    :meth:`hitbtc_wss.orders.OrderTracker.reserve`), so they count as open until their first report
+    arrives or their request fails - a burst of orders can't exceed the limits before any of them
+    is acknowledged. Checking and reserving is atomic. Orders without a ``clientOrderId`` are
+    checked but can't be reserved.
+
+    Market orders are valued at the opposite best quote; if there is none, their notional is not
+    checked. Price bands are only checked for symbols with a book.
+    """
+
+    def __init__(self, orders, books, default=None):
+        """Initialize a RiskEngine instance.
+
+        :param orders: OrderTracker to take positions and open orders from
+        :param books: mapping of symbols to OrderBook objects
+        :param default: RiskLimits for symbols without limits of their own
+        """
+        self.orders = orders
+        self.books = books
+        self.default = default
+        self.limits = {}
+        self._lock = Lock()
+
+    def set_limits(self, symbol=None, **limits):
+        """Set the limits of ``symbol``, or the default limits if no symbol is given.
+
+        :param limits: keyword arguments for :class:`RiskLimits`
+        """
+        if symbol is None:
+            self.default = RiskLimits(**limits)
+        else:
+            self.limits[symbol] = RiskLimits(**limits)
+
+    def check(self, params):
+        """Check the params of a ``newOrder`` request.
+
+        :raises RiskError: if the order breaches a limit
+        """
+        symbol, side, quantity = params['symbol'], params['side'], float(params['quantity'])
+        limits = self.limits.get(symbol, self.default)
+        with self._lock:
+            if limits is not None:
+                self._check(limits, symbol, side, quantity, params.get('price'), 0.0)
+            client_order_id = params.get('clientOrderId')
+            if client_order_id is not None:
+                self.orders.reserve(client_order_id, symbol, side, quantity)
+
+    def check_replace(self, params):
+        """Check the params of a ``cancelReplaceOrder`` request against the order it replaces.
+
+        :raises RiskError: if the replacing order breaches a limit, or if limits are set and the
+                           original order is unknown, so they can't be checked
+        """
+        original = self.orders.get(params['clientOrderId'])
+        if original is None:
+            if self.default is None and not self.limits:
+                return
+            raise RiskError("Cannot check replacement of unknown order %s" %
+                            params['clientOrderId'])
+        symbol, side = original['symbol'], original['side']
+        limits = self.limits.get(symbol, self.default)
+        # The replacement takes over the original's fills and releases its remaining quantity
+        filled = float(original['cumQuantity'])
+        remaining = float(original['quantity']) - filled
+        quantity = float(params['quantity']) - filled
+        with self._lock:
+            if limits is not None:
+                self._check(limits, symbol, side, quantity,
+                            params.get('price', original.get('price')), remaining, replacing=True)
+            if params.get('requestClientId') is not None:
+                self.orders.reserve(params['requestClientId'], symbol, side,
+                                    max(quantity - remaining, 0.0), count=0)
+
+    def _check(self, limits, symbol, side, quantity, price, released, replacing=False):
+        buy = side == 'buy'
+        book = self.books.get(symbol)
+        quote = None
+        if book is not None:
+            quote = book.best_ask() if buy else book.best_bid()
+
+        if limits.max_open_orders is not None and not replacing:
+            orders = self.orders
+            if orders.open_order_count(symbol) + orders.reserved_count(symbol) >= \
+                    limits.max_open_orders:
+                raise RiskError("%s: %s open orders reached" % (symbol, limits.max_open_orders))
+
+        if limits.max_position is not None:
+            position = self.orders.position(symbol)
+            change = (quantity - released) if buy else -(quantity - released)
+            pending = self.orders.open_quantity(symbol, side) + \
+                self.orders.reserved_quantity(symbol, side)
+            if abs(position + change + (pending if buy else -pending)) > limits.max_position:
+                raise RiskError("%s: position limit of %s breached" % (symbol, limits.max_position))
+
+        if price is not None:
+            price = float(price)
+        elif quote is not None:
+            price = quote[0]
+        else:
+            return
+
+        if limits.max_notional is not None and price * quantity > limits.max_notional:
+            raise RiskError("%s: notional %s exceeds %s" % (symbol, price * quantity,
+                                                           limits.max_notional))
+
+        if limits.price_band is not None and quote is not None:
+            if buy and price > quote[0] * (1 + limits.price_band):
+                raise RiskError("%s: buy price %s outside band above ask %s" % (symbol, price,
+                                                                               quote[0]))
+            elif not buy and price < quote[0] * (1 - limits.price_band):
+                raise RiskError("%s: sell price %s outside band below bid %s" % (symbol, price,
+                                                                                quote[0]))
@@ -0,0 +1,206 @@
+"""Exchange-independent market data and order events, and the adapter producing them for HitBTC.
+
+The events extend the record types of :mod:`hitbtc_wss.records` by the ``exchange`` they came
+from and a normalized ``symbol`` of the form ``'BASE/QUOTE'``. Every event has a ``timestamp`` in
+milliseconds since epoch, if the exchange sent one. Prices and quantities are floats, sides are
+``'buy'`` or ``'sell'``, and order statuses are one of ``ORDER_STATUSES``.
+"""
+
+# Import Built-Ins
+import logging
+
+# Import Homebrew
+from hitbtc_wss.records import Trade, BookUpdate, Ticker, Report, _float
+from hitbtc_wss.utils import parse_timestamp
+
+# Init Logging Facilities
+log = logging.getLogger(__name__)
+
+
+ORDER_STATUSES = frozenset(('new', 'partially_filled', 'filled', 'canceled', 'expired',
+                            'suspended'))
+
+
+class TradeEvent(Trade):
+    """A public trade."""
+
+    __slots__ = ('exchange', 'symbol')
+    kind = 'trade'
+
+    def __init__(self, exchange, symbol, i_d, price, quantity, side, timestamp):
+        """Initialize the instance."""
+        super(TradeEvent, self).__init__(i_d, price, quantity, side, timestamp)
+        self.exchange = exchange
+        self.symbol = symbol
+
+    def __repr__(self):
+        return 'TradeEvent(%s, %s, price=%r, quantity=%r, side=%r, timestamp=%r)' % (
+            self.exchange, self.symbol, self.price, self.quantity, self.side, self.timestamp)
+
+
+class BookEvent(BookUpdate):
+    """An order book snapshot, or an update to one; a size of 0 removes the level."""
+
+    __slots__ = ('exchange', 'symbol', 'timestamp', 'snapshot')
+    kind = 'book'
+
+    def __init__(self, exchange, symbol, timestamp, sequence, snapshot):
+        """Initialize an event without levels."""
+        super(BookEvent, self).__init__(sequence)
+        self.exchange = exchange
+        self.symbol = symbol
+        self.timestamp = timestamp
+        self.snapshot = snapshot
+
+    def __repr__(self):
+        return 'BookEvent(%s, %s, sequence=%r, snapshot=%r, %s bids, %s asks)' % (
+            self.exchange, self.symbol, self.sequence, self.snapshot, len(self.bid_prices),
+            len(self.ask_prices))
+
+
+class TickerEvent(Ticker):
+    """Best quotes, last price and 24h statistics; values the exchange sent as null are None."""
+
+    __slots__ = ('exchange', 'symbol')
+    kind = 'ticker'
+
+    def __init__(self, exchange, symbol, *fields):
+        """Initialize the instance; ``fields`` are those of :class:`hitbtc_wss.records.Ticker`."""
+        super(TickerEvent, self).__init__(*fields)
+        self.exchange = exchange
+        self.symbol = symbol
+
+    def __repr__(self):
+        return 'TickerEvent(%s, %s, bid=%r, ask=%r, last=%r, timestamp=%r)' % (
+            self.exchange, self.symbol, self.bid, self.ask, self.last, self.timestamp)
+
+
+class OrderEvent(Report):
+    """A change to one of our orders; ``status`` is one of ``ORDER_STATUSES``.
+
+    The ``trade_*`` fields describe the fill that caused the event, if any.
+    """
+
+    __slots__ = ('exchange',)
+    kind = 'order'
+
+    def __init__(self, exchange, **fields):
+        """Initialize the instance from keyword arguments named like its slots."""
+        super(OrderEvent, self).__init__(**fields)
+        self.exchange = exchange
+
+    @property
+    def timestamp(self):
+        """Time of the order's last update, in milliseconds since epoch."""
+        return self.updated_at
+
+    def __repr__(self):
+        return 'OrderEvent(%s, %s, client_order_id=%r, status=%r, filled=%r/%r)' % (
+            self.exchange, self.symbol, self.client_order_id, self.status, self.cum_quantity,
+            self.quantity)
+
+
+class HitBTCAdapter:
+    """Convert decoded HitBTC stream messages into events.
+
+    Fields are read straight from the decoded ``params`` into the events. Symbols are normalized
+    via ``metadata`` (a :class:`hitbtc_wss.metadata.MetadataCache`); messages of symbols it doesn't
+    know are dropped with a warning, as their events couldn't be told apart from other exchanges'.
+    """
+
+    exchange = 'hitbtc'
+    statuses = {'new': 'new', 'partiallyFilled': 'partially_filled', 'filled': 'filled',
+                'canceled': 'canceled', 'expired': 'expired', 'suspended': 'suspended'}
+
+    def __init__(self, metadata=None):
+        """Initialize a HitBTCAdapter instance.
+
+        :param metadata: MetadataCache to look up base and quote currencies in
+        """
+        self.metadata = metadata
+        self._symbols = {}
+        self._unknown = set()
+        self._converters = {'snapshotTrades': self.trades, 'updateTrades': self.trades,
+                            'snapshotOrderbook': self.book, 'updateOrderbook': self.book,
+                            'ticker': self.ticker, 'report': self.order}
+
+    def symbol(self, symbol):
+        """Return the normalized form of a HitBTC symbol id, e.g. 'ETH/BTC' for 'ETHBTC'.
+
+        :return: the normalized symbol, or None if the metadata doesn't know the symbol
+        """
+        normalized = self._symbols.get(symbol)
+        if normalized is None:
+            info = self.metadata.get(symbol) if self.metadata is not None else None
+            if info is None:
+                if symbol not in self._unknown:
+                    log.warning("Dropping events of %s: not in the symbol metadata", symbol)
+                    self._unknown.add(symbol)
+                return None
+            normalized = self._symbols[symbol] = '%s/%s' % (info['baseCurrency'],
+                                                            info['quoteCurrency'])
+            self._unknown.discard(symbol)
+        return normalized
+
+    def convert(self, method, params):
+        """Return the list of events in a stream message, or None if it has no event type.
+
+        Messages of unknown symbols yield an empty list.
+        """
+        converter = self._converters.get(method)
+        if converter is None:
+            return None
+        symbol = self.symbol(params['symbol'])
+        if symbol is None:
+            return []
+        return converter(method, symbol, params)
+
+    def trades(self, method, symbol, params):
+        """Convert a ``snapshotTrades`` or ``updateTrades`` message."""
+        exchange = self.exchange
+        events = []
+        # Trades of a message mostly share their timestamp, so only parse it when it changes
+        last = timestamp = None
+        for trade in params['data']:
+            if trade['timestamp'] != last:
+                last = trade['timestamp']
+                timestamp = parse_timestamp(last)
+            events.append(TradeEvent(exchange, symbol, trade['id'], float(trade['price']),
+                                     float(trade['quantity']), trade['side'], timestamp))
+        return events
+
+    def book(self, method, symbol, params):
+        """Convert a ``snapshotOrderbook`` or ``updateOrderbook`` message."""
+        timestamp = params.get('timestamp')
+        event = BookEvent(self.exchange, symbol, parse_timestamp(timestamp) if timestamp else None,
+                          params.get('sequence'), method == 'snapshotOrderbook')
+        asks, bids = params['ask'], params['bid']
+        event.ask_prices.extend([float(level['price']) for level in asks])
+        event.ask_sizes.extend([float(level['size']) for level in asks])
+        event.bid_prices.extend([float(level['price']) for level in bids])
+        event.bid_sizes.extend([float(level['size']) for level in bids])
+        return [event]
+
+    def ticker(self, method, symbol, params):
+        """Convert a ``ticker`` message."""
+        return [TickerEvent(self.exchange, symbol, _float(params['ask']), _float(params['bid']),
+                            _float(params['last']), _float(params['open']), _float(params['low']),
+                            _float(params['high']), _float(params['volume']),
+                            _float(params['volumeQuote']), parse_timestamp(params['timestamp']))]
+
+    def order(self, method, symbol, params):
+        """Convert a ``report`` message."""
+        get = params.get
+        return [OrderEvent(self.exchange, id=get('id'), client_order_id=get('clientOrderId'),
+                           symbol=symbol, side=get('side'),
+                           status=self.statuses.get(get('status'), get('status')),
+                           type=get('type'), time_in_force=get('timeInForce'),
+                           quantity=_float(get('quantity')), price=_float(get('price')),
+                           cum_quantity=_float(get('cumQuantity')),
+                           created_at=parse_timestamp(params['createdAt']),
+                           updated_at=parse_timestamp(params['updatedAt']),
+                           report_type=get('reportType'),
+                           original_request_client_order_id=get('originalRequestClientOrderId'),
+                           trade_id=get('tradeId'), trade_quantity=_float(get('tradeQuantity')),
+                           trade_price=_float(get('tradePrice')),
+                           trade_fee=_float(get('tradeFee')))]
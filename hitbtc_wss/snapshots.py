@@ -0,0 +1,216 @@
+"""Bulk ingestion of stream arrays into NumPy structured arrays.
+
+Requires NumPy (``pip install hitbtc_wss[numpy]``), which is imported on first use.
+"""
+
+# Import Built-Ins
+import logging
+from operator import itemgetter
+
+# Init Logging Facilities
+log = logging.getLogger(__name__)
+
+TRADE_FIELDS = [('id', 'i8'), ('timestamp', 'i8'), ('price', 'f8'), ('quantity', 'f8'),
+                ('side', 'i1')]
+CANDLE_FIELDS = [('timestamp', 'i8'), ('open', 'f8'), ('close', 'f8'), ('min', 'f8'),
+                 ('max', 'f8'), ('volume', 'f8'), ('volume_quote', 'f8')]
+LEVEL_FIELDS = [('price', 'f8'), ('size', 'f8')]
+BOOK_UPDATE_FIELDS = [('sequence', 'i8'), ('side', 'i1'), ('price', 'f8'), ('size', 'f8')]
+
+_np = None
+
+
+def _numpy():
+    """Import NumPy on first use."""
+    global _np
+    if _np is None:
+        try:
+            import numpy
+        except ImportError:
+            raise ImportError("hitbtc_wss.snapshots requires NumPy; "
+                              "install it via 'pip install hitbtc_wss[numpy]'!")
+        _np = numpy
+    return _np
+
+
+def _column(np, data, key, dtype):
+    """Convert the values of ``key`` in ``data`` to an array in a single vectorized cast."""
+    return np.array(list(map(itemgetter(key), data))).astype(dtype)
+
+
+def _timestamps(np, data, key='timestamp'):
+    """Convert the API timestamps of ``key`` in ``data`` to milliseconds since epoch."""
+    values = np.char.rstrip(np.array(list(map(itemgetter(key), data))), 'Z')
+    return values.astype('datetime64[ms]').astype('i8')
+
+
+def trades_to_array(data):
+    """Convert a list of trade dicts to a structured array of ``TRADE_FIELDS``.
+
+    ``side`` is 1 for buys and -1 for sells.
+    """
+    np = _numpy()
+    arr = np.empty(len(data), dtype=TRADE_FIELDS)
+    if data:
+        arr['id'] = np.fromiter(map(itemgetter('id'), data), dtype='i8', count=len(data))
+        arr['timestamp'] = _timestamps(np, data)
+        arr['price'] = _column(np, data, 'price', 'f8')
+        arr['quantity'] = _column(np, data, 'quantity', 'f8')
+        arr['side'] = np.where(np.array(list(map(itemgetter('side'), data))) == 'buy', 1, -1)
+    return arr
+
+
+def candles_to_array(data):
+    """Convert a list of candle dicts to a structured array of ``CANDLE_FIELDS``."""
+    np = _numpy()
+    arr = np.empty(len(data), dtype=CANDLE_FIELDS)
+    if data:
+        arr['timestamp'] = _timestamps(np, data)
+        for name, key in (('open', 'open'), ('close', 'close'), ('min', 'min'), ('max', 'max'),
+                          ('volume', 'volume'), ('volume_quote', 'volumeQuote')):
+            arr[name] = _column(np, data, key, 'f8')
+    return arr
+
+
+def levels_to_array(levels):
+    """Convert a list of order book level dicts to a structured array of ``LEVEL_FIELDS``."""
+    np = _numpy()
+    arr = np.empty(len(levels), dtype=LEVEL_FIELDS)
+    if levels:
+        arr['price'] = _column(np, levels, 'price', 'f8')
+        arr['size'] = _column(np, levels, 'size', 'f8')
+    return arr
+
+
+class AppendOnlyArray:
+    """Growable structured array; ``view`` returns the filled part without copying.
+
+    Capacity doubles when exhausted, so appends are amortized O(1) per row. Views taken before a
+    resize keep pointing at the old buffer.
+    """
+
+    def __init__(self, dtype, capacity=None):
+        """Initialize an AppendOnlyArray instance.
+
+        :param dtype: NumPy dtype or list of fields
+        :param capacity: initial number of rows; defaults to 1024
+        """
+        self._buffer = _numpy().empty(capacity or 1024, dtype=dtype)
+        self._size = 0
+
+    def __len__(self):
+        return self._size
+
+    @property
+    def view(self):
+        """Return the filled part of the buffer."""
+        return self._buffer[:self._size]
+
+    def clear(self):
+        """Drop all rows, keeping the allocated buffer."""
+        self._size = 0
+
+    def extend(self, rows):
+        """Append a structured array of matching dtype."""
+        end = self._size + len(rows)
+        if end > len(self._buffer):
+            capacity = len(self._buffer)
+            while capacity < end:
+                capacity *= 2
+            buffer = _numpy().empty(capacity, dtype=self._buffer.dtype)
+            buffer[:self._size] = self._buffer[:self._size]
+            self._buffer = buffer
+        self._buffer[self._size:end] = rows
+        self._size = end
+
+
+class SnapshotIngestor:
+    """Stream handler collecting trades, candles and order book data in structured arrays.
+
+    Snapshots replace the collected data of a symbol; updates are appended to it, except for
+    updates of the last candle, which replace it. Order book updates are kept as rows of
+    ``BOOK_UPDATE_FIELDS`` - ``side`` is 1 for bids and -1 for asks - next to the last snapshot's
+    bid and ask arrays.
+
+    Register instances via :meth:`hitbtc_wss.connector.HitBTCConnector.add_handler`.
+    """
+
+    def __init__(self, capacity=None):
+        """Initialize a SnapshotIngestor instance.
+
+        :param capacity: initial number of rows per symbol and array
+        """
+        _numpy()
+        self.capacity = capacity
+        self._trades = {}
+        self._candles = {}
+        self._book_updates = {}
+        self.book_snapshots = {}
+        self._handlers = {'snapshotTrades': self._on_trades, 'updateTrades': self._on_trades,
+                          'snapshotCandles': self._on_candles, 'updateCandles': self._on_candles,
+                          'snapshotOrderbook': self._on_book_snapshot,
+                          'updateOrderbook': self._on_book_update}
+
+    def __call__(self, method, symbol, params):
+        """Ingest a stream item."""
+        handler = self._handlers.get(method)
+        if handler:
+            handler(method.startswith('snapshot'), symbol, params)
+
+    def _array(self, arrays, key, fields, reset):
+        arr = arrays.get(key)
+        if arr is None:
+            arr = arrays[key] = AppendOnlyArray(fields, self.capacity)
+        elif reset:
+            arr.clear()
+        return arr
+
+    def _on_trades(self, snapshot, symbol, params):
+        self._array(self._trades, symbol, TRADE_FIELDS, snapshot).extend(
+            trades_to_array(params['data']))
+
+    def _on_candles(self, snapshot, symbol, params):
+        key = (symbol, params.get('period'))
+        arr = self._array(self._candles, key, CANDLE_FIELDS, snapshot)
+        rows = candles_to_array(params['data'])
+        if len(arr) and len(rows):
+            # Updates resend the still open candle; replace its row rather than appending another
+            view = arr.view
+            last = view['timestamp'][-1]
+            timestamps = rows['timestamp']
+            same = timestamps == last
+            if same.any():
+                view[-1] = rows[same][-1]
+            rows = rows[timestamps > last]
+        arr.extend(rows)
+
+    def _on_book_snapshot(self, snapshot, symbol, params):
+        self.book_snapshots[symbol] = (params.get('sequence'), levels_to_array(params['bid']),
+                                       levels_to_array(params['ask']))
+        self._array(self._book_updates, symbol, BOOK_UPDATE_FIELDS, True)
+
+    def _on_book_update(self, snapshot, symbol, params):
+        np = _numpy()
+        bids, asks = levels_to_array(params['bid']), levels_to_array(params['ask'])
+        rows = np.empty(len(bids) + len(asks), dtype=BOOK_UPDATE_FIELDS)
+        rows['sequence'] = params.get('sequence') or 0
+        rows['side'][:len(bids)] = 1
+        rows['side'][len(bids):] = -1
+        rows['price'] = np.concatenate((bids['price'], asks['price']))
+        rows['size'] = np.concatenate((bids['size'], asks['size']))
+        self._array(self._book_updates, symbol, BOOK_UPDATE_FIELDS, False).extend(rows)
+
+    def trades(self, symbol):
+        """Return the collected trades of ``symbol`` as a structured array."""
+        arr = self._trades.get(symbol)
+        return arr.view if arr is not None else _numpy().empty(0, dtype=TRADE_FIELDS)
+
+    def candles(self, symbol, period='M30'):
+        """Return the collected candles of ``symbol`` and ``period`` as a structured array."""
+        arr = self._candles.get((symbol, period))
+        return arr.view if arr is not None else _numpy().empty(0, dtype=CANDLE_FIELDS)
+
+    def book_updates(self, symbol):
+        """Return the order book updates of ``symbol`` since its last snapshot."""
+        arr = self._book_updates.get(symbol)
+        return arr.view if arr is not None else _numpy().empty(0, dtype=BOOK_UPDATE_FIELDS)
@@ -0,0 +1,84 @@
+"""Snapshot and restore of a connector's local state, for warm restarts.
+
+Order books are not part of the state: subscribing to a book always starts with a full
+``snapshotOrderbook``, and the API offers no way to resume from a sequence number, so a saved
+book could never be brought up to date - only replaced.
+"""
+
+# Import Built-Ins
+import logging
+import gzip
+import json
+import os
+import time
+
+# Init Logging Facilities
+log = logging.getLogger(__name__)
+
+
+STATE_VERSION = 3
+
+
+def snapshot(connector):
+    """Return the state of a :class:`hitbtc_wss.connector.HitBTCConnector` as a JSON-able dict.
+
+    The state covers the subscription registry, symbol and currency metadata, open orders,
+    positions and fill statistics.
+    """
+    metadata = connector.metadata
+    return {'version': STATE_VERSION,
+            'saved_at': time.time(),
+            'subscriptions': connector.subscriptions.export(),
+            'metadata': {'updated_at': metadata.updated_at,
+                         'symbols': list(metadata.symbols.values()),
+                         'currencies': list(metadata.currencies.values())},
+            'orders': connector.orders.export()}
+
+
+def restore(connector, state):
+    """Restore a connector's state from a dict returned by ``snapshot()``.
+
+    Call this before starting the connector: restored subscriptions are sent once the connection
+    opens, and their books are filled by the snapshots that follow. Restored orders are
+    reconciled via ``getOrders`` once logged in.
+    """
+    if state.get('version') != STATE_VERSION:
+        raise ValueError("Unsupported state version %r" % state.get('version'))
+
+    connector.subscriptions.restore(tuple(entry) for entry in state['subscriptions'])
+
+    metadata = connector.metadata
+    if not metadata.fresh and state['metadata']['updated_at'] > metadata.updated_at:
+        for symbol in state['metadata']['symbols']:
+            metadata.update_symbol(symbol)
+        for currency in state['metadata']['currencies']:
+            metadata.update_currency(currency)
+        metadata.updated_at = state['metadata']['updated_at']
+
+    connector.orders.restore(state['orders'])
+    if state['orders']['open']:
+        connector.reconcile_on_login = True
+
+
+def save(connector, path):
+    """Write a snapshot of the connector's state to ``path`` as gzip-compressed JSON."""
+    tmp_path = path + '.tmp'
+    data = json.dumps(snapshot(connector), separators=(',', ':')).encode('UTF-8')
+    with gzip.open(tmp_path, 'wb', compresslevel=1) as f:
+        f.write(data)
+    os.replace(tmp_path, path)
+
+
+def load(connector, path):
+    """Restore the connector's state from a file written by ``save()``.
+
+    :return: True if the state was restored, False if there was no file
+    """
+    try:
+        with gzip.open(path, 'rb') as f:
+            state = json.loads(f.read())
+    except FileNotFoundError:
+        return False
+    restore(connector, state)
+    log.info("Restored state saved %.0fs ago from %s", time.time() - state['saved_at'], path)
+    return True
@@ -0,0 +1,176 @@
+"""Reference-counted registry of market data subscriptions."""
+
+# Import Built-Ins
+import logging
+from collections import OrderedDict
+from itertools import count
+from queue import Queue
+from threading import Thread, Lock
+
+# Import Homebrew
+from hitbtc_wss.ratelimit import RateLimiter
+
+# Init Logging Facilities
+log = logging.getLogger(__name__)
+
+
+def subscription_key(channel, params):
+    """Return the key identifying a subscription to ``channel`` with the given params.
+
+    :param channel: channel name, i.e. the subscribe method without its 'subscribe' prefix
+    :param params: subscription parameters
+    :return: tuple of channel, symbol and candle period
+    """
+    if channel == 'Reports':
+        return channel, None, None
+    if channel == 'Candles':
+        return channel, params.get('symbol'), params.get('period') or 'M30'
+    return channel, params.get('symbol'), None
+
+
+class SubscriptionRegistry:
+    """Track subscriptions of a :class:`hitbtc_wss.connector.HitBTCConnector`.
+
+    Subscriptions are reference-counted per channel, symbol and period. Only the first
+    ``subscribe()`` and the last ``unsubscribe()`` of a key send a request; all others return
+    False without sending anything, so no response with their ``custom_id`` is received either.
+
+    Requests are sent from a background thread, paced to ``rate`` requests per second, so that
+    subscribing to hundreds of symbols at once does not get throttled. Requests issued while
+    disconnected, or failing to send, are dropped; ``resubscribe()`` - called by the connector
+    whenever a connection opens - queues all active subscriptions again.
+    """
+
+    def __init__(self, connector, rate=None, burst=None):
+        """Initialize a SubscriptionRegistry instance.
+
+        :param connector: HitBTCConnector to send requests with
+        :param rate: subscription requests per second; defaults to 10
+        :param burst: number of requests that may be sent at once; defaults to ``rate``
+        """
+        self.connector = connector
+        self.limiter = RateLimiter(rate or 10, burst)
+        self.counts = OrderedDict()
+        self.params = {}
+        self._queued = set()
+        self._ids = count()
+        self._q = Queue()
+        self._lock = Lock()
+        self._sender = None
+
+    def subscribe(self, method, custom_id=None, **params):
+        """Add a reference to a subscription, subscribing if it's the first one.
+
+        :param method: subscribe method, e.g. 'subscribeTicker'
+        :param custom_id: custom ID for the request, if one is sent; a unique one if None
+        :return: True if a subscribe request was queued
+        """
+        key = subscription_key(method[len('subscribe'):], params)
+        with self._lock:
+            count = self.counts.get(key, 0)
+            self.counts[key] = count + 1
+            if count:
+                self._collapsed(key, method, custom_id)
+                return False
+            self.params[key] = (method, params)
+            self._enqueue(key, method, params, custom_id)
+        return True
+
+    def subscribe_many(self, method, params_list):
+        """Subscribe to the given list of params dicts; see ``subscribe()``.
+
+        :return: number of subscribe requests queued
+        """
+        return sum(self.subscribe(method, **params) for params in params_list)
+
+    def unsubscribe(self, method, custom_id=None, **params):
+        """Remove a reference to a subscription, unsubscribing if it was the last one.
+
+        :param method: subscribe method, e.g. 'subscribeTicker'
+        :param custom_id: custom ID for the request, if one is sent; a unique one if None
+        :return: True if an unsubscribe request was queued
+        """
+        key = subscription_key(method[len('subscribe'):], params)
+        with self._lock:
+            count = self.counts.get(key, 0)
+            if count > 1:
+                self.counts[key] = count - 1
+                self._collapsed(key, 'un' + method, custom_id)
+                return False
+            elif not count:
+                log.warning("Not subscribed to %s; ignoring unsubscribe.", key)
+                return False
+            del self.counts[key]
+            method, params = self.params.pop(key)
+            self._enqueue(key, 'un' + method, params, custom_id)
+        return True
+
+    def resubscribe(self):
+        """Queue subscribe requests for all active subscriptions."""
+        with self._lock:
+            for key in self.counts:
+                method, params = self.params[key]
+                self._enqueue(key, method, params, None, dedup=True)
+
+    def active(self):
+        """Return a dict of active subscription keys and their reference counts."""
+        with self._lock:
+            return dict(self.counts)
+
+    def export(self):
+        """Return the active subscriptions as a list of ``(method, params, count)`` tuples."""
+        with self._lock:
+            return [self.params[key] + (count,) for key, count in self.counts.items()]
+
+    def restore(self, subscriptions):
+        """Add references to subscriptions exported via ``export()``, without sending anything.
+
+        The subscriptions are sent by the next ``resubscribe()``, i.e. once the connection opens.
+        """
+        with self._lock:
+            for method, params, count in subscriptions:
+                key = subscription_key(method[len('subscribe'):], params)
+                self.counts[key] = self.counts.get(key, 0) + count
+                self.params[key] = (method, params)
+
+    @property
+    def pending(self):
+        """Number of requests waiting to be sent."""
+        return self._q.qsize()
+
+    @staticmethod
+    def _collapsed(key, method, custom_id):
+        """Log a request that only changed a reference count, so its ``custom_id`` isn't lost."""
+        if method.startswith('un'):
+            reason = "%s is still referenced" % (key,)
+        else:
+            reason = "already subscribed to %s" % (key,)
+        log.log(logging.INFO if custom_id is not None else logging.DEBUG,
+                "Not sending %s request %s: %s.", method, custom_id, reason)
+
+    def _enqueue(self, key, method, params, custom_id, dedup=False):
+        if dedup and (key, method) in self._queued:
+            return
+        self._queued.add((key, method))
+        if custom_id is None:
+            # Paced requests go out in bursts, too fast for the connector's time-based ids
+            custom_id = 'subscription-%d' % next(self._ids)
+        self._q.put((key, method, params, custom_id))
+        if self._sender is None or not self._sender.is_alive():
+            self._sender = Thread(target=self._send_loop, daemon=True)
+            self._sender.start()
+
+    def _send_loop(self):
+        while True:
+            key, method, params, custom_id = self._q.get()
+            with self._lock:
+                self._queued.discard((key, method))
+            if not self.connector._is_connected:
+                log.debug("Not connected; dropping %s for %s.", method, key)
+                continue
+            self.limiter.acquire()
+            try:
+                self.connector.send(method, custom_id=custom_id, **params)
+            except Exception as e:
+                # E.g. the socket closed during a reconnect; resubscribe() queues it again
+                log.error("Could not send %s for %s, dropping it: %s", method, key, e)
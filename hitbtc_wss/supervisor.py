@@ -0,0 +1,202 @@
+"""Connection health monitoring: latency probes, stale stream detection and proactive reconnects."""
+
+# Import Built-Ins
+import logging
+import time
+from threading import Thread, Event
+
+# Init Logging Facilities
+log = logging.getLogger(__name__)
+
+
+class StreamWatchdog:
+    """Stream handler recording when each symbol last received a stream item."""
+
+    def __init__(self):
+        """Initialize a StreamWatchdog instance."""
+        self.last_seen = {}
+        self.since = time.monotonic()
+
+    def __call__(self, method, symbol, params):
+        """Record the arrival of a stream item."""
+        self.last_seen[symbol] = time.monotonic()
+
+    def reset(self):
+        """Forget all arrival times, e.g. after reconnecting."""
+        self.last_seen = {}
+        self.since = time.monotonic()
+
+    def stale(self, symbols, after, overrides=None, now=None):
+        """Return those of ``symbols`` that received nothing for more than ``after`` seconds.
+
+        Symbols not seen at all count from the watchdog's creation or last reset.
+
+        :param overrides: dict of symbols and their own ``after``
+        """
+        now = now or time.monotonic()
+        overrides = overrides or {}
+        last_seen, since = self.last_seen, self.since
+        return [symbol for symbol in symbols
+                if now - last_seen.get(symbol, since) > overrides.get(symbol, after)]
+
+
+class ConnectionHealth:
+    """Health state of a single connection, as tracked by :class:`ConnectionSupervisor`.
+
+    :ivar latency: exponentially weighted moving average of probe round trip times, in seconds
+    :ivar slow_probes: number of consecutive probes slower than the supervisor's ``max_rtt``
+    :ivar stale: symbols currently considered stale
+    :ivar reconnects: number of reconnects issued by the supervisor
+    """
+
+    __slots__ = ('conn', 'watchdog', 'latency', 'slow_probes', 'stale', 'reconnects',
+                 'last_reconnect')
+
+    def __init__(self, conn, watchdog):
+        """Initialize the instance."""
+        self.conn = conn
+        self.watchdog = watchdog
+        self.latency = None
+        self.slow_probes = 0
+        self.stale = []
+        self.reconnects = 0
+        self.last_reconnect = None
+
+
+class ConnectionSupervisor:
+    """Watch the health of one or more :class:`hitbtc_wss.connector.HitBTCConnector` objects.
+
+    Every ``interval`` seconds, a background thread checks each connected connection:
+
+        - A lightweight probe request measures the round trip time (see
+          :meth:`hitbtc_wss.connector.HitBTCConnector.probe`), smoothed into ``latency``.
+        - A probe left unanswered for ``probe_timeout`` seconds means the connection stalled.
+        - ``max_slow`` consecutive probes slower than ``max_rtt`` mean it's degraded.
+        - Subscribed symbols without a stream item for ``stale_after`` seconds are flagged as
+          stale and passed to ``on_stale(conn, symbols)``; if all of them are, the stream stalled.
+
+    Stalled and degraded connections are recycled via ``reconnect()``, at most once per
+    ``cooldown`` seconds, which also restores their subscriptions. ``best()`` returns the healthy
+    connection with the lowest latency, to route requests through.
+    """
+
+    def __init__(self, connectors, interval=None, probe_timeout=None, max_rtt=None, max_slow=None,
+                 stale_after=None, stale_overrides=None, cooldown=None, on_stale=None):
+        """Initialize a ConnectionSupervisor instance.
+
+        :param connectors: HitBTCConnector objects to supervise
+        :param interval: seconds between checks; defaults to 5
+        :param probe_timeout: seconds after which an unanswered probe is a stall; defaults to 10
+        :param max_rtt: round trip time in seconds above which a probe is slow; unchecked if None
+        :param max_slow: consecutive slow probes after which to reconnect; defaults to 3
+        :param stale_after: seconds without stream items after which a symbol is stale; unchecked
+                            if None
+        :param stale_overrides: dict of symbols and their own ``stale_after``
+        :param cooldown: minimum seconds between reconnects of a connection; defaults to 60
+        :param on_stale: callable invoked with the connection and its list of stale symbols
+        """
+        self.interval = interval or 5
+        self.probe_timeout = probe_timeout or 10
+        self.max_rtt = max_rtt
+        self.max_slow = max_slow or 3
+        self.stale_after = stale_after
+        self.stale_overrides = stale_overrides or {}
+        self.cooldown = cooldown if cooldown is not None else 60
+        self.on_stale = on_stale
+        self.health = []
+        for conn in connectors:
+            watchdog = StreamWatchdog()
+            conn.add_handler(watchdog)
+            self.health.append(ConnectionHealth(conn, watchdog))
+        self._stopped = Event()
+        self._thread = None
+
+    def start(self):
+        """Start checking in a background thread."""
+        if self._thread is not None and self._thread.is_alive():
+            return
+        self._stopped.clear()
+        self._thread = Thread(target=self._run, name='connection-supervisor', daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        """Stop checking."""
+        self._stopped.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def _run(self):
+        while not self._stopped.wait(self.interval):
+            try:
+                self.check()
+            except Exception as e:
+                log.exception("Supervisor check failed: %s", e)
+
+    def check(self, now=None):
+        """Check all connections once, reconnecting those that stalled or degraded."""
+        now = now or time.monotonic()
+        for health in self.health:
+            reason = self._check(health, now)
+            if reason:
+                self._reconnect(health, reason, now)
+
+    def _check(self, health, now):
+        """Check a single connection; return why it must be recycled, or None."""
+        conn = health.conn
+        if not conn.connected:
+            return None
+
+        if conn.probe_sent_at is not None:
+            if now - conn.probe_sent_at > self.probe_timeout:
+                return "probe unanswered for %.1fs" % (now - conn.probe_sent_at)
+        else:
+            if conn.probe_rtt is not None:
+                rtt = conn.probe_rtt / 1e9
+                health.latency = rtt if health.latency is None else \
+                    0.8 * health.latency + 0.2 * rtt
+                if self.max_rtt is not None and rtt > self.max_rtt:
+                    health.slow_probes += 1
+                    if health.slow_probes >= self.max_slow:
+                        return "%s probes slower than %ss" % (health.slow_probes, self.max_rtt)
+                else:
+                    health.slow_probes = 0
+                conn.probe_rtt = None
+            conn.probe()
+
+        if self.stale_after is not None:
+            symbols = {symbol for _, symbol, _ in conn.subscriptions.active() if symbol}
+            health.stale = health.watchdog.stale(symbols, self.stale_after, self.stale_overrides,
+                                                 now)
+            if health.stale:
+                log.warning("Stale streams on %s: %s", conn.url, health.stale)
+                if self.on_stale is not None:
+                    self.on_stale(conn, health.stale)
+                if len(health.stale) == len(symbols):
+                    return "all %s subscribed symbols are stale" % len(symbols)
+        return None
+
+    def _reconnect(self, health, reason, now):
+        if health.last_reconnect is not None and now - health.last_reconnect < self.cooldown:
+            log.warning("Not recycling %s (%s): reconnected %.0fs ago", health.conn.url, reason,
+                        now - health.last_reconnect)
+            return
+        log.warning("Recycling connection to %s: %s", health.conn.url, reason)
+        health.last_reconnect = now
+        health.reconnects += 1
+        health.slow_probes = 0
+        health.latency = None
+        health.stale = []
+        health.watchdog.reset()
+        health.conn.reconnect()
+
+    def best(self):
+        """Return the connected connection with the lowest latency, or None.
+
+        Connections without a latency measurement yet come last.
+        """
+        connected = [health for health in self.health if health.conn.connected]
+        if not connected:
+            return None
+        return min(connected, key=lambda health: (health.latency is None,
+                                                  health.latency or 0)).conn
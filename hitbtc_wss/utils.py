@@ -1,7 +1,11 @@
 """
 Message templates to log when handling responses to requests that are SUCCESFUL.
 Failed requests are logged using the error code contained in the response and its related message.
+
+Also holds helpers shared by the client modules.
 """
+from datetime import datetime
+
 resp_get_currency = '{currency}:\n' \
                '\t{fullName}({id}):' \
                '\tIs a cryptocurrency: {crypto}\n' \
@@ -94,3 +98,8 @@ response_types = {'getCurrency': resp_get_currency, 'getCurrencies': resp_get_cu
                   'cancelReplaceOrder': resp_cancel_replace_order,
                   'login': resp_login}
 
+
+
+def parse_timestamp(timestamp):
+    """Convert an API timestamp like '2017-10-19T16:34:25.041Z' to milliseconds since epoch."""
+    return round(datetime.fromisoformat(timestamp.replace('Z', '+00:00')).timestamp() * 1000)
@@ -0,0 +1,104 @@
+"""Downsampled views of the order book stream, each with a queue of its own."""
+
+# Import Built-Ins
+import logging
+import time
+from queue import Queue, Full, Empty
+
+# Import Homebrew
+from hitbtc_wss.queues import get_many
+
+# Init Logging Facilities
+log = logging.getLogger(__name__)
+
+
+class BookView:
+    """Stream handler delivering a throttled top of book of a single symbol to its own queue.
+
+    The view reads the order book the connector maintains, so it must be registered via
+    :meth:`hitbtc_wss.connector.HitBTCConnector.add_handler` - or more conveniently, be created via
+    :meth:`hitbtc_wss.client.HitBTC.book_view`, which shares a single upstream subscription
+    between all views and ``subscribe_book()`` calls.
+
+    For every order book message of its symbol, the view puts
+    ``('bookView', symbol, {'bid': [(price, size), ...], 'ask': [...], 'sequence': sequence})`` on
+    its queue, unless
+
+        - less than ``1 / max_rate`` seconds passed since the last item,
+        - neither best bid nor best ask moved by at least ``threshold`` since the last item, or
+        - the top ``depth`` levels are unchanged.
+
+    The checks run in that order, cheapest first. A change held back by them is delivered with
+    the next message that passes. If the queue is full, the oldest item is dropped.
+    """
+
+    def __init__(self, books, symbol, depth=None, max_rate=None, threshold=None, maxsize=None):
+        """Initialize a BookView instance.
+
+        :param books: mapping of symbols to OrderBook objects, updated before handlers are called
+        :param symbol: symbol to deliver
+        :param depth: number of levels per side; defaults to 1
+        :param max_rate: maximum items per second; unlimited if None
+        :param threshold: minimum change of best bid or ask price; any change if None
+        :param maxsize: size of the view's queue; defaults to 100
+        """
+        self.books = books
+        self.symbol = symbol
+        self.depth = depth or 1
+        self.interval = 1 / max_rate if max_rate else 0
+        self.threshold = threshold
+        self.q = Queue(maxsize=maxsize or 100)
+        self.dropped = 0
+        self._last_time = 0
+        self._last_bid = None
+        self._last_ask = None
+        self._last_top = None
+
+    def __call__(self, method, symbol, params):
+        """Deliver the top of book, if the update passes the view's filters."""
+        if symbol != self.symbol or method not in ('snapshotOrderbook', 'updateOrderbook'):
+            return
+        now = time.monotonic()
+        if now - self._last_time < self.interval:
+            return
+        book = self.books[symbol]
+        bid, ask = book.best_bid(), book.best_ask()
+        bid = bid and bid[0]
+        ask = ask and ask[0]
+        if self.threshold is not None and self._last_top is not None and \
+                not self._moved(bid, self._last_bid) and not self._moved(ask, self._last_ask):
+            return
+        top = book.top(self.depth)
+        if top == self._last_top:
+            return
+        self._last_time = now
+        self._last_bid, self._last_ask, self._last_top = bid, ask, top
+        self._put(('bookView', symbol, {'bid': top[0], 'ask': top[1], 'sequence': book.sequence}))
+
+    def _moved(self, price, last):
+        if price is None or last is None:
+            return price is not last
+        return abs(price - last) >= self.threshold
+
+    def _put(self, item):
+        while True:
+            try:
+                self.q.put_nowait(item)
+                return
+            except Full:
+                try:
+                    self.q.get_nowait()
+                    self.dropped += 1
+                except Empty:
+                    pass
+
+    def recv(self, block=True, timeout=None):
+        """Retrieve an item from the view's queue."""
+        return self.q.get(block, timeout)
+
+    def recv_many(self, max_items=None, timeout=None):
+        """Retrieve up to ``max_items`` items from the view's queue at once.
+
+        See :func:`hitbtc_wss.queues.get_many`.
+        """
+        return get_many(self.q, max_items, timeout)
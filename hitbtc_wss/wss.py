@@ -4,22 +4,39 @@
 
 # Import Built-Ins
 import logging
+import os
 from queue import Queue
 from threading import Thread, Timer
-import multiprocessing as mp
 
 import json
 import time
-import ssl
-
-# Import Third-Party
-import websocket
+import socket
 
 # Import home-grown
+from hitbtc_wss.queues import SPSCQueue, get_many
 
 # Init Logging Facilities
 log = logging.getLogger(__name__)
 
+# websocket-client, ssl and multiprocessing are only imported once they're needed; importing
+# them eagerly would triple the import time of the package.
+
+# SSL context shared by all connections, created on the first connect
+_ssl_context = None
+
+
+def ssl_options():
+    """Return the ``sslopt`` for websocket-client, creating the shared SSL context if required.
+
+    Loading the CA certificates is the bulk of the cost of a TLS context, so it's done once per
+    process rather than on every (re)connect.
+    """
+    global _ssl_context
+    if _ssl_context is None:
+        import ssl
+        _ssl_context = ssl.create_default_context(cafile=ssl.get_default_verify_paths().cafile)
+    return {'context': _ssl_context}
+
 
 class WebSocketConnector:
     """Websocket Connection Thread.
@@ -32,7 +49,8 @@ class WebSocketConnector:
 
     # pylint: disable=too-many-instance-attributes, too-many-arguments,unused-argument
 
-    def __init__(self, url, timeout=None, q_maxsize=None, reconnect_interval=None, log_level=None):
+    def __init__(self, url, timeout=None, q_maxsize=None, reconnect_interval=None, log_level=None,
+                 binary_frames=False, sockopt=None, spsc=False, log_file=None):
         """Initialize a WebSocketConnector Instance.
 
         :param url: websocket address, defaults to v2 websocket.
@@ -41,15 +59,26 @@ class WebSocketConnector:
                                    defaults to 10s.
         :param log_level: logging level for the connection Logger. Defaults to
                           logging.INFO.
+        :param binary_frames: pass text frames to _on_message() as undecoded bytes, skipping
+                              websocket-client's UTF-8 validation; the JSON decoder accepts
+                              bytes directly.
+        :param sockopt: socket options to set on the connection, as
+                        ``(level, option, value)`` tuples.
+        :param spsc: use a lock-free :class:`hitbtc_wss.queues.SPSCQueue` instead of a
+                     ``queue.Queue``; only valid with a single consumer thread.
+        :param log_file: path of a file to append the connection log to; nothing is written to
+                         disk if None.
         :param args: args for Thread.__init__()
         :param kwargs: kwargs for Thread.__ini__()
         """
         # Queue used to pass data up to Node
-        self.q = Queue(maxsize=q_maxsize or 100)
+        self.q = SPSCQueue(q_maxsize or 100) if spsc else Queue(maxsize=q_maxsize or 100)
 
         # Connection Settings
         self.url = url
         self.conn = None
+        self.binary_frames = binary_frames
+        self.sockopt = sockopt
 
         # Connection Handling Attributes
         self._is_connected = False
@@ -78,14 +107,28 @@ class WebSocketConnector:
         self.log = logging.getLogger(self.__module__)
         self.log.setLevel(level=log_level if log_level else logging.INFO)
         if log_level == logging.DEBUG:
+            import websocket
             websocket.enableTrace(True)
-
+        if log_file:
+            self._add_file_handler(log_file, log_level)
+
+    def _add_file_handler(self, log_file, log_level):
+        """Log to ``log_file``, unless the logger already does."""
+        path = os.path.abspath(log_file)
+        for handler in self.log.handlers:
+            if isinstance(handler, logging.FileHandler) and handler.baseFilename == path:
+                return
         formatter = logging.Formatter('%(asctime)s:%(name)s:%(levelname)s\t%(message)s')
-        file_handler = logging.FileHandler(filename='wss.log', mode='w+')
+        file_handler = logging.FileHandler(filename=path, mode='a')
         file_handler.setLevel(level=log_level if log_level else logging.DEBUG)
         file_handler.setFormatter(formatter)
         self.log.addHandler(file_handler)
 
+    @property
+    def connected(self):
+        """Whether the websocket connection is currently established."""
+        return self._is_connected
+
     def stop(self):
         """Wrap around disconnect()."""
         self.disconnect()
@@ -110,18 +153,23 @@ class WebSocketConnector:
         """Create a websocket connection.
 
         Automatically reconnects connection if it was severed unintentionally.
+
+        URLs of the form ``ws+unix:///path/to/socket`` connect to a websocket server listening on
+        a Unix domain socket, such as :class:`hitbtc_wss.gateway.Gateway`.
         """
+        import websocket
+
+        url = 'ws://localhost/' if self.url.startswith('ws+unix://') else self.url
         self.conn = websocket.WebSocketApp(
-            self.url,
+            url,
             on_open=self._on_open,
             on_message=self._on_message,
             on_error=self._on_error,
             on_close=self._on_close
         )
 
-        ssl_defaults = ssl.get_default_verify_paths()
-        sslopt_ca_certs = {'ca_certs': ssl_defaults.cafile}
-        self.conn.run_forever(sslopt=sslopt_ca_certs)
+        sslopt = ssl_options() if url.startswith('wss://') else None
+        self._run_forever(sslopt)
 
         while self.reconnect_required:
             if not self.disconnect_called:
@@ -131,7 +179,21 @@ class WebSocketConnector:
                 # We need to set this flag since closing the socket will
                 # set it to False
                 self.conn.keep_running = True
-                self.conn.run_forever(sslopt=sslopt_ca_certs)
+                self._run_forever(sslopt)
+
+    def _run_forever(self, sslopt):
+        """Run the websocket app, connecting a fresh Unix socket first if required."""
+        if self.url.startswith('ws+unix://'):
+            sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+            try:
+                sock.connect(self.url[len('ws+unix://'):])
+            except OSError as e:
+                sock.close()
+                self._on_error(self.conn, e)
+                return
+            self.conn.prepared_socket = sock
+        self.conn.run_forever(sslopt=sslopt, sockopt=self.sockopt,
+                              skip_utf8_validation=self.binary_frames)
 
     def run(self):
         """Run the main method of thread."""
@@ -145,12 +207,12 @@ class WebSocketConnector:
         All messages are time-stamped
 
         :param ws: Websocket obj
-        :param message: received data as bytes
+        :param message: received data as str, or bytes if ``binary_frames`` is set
         :return:
         """
         self._stop_timer()
 
-        raw, received_at = message, time.time()
+        raw, received_at = message, time.perf_counter_ns()
 
         try:
             data = json.loads(raw)
@@ -242,10 +304,10 @@ class WebSocketConnector:
         """Pass data up to the client via the internal Queue().
 
         :param data: data to be passed up
-        :param recv_at: float, time of reception
+        :param recv_at: int, ``time.perf_counter_ns()`` at reception
         :return:
         """
-        self.q.put(data, recv_at)
+        self.q.put((data, recv_at))
 
     def recv(self, block=True, timeout=None):
         """Wrap for self.q.get().
@@ -256,6 +318,21 @@ class WebSocketConnector:
         """
         return self.q.get(block, timeout)
 
+    def recv_many(self, max_items=None, timeout=None):
+        """Retrieve up to ``max_items`` items from the queue at once.
+
+        Blocks until at least one item is available; all items are taken under a single lock
+        acquisition (or none at all, with ``spsc=True``).
+
+        :param max_items: maximum number of items to return; all queued items if None
+        :param timeout: Value in seconds to wait for an item; waits indefinitely if None
+        :return: non-empty list of items
+        :raises queue.Empty: if no item became available within ``timeout``
+        """
+        if isinstance(self.q, SPSCQueue):
+            return self.q.get_many(max_items, timeout)
+        return get_many(self.q, max_items, timeout)
+
     def _connection_timed_out(self):
         """Issue a reconnection.
 
@@ -268,11 +345,13 @@ class WebSocketConnectorThread(WebSocketConnector, Thread):
     """Thread-based WebsocketConnector."""
 
     def __init__(self, url, timeout=None, q_maxsize=None, reconnect_interval=None, log_level=None,
-                 **kwargs):
+                 binary_frames=False, sockopt=None, spsc=False, log_file=None, **kwargs):
         """Initialize the instance."""
         super(WebSocketConnectorThread, self).__init__(url, timeout=timeout, q_maxsize=q_maxsize,
                                                        reconnect_interval=reconnect_interval,
-                                                       log_level=log_level)
+                                                       log_level=log_level,
+                                                       binary_frames=binary_frames, sockopt=sockopt,
+                                                       spsc=spsc, log_file=log_file)
         Thread.__init__(self, **kwargs)
         self.daemon = True
 
@@ -282,19 +361,39 @@ class WebSocketConnectorThread(WebSocketConnector, Thread):
         Thread.join(self, timeout=1)
 
 
-class WebSocketConnectorProcess(WebSocketConnector, mp.Process):
-    """Process-based websocket connector."""
+def _process_connector():
+    """Define WebSocketConnectorProcess; deferred so multiprocessing is only imported on use."""
+    import multiprocessing as mp
 
-    def __init__(self, url, timeout=None, q_maxsize=None, reconnect_interval=None, log_level=None,
-                 **kwargs):
-        """Initialize the instance."""
-        super(WebSocketConnectorProcess, self).__init__(url, timeout=timeout, q_maxsize=q_maxsize,
-                                                        reconnect_interval=reconnect_interval,
-                                                        log_level=log_level)
-        mp.Process.__init__(self, **kwargs)
-        self.daemon = True
+    class WebSocketConnectorProcess(WebSocketConnector, mp.Process):
+        """Process-based websocket connector."""
 
-    def disconnect(self):
-        """Disconnect from the websocket and join the process."""
-        super(WebSocketConnectorProcess, self).disconnect()
-        mp.Process.join(self, timeout=1)
+        __qualname__ = 'WebSocketConnectorProcess'
+
+        def __init__(self, url, timeout=None, q_maxsize=None, reconnect_interval=None,
+                     log_level=None, binary_frames=False, sockopt=None, spsc=False, log_file=None,
+                     **kwargs):
+            """Initialize the instance."""
+            super(WebSocketConnectorProcess, self).__init__(url, timeout=timeout,
+                                                            q_maxsize=q_maxsize,
+                                                            reconnect_interval=reconnect_interval,
+                                                            log_level=log_level,
+                                                            binary_frames=binary_frames,
+                                                            sockopt=sockopt, spsc=spsc,
+                                                            log_file=log_file)
+            mp.Process.__init__(self, **kwargs)
+            self.daemon = True
+
+        def disconnect(self):
+            """Disconnect from the websocket and join the process."""
+            super(WebSocketConnectorProcess, self).disconnect()
+            mp.Process.join(self, timeout=1)
+
+    return WebSocketConnectorProcess
+
+
+def __getattr__(name):
+    if name == 'WebSocketConnectorProcess':
+        cls = globals()[name] = _process_connector()
+        return cls
+    raise AttributeError("module %r has no attribute %r" % (__name__, name))
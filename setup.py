@@ -19,6 +19,7 @@ setup(name='hitbtc_wss',
       packages=['hitbtc_wss'],
       classifiers=['Programming Language :: Python :: 3 :: Only'],
       install_requires=['websocket-client'],
+      extras_require={'numpy': ['numpy']},
       package_data={'': ['*.md', '*.rst']},
       url='https://github.com/mellertson/hitbtc')
 
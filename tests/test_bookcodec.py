@@ -0,0 +1,110 @@
+"""Tests for hitbtc_wss.bookcodec."""
+
+# Import Built-Ins
+import io
+
+# Import Third-Party
+import pytest
+
+# Import Homebrew
+from hitbtc_wss.book import OrderBook
+from hitbtc_wss.bookcodec import BookCodecError, BookDecoder, BookEncoder, BookPublisher, \
+    read_frames
+from hitbtc_wss.metadata import MetadataCache
+
+
+def metadata():
+    cache = MetadataCache()
+    cache.update_symbols([{'id': 'BTCUSD', 'baseCurrency': 'BTC', 'quoteCurrency': 'USD',
+                           'tickSize': '0.01', 'quantityIncrement': '0.00001'}])
+    return cache
+
+
+def message(sequence, bid=(), ask=()):
+    return {'symbol': 'BTCUSD', 'sequence': sequence,
+            'bid': [{'price': p, 'size': s} for p, s in bid],
+            'ask': [{'price': p, 'size': s} for p, s in ask]}
+
+
+STREAM = [
+    ('snapshotOrderbook', message(10, [('100.00', '1.5'), ('99.98', '0.25'), ('95.01', '3')],
+                                  [('100.02', '0.00001'), ('100.50', '2'), ('250.00', '7.7')])),
+    ('updateOrderbook', message(11, [('99.99', '0.5')], [])),
+    ('updateOrderbook', message(12, [('100.00', '0')], [('100.01', '1.23456')])),
+    ('updateOrderbook', message(13, [], [('250.00', '0'), ('100.02', '4')])),
+]
+
+
+def publish(stream):
+    book = OrderBook('BTCUSD')
+    sink = io.BytesIO()
+    publisher = BookPublisher({'BTCUSD': book}, metadata(), sink)
+    for method, params in stream:
+        if method == 'snapshotOrderbook':
+            book.apply_snapshot(params)
+        else:
+            book.apply_update(params)
+        publisher(method, 'BTCUSD', params)
+    return book, sink.getvalue()
+
+
+def rebuild(diffs):
+    book = OrderBook('BTCUSD')
+    for diff in diffs:
+        if diff.snapshot:
+            book.apply_snapshot(diff.as_params())
+        else:
+            book.apply_update(diff.as_params())
+    return book
+
+
+def test_round_trip_rebuilds_book():
+    book, data = publish(STREAM)
+    rebuilt = rebuild(read_frames(io.BytesIO(data)))
+    assert rebuilt.bids == book.bids
+    assert rebuilt.asks == book.asks
+
+
+def test_frames_fed_byte_by_byte():
+    book, data = publish(STREAM)
+    decoder = BookDecoder()
+    diffs = []
+    for i in range(len(data)):
+        diffs.extend(decoder.feed(data[i:i + 1]))
+    assert [diff.sequence for diff in diffs] == [1, 2, 3, 4]
+    assert rebuild(diffs).bids == book.bids
+
+
+def test_unknown_symbol_raises():
+    with pytest.raises(BookCodecError):
+        BookEncoder(MetadataCache()).encode('ETHBTC', [], [])
+
+
+def test_gap_is_flagged():
+    encoder = BookEncoder(metadata())
+    first = encoder.encode_message(*STREAM[0])
+    encoder.encode_message(*STREAM[1])
+    third = encoder.encode_message(*STREAM[2])
+    decoder = BookDecoder()
+    diffs = decoder.feed(bytes(first) + bytes(third))
+    assert [diff.gap for diff in diffs] == [False, True]
+    assert decoder.gaps == 1
+
+
+def test_malformed_frame_is_skipped():
+    encoder = BookEncoder(metadata())
+    first = bytes(encoder.encode_message(*STREAM[0]))
+    second = bytes(encoder.encode_message(*STREAM[1]))
+    # A complete frame of an unknown type
+    bad = bytes((2, 9, 0))
+    decoder = BookDecoder()
+    with pytest.raises(BookCodecError):
+        decoder.feed(first + bad + second)
+    # Frames before the bad one are returned by the next call, frames after it are decoded
+    diffs = decoder.feed(b'')
+    assert [diff.sequence for diff in diffs] == [1, 2]
+
+
+def test_publisher_skips_updates_not_newer():
+    _, data = publish(STREAM[:2] + [('updateOrderbook', message(11, [('1.00', '1')], []))])
+    assert len(list(read_frames(io.BytesIO(data)))) == 2
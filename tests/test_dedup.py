@@ -0,0 +1,41 @@
+"""Tests for hitbtc_wss.dedup."""
+
+# Import Homebrew
+from hitbtc_wss.dedup import DedupIndex, Deduplicator
+
+
+def trades(*ids):
+    return {'symbol': 'ETHBTC', 'data': [{'id': i_d} for i_d in ids]}
+
+
+def test_index_evicts_oldest():
+    index = DedupIndex(3)
+    assert all(index.add(key) for key in 'abc')
+    assert not index.add('a')
+    assert index.add('d')
+    assert 'a' not in index and len(index) == 3
+    assert index.add('a')
+
+
+def test_resent_trades_are_dropped():
+    dedup = Deduplicator()
+    assert dedup.filter('snapshotTrades', 'ETHBTC', trades(1, 2, 3))
+    params = trades(2, 3, 4)
+    assert dedup.filter('updateTrades', 'ETHBTC', params)
+    assert [trade['id'] for trade in params['data']] == [4]
+    assert not dedup.filter('updateTrades', 'ETHBTC', trades(4))
+    # Snapshots are kept, if empty, so consumers see the resubscription
+    params = trades(1, 2)
+    assert dedup.filter('snapshotTrades', 'ETHBTC', params)
+    assert params['data'] == []
+    assert dedup.duplicates == 5
+    # Symbols are independent
+    assert dedup.filter('updateTrades', 'ETHUSD', trades(1))
+
+
+def test_duplicate_reports_are_dropped():
+    dedup = Deduplicator()
+    report = {'id': '1', 'reportType': 'trade', 'tradeId': 7, 'updatedAt': 'T'}
+    assert dedup.filter('report', 'ETHBTC', dict(report))
+    assert not dedup.filter('report', 'ETHBTC', dict(report))
+    assert dedup.filter('report', 'ETHBTC', dict(report, tradeId=8))
@@ -0,0 +1,41 @@
+"""Tests for hitbtc_wss.gateway."""
+
+# Import Built-Ins
+import random
+from threading import Thread, Event
+
+# Import Homebrew
+from hitbtc_wss.book import OrderBook
+from hitbtc_wss.gateway import Gateway
+
+
+def levels(prices, size):
+    return [{'price': '%.2f' % price, 'size': size} for price in prices]
+
+
+def test_book_snapshot_while_book_updates():
+    book = OrderBook('ETHBTC')
+    book.apply_snapshot({'sequence': 1, 'bid': levels(range(1, 100), '1'),
+                         'ask': levels(range(100, 200), '1')})
+    stop = Event()
+
+    def update():
+        rng = random.Random(1)
+        sequence = 1
+        while not stop.is_set():
+            sequence += 1
+            prices = [rng.randrange(1, 100) for _ in range(20)]
+            book.apply_update({'sequence': sequence,
+                               'bid': levels(prices, rng.choice(('0', '2'))), 'ask': []})
+
+    updater = Thread(target=update, daemon=True)
+    updater.start()
+    try:
+        for _ in range(2000):
+            params = Gateway._book_snapshot(book)['params']
+            prices = [float(level['price']) for level in params['bid']]
+            assert prices == sorted(prices, reverse=True)
+            assert all(float(level['size']) > 0 for level in params['bid'])
+    finally:
+        stop.set()
+        updater.join()
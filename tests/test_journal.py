@@ -0,0 +1,64 @@
+"""Tests for hitbtc_wss.journal."""
+
+# Import Homebrew
+from hitbtc_wss.journal import Journal, read_journal
+
+
+def new_order(i_d, client_order_id):
+    return {'method': 'newOrder', 'id': i_d,
+            'params': {'symbol': 'ETHBTC', 'side': 'buy', 'quantity': '1',
+                       'clientOrderId': client_order_id}}
+
+
+def test_unanswered_requests_are_recovered(tmp_path):
+    path = str(tmp_path / 'journal')
+    journal = Journal(path)
+    for i in range(3):
+        journal.record_request(new_order(i, 'order-%d' % i))
+    journal.record_response({'id': 1, 'result': {}})
+    assert journal.sync(timeout=5)
+    journal.close()
+
+    journal = Journal(path)
+    assert list(journal.recovered) == [0, 2]
+    assert list(journal.in_flight) == [0, 2]
+    journal.close()
+    # The file is compacted down to the recovered requests
+    assert [record['request']['id'] for record in read_journal(path)] == [0, 2]
+
+
+def test_resolve_against_active_orders(tmp_path):
+    path = str(tmp_path / 'journal')
+    journal = Journal(path)
+    journal.record_request(new_order(0, 'active'))
+    journal.record_request(new_order(1, 'lost'))
+    journal.close()
+
+    journal = Journal(path)
+    resolved = journal.resolve([{'clientOrderId': 'active', 'status': 'new'}])
+    assert [(request['id'], report is not None) for request, report in resolved] == \
+        [(0, True), (1, False)]
+    assert not journal.recovered and not journal.in_flight
+    journal.close()
+    journal = Journal(path)
+    assert not journal.recovered
+    journal.close()
+
+
+def test_torn_last_line_is_skipped(tmp_path):
+    path = str(tmp_path / 'journal')
+    journal = Journal(path)
+    journal.record_request(new_order(0, 'a'))
+    journal.close()
+    with open(path, 'ab') as f:
+        f.write(b'{"type":"request","requ')
+    journal = Journal(path)
+    assert list(journal.recovered) == [0]
+    journal.close()
+
+
+def test_sync_waits_for_sequence(tmp_path):
+    journal = Journal(str(tmp_path / 'journal'))
+    sequence = journal.record_request(new_order(0, 'a'))
+    assert journal.sync(timeout=5, sequence=sequence)
+    journal.close()
@@ -0,0 +1,54 @@
+"""Tests for hitbtc_wss.queues."""
+
+# Import Built-Ins
+from queue import Empty, Full, Queue
+from threading import Thread
+
+# Import Third-Party
+import pytest
+
+# Import Homebrew
+from hitbtc_wss.queues import SPSCQueue, get_many
+
+
+def test_spsc_fifo_and_bounds():
+    q = SPSCQueue(3)
+    for i in range(3):
+        q.put_nowait(i)
+    with pytest.raises(Full):
+        q.put_nowait(3)
+    assert q.get_nowait() == 0
+    q.put_nowait(3)
+    # Wraps around the end of the buffer
+    assert q.get_many() == [1, 2, 3]
+    with pytest.raises(Empty):
+        q.get_nowait()
+    with pytest.raises(Empty):
+        q.get(timeout=0.01)
+
+
+def test_spsc_across_threads():
+    q = SPSCQueue(16)
+    count = 20000
+
+    def produce():
+        for i in range(count):
+            q.put(i)
+
+    producer = Thread(target=produce)
+    producer.start()
+    received = []
+    while len(received) < count:
+        received.extend(q.get_many(max_items=7, timeout=5))
+    producer.join()
+    assert received == list(range(count))
+
+
+def test_get_many_from_queue():
+    q = Queue()
+    for i in range(5):
+        q.put(i)
+    assert get_many(q, max_items=3) == [0, 1, 2]
+    assert get_many(q) == [3, 4]
+    with pytest.raises(Empty):
+        get_many(q, timeout=0.01)
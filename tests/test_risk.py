@@ -0,0 +1,110 @@
+"""Tests for hitbtc_wss.risk."""
+
+# Import Built-Ins
+from threading import Thread
+
+# Import Third-Party
+import pytest
+
+# Import Homebrew
+from hitbtc_wss.book import OrderBook
+from hitbtc_wss.orders import OrderTracker
+from hitbtc_wss.risk import RiskEngine, RiskError, RiskLimits
+
+
+def report(client_order_id, side='buy', quantity='1', cum_quantity='0', status='new',
+           price='100'):
+    return {'clientOrderId': client_order_id, 'symbol': 'ETHBTC', 'side': side, 'status': status,
+            'type': 'limit', 'quantity': quantity, 'cumQuantity': cum_quantity, 'price': price}
+
+
+def order(client_order_id, side='buy', quantity='1', price='100'):
+    return {'clientOrderId': client_order_id, 'symbol': 'ETHBTC', 'side': side,
+            'quantity': quantity, 'price': price}
+
+
+def engine(**limits):
+    book = OrderBook('ETHBTC')
+    book.apply_snapshot({'sequence': 1, 'bid': [{'price': '99', 'size': '1'}],
+                         'ask': [{'price': '101', 'size': '1'}]})
+    return RiskEngine(OrderTracker(), {'ETHBTC': book}, RiskLimits(**limits))
+
+
+def test_no_limits_pass():
+    RiskEngine(OrderTracker(), {}).check(order('a', quantity='1e9'))
+
+
+def test_max_notional():
+    risk = engine(max_notional=500)
+    risk.check(order('a', quantity='5'))
+    with pytest.raises(RiskError):
+        risk.check(order('b', quantity='5.1'))
+
+
+def test_market_order_valued_at_opposite_quote():
+    risk = engine(max_notional=100)
+    with pytest.raises(RiskError):
+        risk.check({'clientOrderId': 'a', 'symbol': 'ETHBTC', 'side': 'buy', 'quantity': '1',
+                    'type': 'market'})
+
+
+def test_price_band():
+    risk = engine(price_band=0.05)
+    risk.check(order('a', price='106'))
+    with pytest.raises(RiskError):
+        risk.check(order('b', price='106.1'))
+    with pytest.raises(RiskError):
+        risk.check(order('c', side='sell', price='94'))
+
+
+def test_max_position_counts_open_orders():
+    risk = engine(max_position=3)
+    risk.orders.apply(report('open', quantity='2'))
+    risk.check(order('a', quantity='1'))
+    with pytest.raises(RiskError):
+        risk.check(order('b', quantity='1'))
+    # Sells reduce the position
+    risk.check(order('c', side='sell', quantity='3'))
+
+
+def test_max_open_orders_counts_reservations():
+    risk = engine(max_open_orders=2)
+    risk.check(order('a'))
+    risk.check(order('b'))
+    with pytest.raises(RiskError):
+        risk.check(order('c'))
+    risk.orders.release('a')
+    risk.check(order('c'))
+
+
+def test_concurrent_burst_respects_max_open_orders():
+    risk = engine(max_open_orders=5)
+    passed = []
+
+    def place(i):
+        try:
+            risk.check(order('order-%d' % i))
+        except RiskError:
+            return
+        passed.append(i)
+
+    threads = [Thread(target=place, args=(i,)) for i in range(50)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert len(passed) == 5
+
+
+def test_replace_releases_remaining_quantity():
+    risk = engine(max_position=2)
+    risk.orders.apply(report('a', quantity='2'))
+    risk.check_replace({'clientOrderId': 'a', 'requestClientId': 'b', 'quantity': '2'})
+    with pytest.raises(RiskError):
+        risk.check_replace({'clientOrderId': 'a', 'requestClientId': 'c', 'quantity': '3'})
+
+
+def test_replace_of_unknown_order_rejected_with_limits():
+    with pytest.raises(RiskError):
+        engine(max_notional=1).check_replace({'clientOrderId': 'x', 'quantity': '1'})
+    RiskEngine(OrderTracker(), {}).check_replace({'clientOrderId': 'x', 'quantity': '1'})
@@ -0,0 +1,45 @@
+"""Tests for hitbtc_wss.state."""
+
+# Import Third-Party
+import pytest
+
+# Import Homebrew
+from hitbtc_wss import state
+from hitbtc_wss.connector import HitBTCConnector
+
+
+def report(client_order_id, status='new', cum_quantity='0'):
+    return {'clientOrderId': client_order_id, 'symbol': 'ETHBTC', 'side': 'buy',
+            'status': status, 'type': 'limit', 'quantity': '2', 'cumQuantity': cum_quantity,
+            'price': '0.05'}
+
+
+def test_save_and_load(tmp_path):
+    path = str(tmp_path / 'state.gz')
+    conn = HitBTCConnector(silent=True)
+    conn.metadata.update_symbols([{'id': 'ETHBTC', 'baseCurrency': 'ETH', 'quoteCurrency': 'BTC',
+                                   'tickSize': '0.000001', 'quantityIncrement': '0.001'}])
+    conn.subscriptions.restore([('subscribeTicker', {'symbol': 'ETHBTC'}, 2)])
+    conn.orders.apply(report('open'))
+    conn.orders.apply(report('filled', 'filled', '2'))
+    state.save(conn, path)
+
+    restored = HitBTCConnector(silent=True)
+    assert state.load(restored, path)
+    assert restored.subscriptions.export() == [('subscribeTicker', {'symbol': 'ETHBTC'}, 2)]
+    assert restored.metadata.get('ETHBTC')['tickSize'] == '0.000001'
+    assert restored.metadata.symbols_for(base='ETH') == {'ETHBTC'}
+    assert [order['clientOrderId'] for order in restored.orders.open_orders_for('ETHBTC')] == \
+        ['open']
+    assert restored.orders.position('ETHBTC') == conn.orders.position('ETHBTC')
+    assert restored.orders.fill_rate('ETHBTC') == conn.orders.fill_rate('ETHBTC')
+    assert restored.reconcile_on_login
+
+
+def test_missing_file(tmp_path):
+    assert not state.load(HitBTCConnector(silent=True), str(tmp_path / 'missing.gz'))
+
+
+def test_other_version_rejected():
+    with pytest.raises(ValueError):
+        state.restore(HitBTCConnector(silent=True), {'version': 1})
@@ -0,0 +1,93 @@
+"""Tests for hitbtc_wss.subscriptions."""
+
+# Import Built-Ins
+import time
+from threading import Event
+
+# Import Homebrew
+from hitbtc_wss.subscriptions import SubscriptionRegistry
+
+
+class FakeConnector:
+    """Record the requests sent by a registry, with their send times."""
+
+    def __init__(self, fail=0):
+        self._is_connected = True
+        self.fail = fail
+        self.sent = []
+        self.done = Event()
+        self.expected = None
+
+    def send(self, method, custom_id=None, **params):
+        if self.fail:
+            self.fail -= 1
+            raise OSError("socket closed")
+        self.sent.append((time.monotonic(), method, custom_id, params))
+        if self.expected is not None and len(self.sent) >= self.expected:
+            self.done.set()
+        return True
+
+    def wait(self, count, timeout=5):
+        self.expected = count
+        if len(self.sent) >= count:
+            return True
+        return self.done.wait(timeout)
+
+
+def test_reference_counting():
+    conn = FakeConnector()
+    registry = SubscriptionRegistry(conn)
+    assert registry.subscribe('subscribeTicker', symbol='ETHBTC')
+    assert not registry.subscribe('subscribeTicker', symbol='ETHBTC')
+    assert not registry.unsubscribe('subscribeTicker', symbol='ETHBTC')
+    assert registry.unsubscribe('subscribeTicker', symbol='ETHBTC')
+    assert not registry.unsubscribe('subscribeTicker', symbol='ETHBTC')
+    assert conn.wait(2)
+    assert [method for _, method, _, _ in conn.sent] == ['subscribeTicker', 'unsubscribeTicker']
+
+
+def test_requests_are_paced():
+    conn = FakeConnector()
+    registry = SubscriptionRegistry(conn, rate=50, burst=5)
+    for i in range(15):
+        registry.subscribe('subscribeTrades', symbol='SYM%d' % i)
+    assert conn.wait(15)
+    times = [sent_at for sent_at, _, _, _ in conn.sent]
+    # The burst goes out at once, the other 10 at 50 per second
+    assert times[-1] - times[0] >= 10 / 50 * 0.9
+
+
+def test_queued_requests_get_unique_ids():
+    conn = FakeConnector()
+    registry = SubscriptionRegistry(conn)
+    registry.restore([('subscribeTicker', {'symbol': 'SYM%d' % i}, 1) for i in range(5)])
+    registry.resubscribe()
+    registry.subscribe('subscribeTrades', 'custom', symbol='SYM0')
+    assert conn.wait(6)
+    ids = [custom_id for _, _, custom_id, _ in conn.sent]
+    assert len(set(ids)) == 6
+    assert ids[-1] == 'custom'
+
+
+def test_sender_survives_failed_send():
+    conn = FakeConnector(fail=1)
+    registry = SubscriptionRegistry(conn)
+    registry.subscribe('subscribeTicker', symbol='ETHBTC')
+    registry.subscribe('subscribeTicker', symbol='ETHUSD')
+    assert conn.wait(1)
+    assert conn.sent[0][3] == {'symbol': 'ETHUSD'}
+    assert registry.pending == 0
+
+
+def test_requests_dropped_while_disconnected_are_resent():
+    conn = FakeConnector()
+    conn._is_connected = False
+    registry = SubscriptionRegistry(conn)
+    registry.subscribe('subscribeTicker', symbol='ETHBTC')
+    deadline = time.monotonic() + 5
+    while registry.pending and time.monotonic() < deadline:
+        time.sleep(0.01)
+    conn._is_connected = True
+    registry.resubscribe()
+    assert conn.wait(1)
+    assert conn.sent[0][1] == 'subscribeTicker'